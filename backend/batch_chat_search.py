@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+CLI для /chat/search/batch: офлайн-оцінка релевантності/латентності та прогрів
+кешів перед піком.
+
+Запити - з файлу (рядок на запит; .jsonl - поле "query") або stdin.
+Відповідь NDJSON пишеться у --output по мірі завершення запитів;
+у кінці друкується підсумок пакету (стани, degraded, p50/p95, кількість _msearch).
+Рядок із "degraded": true - відповідь із локальним fallback (tier у "gpt_tiers"), у кеш не потрапляє.
+
+Приклади:
+    python batch_chat_search.py queries.txt --output results.ndjson
+    python batch_chat_search.py top_queries.txt --cache-mode refresh --compact   # прогрів
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import List
+
+import httpx
+
+
+def read_queries(path: str) -> List[str]:
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        queries = []
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                line = (json.loads(line).get("query") or "").strip()
+            if line:
+                queries.append(line)
+        return queries
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queries", help="файл із запитами або '-' для stdin")
+    parser.add_argument("--url", default="http://localhost:8000", help="адреса бекенду (не nginx - там ендпоінт закритий)")
+    parser.add_argument("--token", default=os.getenv("BATCH_API_TOKEN", ""), help="BATCH_API_TOKEN бекенду")
+    parser.add_argument("--output", default="-", help="NDJSON з результатами ('-' - stdout)")
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--cache-mode", choices=["use", "bypass", "refresh"], default="use")
+    parser.add_argument("--compact", action="store_true", help="лише id/score товарів")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="запитів на один HTTP-виклик")
+    args = parser.parse_args()
+
+    queries = read_queries(args.queries)
+    if not queries:
+        print("No queries", file=sys.stderr)
+        sys.exit(1)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    done = 0
+    try:
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+        with httpx.Client(base_url=args.url, headers=headers, timeout=httpx.Timeout(30.0, read=None)) as client:
+            for start in range(0, len(queries), args.chunk_size):
+                chunk = queries[start : start + args.chunk_size]
+                payload = {
+                    "queries": chunk,
+                    "k": args.k,
+                    "concurrency": args.concurrency,
+                    "cache_mode": args.cache_mode,
+                    "compact": args.compact,
+                }
+                with client.stream("POST", "/chat/search/batch", json=payload) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        item = json.loads(line)
+                        if "summary" in item:
+                            print(json.dumps(item["summary"], ensure_ascii=False), file=sys.stderr)
+                            continue
+                        # Індекс у межах усього файлу, а не HTTP-виклику
+                        item["index"] += start
+                        out.write(json.dumps(item, ensure_ascii=False) + "\n")
+                        out.flush()
+                        done += 1
+                        if done % 50 == 0:
+                            print(f"  {done}/{len(queries)}", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"✓ {done}/{len(queries)} queries", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
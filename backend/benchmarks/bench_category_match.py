@@ -0,0 +1,113 @@
+"""
+Бенчмарк присвоєння категорій: попередній _find_matching_categories
+(`keyword in text` для кожного ключового слова кожної категорії) проти
+KeywordAutomaton - по одному тексту та пакетом (30 кандидатів, як у чат-пошуку).
+
+Запуск з каталогу backend:
+    python benchmarks/bench_category_match.py [--repeat 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from categories import (  # noqa: E402
+    CATEGORY_SCHEMA,
+    KEYWORD_AUTOMATON,
+    assign_category_codes,
+    find_matching_categories,
+)
+
+TITLES = [
+    "Вазон керамічний",
+    "Каструля емальована з кришкою",
+    "Футболка чоловіча базова",
+    "Піжама жіноча трикотажна",
+    "Капці домашні теплі",
+    "Рушник махровий",
+    "Конструктор дитячий",
+    "Шкарпетки бавовняні, набір 3 пари",
+    "Контейнер харчовий",
+    "Свічка ароматична у склянці",
+]
+FILLER = (
+    "якісний матеріал зручний у використанні ідеально підходить для щоденного використання "
+    "колір може відрізнятися від зображення виробник гарантує довговічність розмір упаковки"
+).split()
+
+
+def _legacy_find_matching_categories(text: str, top_n: int = 3) -> List[str]:
+    """Копія попередньої реалізації _find_matching_categories для порівняння"""
+    text_lower = text.lower()
+    scores: Dict[str, int] = {}
+
+    for code, data in CATEGORY_SCHEMA.items():
+        if data.get("special"):
+            continue
+        score = 0
+        for keyword in data.get("keywords", []):
+            if keyword in text_lower:
+                score += 1
+        if score > 0:
+            scores[code] = score
+
+    sorted_codes = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    return [code for code, _ in sorted_codes[:top_n]]
+
+
+def _legacy_assign(fields: tuple) -> Optional[str]:
+    text = " ".join(filter(None, fields)).lower()
+    if not text:
+        return None
+    matches = _legacy_find_matching_categories(text, top_n=1)
+    return matches[0] if matches else None
+
+
+def _product(rng: random.Random, desc_words: int) -> tuple:
+    title = rng.choice(TITLES)
+    desc = " ".join(rng.choice(FILLER) for _ in range(desc_words))
+    return (title, title, f"{title}. {desc}", desc)
+
+
+def _bench(fn: Callable[[], object], repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) * 1e6 / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keywords = [kw for data in CATEGORY_SCHEMA.values() for kw in data.get("keywords", [])]
+    print(f"{len(keywords)} keywords in {len(KEYWORD_AUTOMATON.codes)} categories")
+
+    for desc_words in (10, 60, 200):
+        products = [_product(rng, desc_words) for _ in range(30)]
+        # Еквівалентність: ті самі категорії та порядок, що й раніше
+        for fields in products:
+            text = " ".join(filter(None, fields))
+            assert find_matching_categories(text, 5) == _legacy_find_matching_categories(text, 5), text
+        assert assign_category_codes(products) == [_legacy_assign(f) for f in products]
+
+        avg_chars = sum(len(" ".join(p)) for p in products) / len(products)
+        legacy = _bench(lambda products=products: [_legacy_assign(f) for f in products], args.repeat)
+        single = _bench(lambda products=products: [assign_category_codes([f]) for f in products], args.repeat)
+        batch = _bench(lambda products=products: assign_category_codes(products), args.repeat)
+        print(
+            f"30 products ~{avg_chars:5.0f} chars | legacy {legacy:8.1f} µs | "
+            f"automaton per product {single:8.1f} µs | automaton batch {batch:8.1f} µs"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Бенчмарк витягу JSON з відповіді GPT: попередній _extract_json_safely
+(regex code block + json.loads кожного збалансованого {...}) проти
+однопрохідного IncrementalJSONExtractor.
+
+Запуск з каталогу backend:
+    python benchmarks/bench_json_extract.py [--repeat 2000]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from json_stream import IncrementalJSONExtractor, extract_json  # noqa: E402
+
+REASONS = [
+    "Керамічний вазон з дренажним отвором, підходить для кімнатних рослин",
+    "Набір {3 шт.} з піддонами - зручно для підвіконня",
+    "Пластиковий, легкий, \"під бетон\", діаметр 20 см",
+    "Бюджетний варіант для розсади; є кілька кольорів",
+    "Підвісне кашпо з мотузкою, до 2 кг",
+]
+
+
+def _legacy_extract_json(text: str) -> Dict[str, Any]:
+    """Копія попередньої реалізації _extract_json_safely для порівняння"""
+    if not text:
+        return {}
+
+    match = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(1))
+        except json.JSONDecodeError:
+            pass
+
+    stack, start_index = [], -1
+    best_json = {}
+    max_len = 0
+
+    for i, char in enumerate(text):
+        if char == "{":
+            if not stack:
+                start_index = i
+            stack.append("{")
+        elif char == "}":
+            if stack:
+                stack.pop()
+                if not stack and start_index != -1:
+                    substring = text[start_index : i + 1]
+                    try:
+                        parsed = json.loads(substring)
+                        if len(substring) > max_len:
+                            best_json, max_len = parsed, len(substring)
+                    except json.JSONDecodeError:
+                        continue
+
+    if best_json:
+        return best_json
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return {}
+
+
+def _gpt_output(rng: random.Random, n_recos: int, wrapper: str) -> str:
+    obj = {
+        "recommendations": [
+            {
+                "product_index": i + 1,
+                "relevance_score": round(rng.uniform(0.4, 0.98), 2),
+                "reason": rng.choice(REASONS),
+                "bucket": rng.choice(["must_have", "good_to_have", "also_consider"]),
+            }
+            for i in range(n_recos)
+        ],
+        "assistant_message": "Я підібрав для вас кілька варіантів вазонів: керамічні, пластикові та підвісні.",
+    }
+    body = json.dumps(obj, ensure_ascii=False, indent=2)
+    if wrapper == "fence":
+        return f"Ось результат:\n```json\n{body}\n```"
+    if wrapper == "prose":
+        # Фігурні дужки в тексті до JSON - найгірший випадок для старого сканера
+        return "Аналіз {кандидатів} завершено. {примітка: нижче JSON}\n" + body + "\nДякую!"
+    return body
+
+
+def _bench(fn: Callable[[str], Any], samples: List[str], repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for text in samples:
+            fn(text)
+    return (time.perf_counter() - t0) * 1e6 / (repeat * len(samples))
+
+
+def _stream(text: str, chunk_size: int = 16) -> Dict[str, Any]:
+    extractor = IncrementalJSONExtractor()
+    for i in range(0, len(text), chunk_size):
+        extractor.feed(text[i : i + chunk_size])
+    return extractor.result() or {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for wrapper in ("plain", "fence", "prose"):
+        samples = [_gpt_output(rng, rng.randint(12, 18), wrapper) for _ in range(20)]
+        for text in samples:
+            assert extract_json(text) == _legacy_extract_json(text) == _stream(text), wrapper
+
+        avg_kb = sum(len(t.encode("utf-8")) for t in samples) / len(samples) / 1024
+        legacy = _bench(_legacy_extract_json, samples, args.repeat)
+        single = _bench(extract_json, samples, args.repeat)
+        streamed = _bench(_stream, samples, args.repeat)
+        print(
+            f"{wrapper:6s} ~{avg_kb:.1f} KB | legacy {legacy:8.1f} µs | "
+            f"single-pass {single:8.1f} µs | streamed(16B chunks) {streamed:8.1f} µs"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Бенчмарк пам'яті збережених сесій чат-пошуку: попереднє зберігання
+(r.model_dump() кожного результату в кожній сесії) проти id + score у сесії
+та спільного пулу документів (SearchContextManager + ProductPool).
+
+Товари сесій вибираються з каталогу з перекосом популярності (Zipf),
+кожна сесія отримує власні об'єкти, як після розбору відповіді ES.
+
+Запуск з каталогу backend:
+    python benchmarks/bench_session_memory.py [--sessions 300] [--results 100]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import SearchContextManager, SearchResult, settings  # noqa: E402
+
+WORDS = (
+    "якісний матеріал зручний у використанні ідеально підходить для щоденного використання "
+    "колір може відрізнятися від зображення виробник гарантує довговічність розмір упаковки "
+    "качественный материал удобный в использовании идеально подходит для ежедневного"
+).split()
+
+
+class LegacySessionStore:
+    """Копія попереднього store_search_results для порівняння"""
+
+    def __init__(self):
+        self.search_results: Dict[str, Dict[str, Any]] = {}
+
+    async def store_search_results(self, session_id, all_results, total_found, dialog_context, candidates=None):
+        self.search_results[session_id] = {
+            "all_results": [r.model_dump() for r in all_results],
+            "candidates": [r.model_dump() for r in candidates] if candidates is not None else None,
+            "total_found": total_found,
+            "dialog_context": dialog_context,
+            "timestamp": time.time(),
+        }
+
+
+def _catalog(rng: random.Random, size: int) -> List[str]:
+    hits = []
+    for i in range(size):
+        title = " ".join(rng.choice(WORDS) for _ in range(5)).capitalize()
+        hits.append(
+            json.dumps(
+                {
+                    "_id": f"{100000 + i}",
+                    "_source": {
+                        "title_ua": title,
+                        "title_ru": title,
+                        "description_ua": " ".join(rng.choice(WORDS) for _ in range(60)),
+                        "description_ru": " ".join(rng.choice(WORDS) for _ in range(60)),
+                        "sku": f"SKU{i}",
+                        "good_code": f"{100000 + i}",
+                        "measurement_unit_ua": "шт",
+                        "availability": True,
+                        "category_codes": ["home"],
+                    },
+                },
+                ensure_ascii=False,
+            )
+        )
+    return hits
+
+
+def _sessions(rng: random.Random, catalog_size: int, sessions: int, results: int) -> List[List[int]]:
+    weights = [1.0 / (rank + 1) for rank in range(catalog_size)]
+    out = []
+    for _ in range(sessions):
+        picked: List[int] = []
+        seen = set()
+        while len(picked) < results:
+            for i in rng.choices(range(catalog_size), weights=weights, k=results - len(picked)):
+                if i not in seen:
+                    seen.add(i)
+                    picked.append(i)
+        out.append(picked)
+    return out
+
+
+async def _measure(store, catalog: List[str], sessions: List[List[int]]) -> int:
+    """Приріст пам'яті після збереження всіх сесій; результати запиту після цього звільняються"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for n, picked in enumerate(sessions):
+        # json.loads - нові рядки для кожної сесії, як після відповіді ES
+        results = [
+            SearchResult.from_hit({**json.loads(catalog[i]), "_score": 1.0 / (rank + 1)})
+            for rank, i in enumerate(picked)
+        ]
+        # Кожна третя сесія - клік по категорії: показано половину, candidates - усі
+        candidates = results if n % 3 == 0 else None
+        shown = results[: len(results) // 2] if candidates is not None else results
+        await store.store_search_results(f"s{n}", shown, len(results), {"query": f"q{n}"}, candidates=candidates)
+        del results, candidates, shown
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--results", type=int, default=100)
+    parser.add_argument("--catalog", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    settings.max_sessions = args.sessions
+    rng = random.Random(args.seed)
+    catalog = _catalog(rng, args.catalog)
+
+    sessions = _sessions(rng, args.catalog, args.sessions, args.results)
+    legacy_bytes = await _measure(LegacySessionStore(), catalog, sessions)
+    manager = SearchContextManager()
+    pooled_bytes = await _measure(manager, catalog, sessions)
+
+    stats = manager.stats()
+    print(f"{args.sessions} sessions x {args.results} results, catalog {args.catalog}: {stats}")
+    print(f"legacy  {legacy_bytes / args.sessions / 1024:8.1f} KiB/session  total {legacy_bytes / 2**20:6.1f} MiB")
+    print(f"pooled  {pooled_bytes / args.sessions / 1024:8.1f} KiB/session  total {pooled_bytes / 2**20:6.1f} MiB")
+
+    t0 = time.perf_counter()
+    for n in range(args.sessions):
+        await manager.get_search_results(f"s{n}", offset=20, limit=20)
+    print(f"load-more page (20): {(time.perf_counter() - t0) * 1e6 / args.sessions:.1f} µs")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
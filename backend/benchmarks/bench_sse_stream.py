@@ -0,0 +1,151 @@
+"""
+Бенчмарк SSE-стріму чат-пошуку при N одночасних клієнтах: попередній генератор
+(опитування черги wait_for(..., timeout=0.1) + assistant_delta на кожен символ)
+проти поточного /chat/search/sse (маркер завершення в черзі + фрагменти по словах).
+
+Пошук підмінено фейковою задачею: status-події рівномірно за --search-seconds,
+далі відповідь асистента ~--message-chars символів. Генератори читаються напряму
+(StreamingResponse.body_iterator), тому міряється лише SSE-шар без мережі:
+CPU процесу на з'єднання, події та записи в сокет за секунду, затримка status-подій.
+
+Запуск з каталогу backend:
+    python benchmarks/bench_sse_stream.py [--clients 500] [--search-seconds 1.5]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+from main import QueryAnalysis, settings  # noqa: E402
+
+SENTENCE = "Ось добірка товарів для кухні: керамічні горщики, дерев'яні дошки та набори ножів. "
+
+
+def _fake_search(search_seconds: float, statuses: int, message: str):
+    async def execute_chat_search_logic(status_callback=None, **kwargs) -> Dict[str, Any]:
+        for n in range(statuses):
+            await asyncio.sleep(search_seconds / statuses)
+            if status_callback:
+                await status_callback("searching", f"Крок {n + 1}|{time.perf_counter()}")
+        return {
+            "action": "clarification",
+            "state": "clarification",
+            "assistant_message": message,
+            "results": [],
+            "recommendations": [],
+            "categories_payload": [],
+            "actions": None,
+            "dialog_context": None,
+            "search_time_ms": search_seconds * 1000,
+            "query_analysis": QueryAnalysis(
+                original_query=kwargs.get("query", ""), expanded_query="", keywords=[], context_used=False,
+                intent="clarification",
+            ),
+        }
+
+    return execute_chat_search_logic
+
+
+async def legacy_event_generator(search_coro):
+    """Копія попереднього циклу event_generator (без декодування контексту)"""
+
+    def sse_event(event: str, data: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    yield sse_event("status", {"message": "Думаю...", "type": "thinking"})
+    status_queue = asyncio.Queue()
+
+    async def send_status(status_type: str, message: str):
+        await status_queue.put(("status", {"type": status_type, "message": message}))
+
+    search_task = asyncio.create_task(search_coro(status_callback=send_status, query="q"))
+    while not search_task.done():
+        try:
+            event, data = await asyncio.wait_for(status_queue.get(), timeout=0.1)
+            yield sse_event(event, data)
+        except asyncio.TimeoutError:
+            continue
+    while not status_queue.empty():
+        event, data = await status_queue.get()
+        yield sse_event(event, data)
+    result = await search_task
+
+    message = result["assistant_message"]
+    yield sse_event("assistant_start", {"length": len(message)})
+    for i in range(len(message)):
+        yield sse_event("assistant_delta", {"text": message[i]})
+        if settings.sse_slow_mode:
+            await asyncio.sleep(settings.sse_delay_seconds)
+    yield sse_event("assistant_end", {})
+    yield sse_event("final", {"assistant_message": message, "dialog_state": result["state"]})
+
+
+async def _client(body, latencies: List[float]) -> Dict[str, int]:
+    events = writes = 0
+    async for chunk in body:
+        writes += 1
+        events += chunk.count("\n\n")
+        if chunk.startswith("event: status"):
+            message = json.loads(chunk.split("data: ", 1)[1])["message"]
+            if "|" in message:
+                latencies.append(time.perf_counter() - float(message.split("|", 1)[1]))
+    return {"events": events, "writes": writes}
+
+
+async def _run(label: str, bodies, clients: int) -> None:
+    latencies: List[float] = []
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    totals = await asyncio.gather(*(_client(body, latencies) for body in bodies))
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - t0
+
+    events = sum(t["events"] for t in totals)
+    writes = sum(t["writes"] for t in totals)
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{label:7s} wall {wall:5.2f} s  CPU {cpu:5.2f} s ({cpu / clients * 1000:6.2f} ms/conn)  "
+        f"events {events / clients:6.0f}/conn {events / wall:8.0f}/s  writes {writes / wall:8.0f}/s  "
+        f"status latency p50 {statistics.median(latencies) * 1000:5.2f} ms p95 {p95 * 1000:5.2f} ms"
+    )
+
+
+async def main_async() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--search-seconds", type=float, default=1.5)
+    parser.add_argument("--statuses", type=int, default=4)
+    parser.add_argument("--message-chars", type=int, default=600)
+    parser.add_argument("--slow", action="store_true", help="SSE_SLOW_MODE=true (затримка на кожен delta)")
+    args = parser.parse_args()
+
+    logging.getLogger("search-backend").setLevel(logging.WARNING)
+    settings.sse_slow_mode = args.slow
+    message = (SENTENCE * (args.message_chars // len(SENTENCE) + 1))[: args.message_chars]
+    search = _fake_search(args.search_seconds, args.statuses, message)
+    main.execute_chat_search_logic = search
+
+    print(f"{args.clients} clients, search {args.search_seconds}s / {args.statuses} statuses, "
+          f"message {len(message)} chars, chunk {settings.sse_chunk_chars}, slow mode {args.slow}")
+    await _run("legacy", [legacy_event_generator(search) for _ in range(args.clients)], args.clients)
+
+    bodies = []
+    for n in range(args.clients):
+        response = await main.chat_search_sse(
+            request=None, query="кухня", session_id=f"s{n}", progressive=False, gpt_service=None,
+            embedding_service=None, es_service=None, context_manager=None, intent_router=None,
+        )
+        bodies.append(response.body_iterator)
+    await _run("current", bodies, args.clients)
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
@@ -0,0 +1,114 @@
+"""
+Бенчмарк сховищ сесій і кешів (STORAGE_BACKEND): ціна спільного стану на один запит.
+
+- session store: збереження сесії (100 товарів) після пошуку;
+- load-more: сторінка 20 товарів з іншого "воркера";
+- embedding get: читання вектора з кешу.
+
+memory-local - структури процесу (SearchContextManager + TTLCache), memory - MemoryBackend
+через той самий шлях серіалізації, що й спільні сховища (ціна JSON/codec без I/O).
+
+Запуск з каталогу backend:
+    python benchmarks/bench_storage_backends.py [--redis-url redis://localhost:6379/15]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import SearchContextManager, SearchResult, SharedSearchContextManager, TTLCache, settings  # noqa: E402
+from storage_backends import FLOAT_VECTOR_CODEC, MemoryBackend, RedisBackend, SQLiteBackend, StorageBackend  # noqa: E402
+
+
+def _results(rng: random.Random, n: int) -> List[SearchResult]:
+    return [
+        SearchResult.from_hit(
+            {
+                "_id": str(rng.randrange(100000, 105000)),
+                "_score": 1.0 / (i + 1),
+                "_source": {
+                    "title_ua": f"Товар {i}",
+                    "description_ua": "якісний матеріал зручний у використанні " * 8,
+                    "sku": f"SKU{i}",
+                    "availability": True,
+                    "category_codes": ["home"],
+                },
+            }
+        )
+        for i in range(n)
+    ]
+
+
+def _us(samples: List[float]) -> str:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    return f"p50 {statistics.median(samples) * 1e6:8.1f} µs  p95 {p95 * 1e6:8.1f} µs"
+
+
+async def _bench(label: str, backend: Optional[StorageBackend], iterations: int, dims: int) -> Dict[str, str]:
+    rng = random.Random(42)
+    if backend is None:
+        writer = reader = SearchContextManager()
+    else:
+        await backend.clear("")
+        writer, reader = SharedSearchContextManager(backend), SharedSearchContextManager(backend)
+
+    store, page = [], []
+    for n in range(iterations):
+        results = _results(rng, 100)
+        t0 = time.perf_counter()
+        await writer.store_search_results(f"s{n}", results, len(results), {"query": f"q{n}"})
+        store.append(time.perf_counter() - t0)
+    for n in range(iterations):
+        t0 = time.perf_counter()
+        batch = await reader.get_search_results(f"s{n}", offset=20, limit=20)
+        page.append(time.perf_counter() - t0)
+        assert len(batch["products"]) == 20
+
+    cache = TTLCache(iterations, 3600, name="embedding_cache", backend=backend, codec=FLOAT_VECTOR_CODEC)
+    vector = [rng.random() for _ in range(dims)]
+    for n in range(iterations):
+        await cache.put(f"e{n}", vector)
+    embed = []
+    for n in range(iterations):
+        t0 = time.perf_counter()
+        await cache.get(f"e{n}")
+        embed.append(time.perf_counter() - t0)
+
+    if backend is not None:
+        await backend.clear("")
+        await backend.close()
+    return {"session store": _us(store), "load-more page": _us(page), f"embedding get ({dims})": _us(embed)}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--dims", type=int, default=settings.vector_dimension)
+    parser.add_argument("--redis-url", default="", help="порожньо - без Redis (використовується окрема БД!)")
+    args = parser.parse_args()
+
+    settings.max_sessions = args.iterations
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ("memory-local", None),
+            ("memory", MemoryBackend()),
+            ("sqlite", SQLiteBackend(os.path.join(tmp, "state.sqlite3"))),
+        ]
+        if args.redis_url:
+            backends.append(("redis", RedisBackend(args.redis_url, key_prefix="bench:")))
+        for label, backend in backends:
+            for name, line in (await _bench(label, backend, args.iterations, args.dims)).items():
+                print(f"{label:13s} {name:22s} {line}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Build category centroids for the vector-based category classifier.
+
+1. Scroll the index: titles/descriptions + description_vector.
+2. Label seeds with the keyword matcher (CATEGORY_SCHEMA stems).
+3. Fit one centroid per category on the train split (~80%, split by product id).
+4. Report on the holdout: agreement with keyword labels, coverage, and how many
+   products without any keyword match the classifier can categorise;
+   per-request latency (30 candidates) of keyword matching vs one batched
+   similarity product.
+5. Save centroids + report to JSON (CATEGORY_CENTROIDS_PATH in the backend).
+
+With --write-codes, confident predictions are also stored as category_codes
+for products that keyword matching leaves uncategorised.
+
+Usage:
+    python build_category_centroids.py --output category_centroids.json [--write-codes]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_bulk, async_scan
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from categories import (
+    CATEGORY_CODES_FIELD,
+    CategoryCentroidClassifier,
+    assign_category_codes,
+    category_codes_for,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", stream=sys.stdout)
+logger = logging.getLogger("category_centroids")
+load_dotenv()
+
+TEXT_FIELDS = ["title_ua", "title_ru", "description_ua", "description_ru"]
+
+
+class Settings(BaseSettings):
+    elastic_url: str = Field(default="http://localhost:9200", env="ELASTIC_URL")
+    elastic_user: str = Field(default="elastic", env="ELASTIC_USER")
+    elastic_password: str = Field(default="elastic", env="ELASTIC_PASSWORD")
+    index_name: str = Field(default="products_qwen3_8b", env="INDEX_NAME")
+    vector_field_name: str = Field(default="description_vector", env="VECTOR_FIELD_NAME")
+    category_centroids_path: str = Field(default="category_centroids.json", env="CATEGORY_CENTROIDS_PATH")
+
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, extra="ignore")
+
+
+settings = Settings()
+
+Product = Tuple[str, Tuple[Optional[str], ...], List[float]]
+
+
+def is_holdout(product_id: str) -> bool:
+    """Deterministic ~20% holdout split by product id"""
+    return int(hashlib.md5(product_id.encode("utf-8")).hexdigest()[:8], 16) % 5 == 0
+
+
+async def load_products(es: AsyncElasticsearch, limit: int) -> List[Product]:
+    products: List[Product] = []
+    async for doc in async_scan(
+        es,
+        index=settings.index_name,
+        query={"query": {"exists": {"field": settings.vector_field_name}}},
+        _source=TEXT_FIELDS + [settings.vector_field_name],
+        size=500,
+    ):
+        src = doc.get("_source") or {}
+        vector = src.get(settings.vector_field_name)
+        if vector:
+            products.append((doc["_id"], tuple(src.get(f) for f in TEXT_FIELDS), vector))
+        if limit and len(products) >= limit:
+            break
+    return products
+
+
+def _per_request_ms(fn, batches: List[Any]) -> float:
+    t0 = time.perf_counter()
+    for batch in batches:
+        fn(batch)
+    return (time.perf_counter() - t0) * 1000 / len(batches)
+
+
+def evaluate(
+    classifier: CategoryCentroidClassifier,
+    holdout: List[Tuple[Product, str]],
+    unlabelled: List[Product],
+    candidates_per_request: int = 30,
+) -> Dict[str, Any]:
+    """Holdout agreement with keyword labels, coverage, and per-request latency"""
+    report: Dict[str, Any] = {"holdout": len(holdout), "unlabelled": len(unlabelled)}
+
+    predictions = classifier.classify_batch([p[2] for p, _ in holdout])
+    confident = [(pred[0], label) for pred, (_, label) in zip(predictions, holdout) if pred is not None]
+    report["holdout_coverage"] = round(len(confident) / len(holdout), 4) if holdout else 0.0
+    report["holdout_accuracy"] = (
+        round(sum(1 for code, label in confident if code == label) / len(confident), 4) if confident else 0.0
+    )
+
+    recovered = [pred for pred in classifier.classify_batch([p[2] for p in unlabelled]) if pred is not None]
+    report["unlabelled_recovered"] = round(len(recovered) / len(unlabelled), 4) if unlabelled else 0.0
+
+    sample = [p for p, _ in holdout] + unlabelled
+    random.Random(0).shuffle(sample)
+    batches = [
+        sample[i:i + candidates_per_request]
+        for i in range(0, len(sample) - candidates_per_request + 1, candidates_per_request)
+    ][:50]
+    if batches:
+        report["keyword_ms_per_request"] = round(
+            _per_request_ms(lambda b: assign_category_codes([p[1] for p in b]), batches), 3
+        )
+        report["centroid_ms_per_request"] = round(
+            _per_request_ms(lambda b: classifier.classify_batch([p[2] for p in b]), batches), 3
+        )
+    return report
+
+
+async def write_codes(
+    es: AsyncElasticsearch, classifier: CategoryCentroidClassifier, unlabelled: List[Product]
+) -> int:
+    predictions = classifier.classify_batch([p[2] for p in unlabelled])
+    actions = [
+        {
+            "_op_type": "update",
+            "_index": settings.index_name,
+            "_id": product[0],
+            "doc": {CATEGORY_CODES_FIELD: category_codes_for(pred[0])},
+        }
+        for product, pred in zip(unlabelled, predictions)
+        if pred is not None
+    ]
+    if not actions:
+        return 0
+    ok, _ = await async_bulk(es, actions, chunk_size=500, raise_on_error=False)
+    await es.indices.refresh(index=settings.index_name)
+    return ok
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Build category centroids from product vectors")
+    parser.add_argument("--output", default=settings.category_centroids_path)
+    parser.add_argument("--limit", type=int, default=0, help="max products to scan (0 - all)")
+    parser.add_argument("--min-examples", type=int, default=5)
+    parser.add_argument("--min-similarity", type=float, default=0.35)
+    parser.add_argument("--min-margin", type=float, default=0.02)
+    parser.add_argument("--write-codes", action="store_true", help=f"store predictions as {CATEGORY_CODES_FIELD}")
+    args = parser.parse_args()
+
+    es = AsyncElasticsearch(settings.elastic_url, basic_auth=(settings.elastic_user, settings.elastic_password))
+    try:
+        products = await load_products(es, args.limit)
+        logger.info(f"Loaded {len(products)} products with {settings.vector_field_name}")
+
+        labels = assign_category_codes([p[1] for p in products])
+        train = [(p, code) for p, code in zip(products, labels) if code and not is_holdout(p[0])]
+        holdout = [(p, code) for p, code in zip(products, labels) if code and is_holdout(p[0])]
+        unlabelled = [p for p, code in zip(products, labels) if not code]
+        logger.info(f"Keyword seeds: train={len(train)} holdout={len(holdout)} unlabelled={len(unlabelled)}")
+
+        classifier = CategoryCentroidClassifier.fit(
+            ((code, p[2]) for p, code in train),
+            min_examples=args.min_examples,
+            min_similarity=args.min_similarity,
+            min_margin=args.min_margin,
+        )
+        logger.info(f"Centroids: {len(classifier.codes)} categories, examples={classifier.example_counts}")
+
+        report = evaluate(classifier, holdout, unlabelled)
+        for key, value in report.items():
+            logger.info(f"  {key}: {value}")
+
+        classifier.save(args.output, report=report)
+        logger.info(f"✓ Saved centroids to {args.output}")
+
+        if args.write_codes:
+            written = await write_codes(es, classifier, unlabelled)
+            logger.info(f"✓ Stored {CATEGORY_CODES_FIELD} for {written} previously uncategorised products")
+    finally:
+        await es.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
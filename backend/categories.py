@@ -0,0 +1,435 @@
+"""
+Схема категорій TA-DA та присвоєння категорії товару за ключовими словами.
+Спільна для бекенду (fallback під час запиту) та reindex_products.py, який
+зберігає коди в індексі (поле category_codes), щоб не рахувати їх на кожен запит.
+
+Ключові слова компілюються при імпорті в один автомат (KeywordAutomaton):
+усі бали категорій для тексту - за один прохід, для багатьох товарів - пакетом.
+
+CategoryCentroidClassifier - векторний класифікатор (центроїди категорій з
+description_vector товарів, розмічених ключовими словами; build_category_centroids.py).
+"""
+
+import json
+import math
+import operator
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy необов'язковий: без нього - скалярні добутки на Python
+    np = None
+
+# Keyword-поле індексу: [код категорії, код батьківської категорії]
+CATEGORY_CODES_FIELD = "category_codes"
+
+# 🎯 ПОКРАЩЕНА СИСТЕМА КАТЕГОРІЙ (на основі реального асортименту TA-DA)
+CATEGORY_SCHEMA: Dict[str, Dict[str, Any]] = {
+    # ОДЯГ
+    "clothing": {
+        "label": "Одяг",
+        "emoji": "👕",
+        "keywords": [
+            "одяг",
+            "одежд",
+            "футболк",
+            "сороч",
+            "штан",
+            "брюк",
+            "джинс",
+            "куртк",
+            "кофт",
+            "светр",
+            "худі",
+            "платт",
+            "сукн",
+            "спідниц",
+        ],
+        "parent": None,
+    },
+    "clothing_men": {"label": "Чоловічий одяг", "emoji": "👔", "keywords": ["чоловіч", "мужск"], "parent": "clothing"},
+    "clothing_women": {"label": "Жіночий одяг", "emoji": "👗", "keywords": ["жіноч", "женск"], "parent": "clothing"},
+    "clothing_kids": {
+        "label": "Дитячий одяг",
+        "emoji": "👶",
+        "keywords": ["дитяч", "детск", "для хлопчик", "для дівчинк"],
+        "parent": "clothing",
+    },
+    # ВЗУТТЯ
+    "footwear": {
+        "label": "Взуття",
+        "emoji": "👟",
+        "keywords": ["взутт", "обув", "капці", "тапочк", "шльопанц", "черевик", "чобіт", "кросівк", "туфл", "босоніжк"],
+        "parent": None,
+    },
+    # АКСЕСУАРИ
+    "accessories": {
+        "label": "Аксесуари",
+        "emoji": "🧦",
+        "keywords": [
+            "шкарп",
+            "носк",
+            "колгот",
+            "панчох",
+            "шапк",
+            "шарф",
+            "рукавиц",
+            "перчатк",
+            "ремін",
+            "пояс",
+            "сумк",
+            "рюкзак",
+        ],
+        "parent": None,
+    },
+    # ІГРАШКИ
+    "toys": {
+        "label": "Іграшки",
+        "emoji": "🧸",
+        "keywords": ["іграш", "игруш", "ляльк", "кукл", "машинк", "конструктор", "пазл", "м'яч", "плюш"],
+        "parent": None,
+    },
+    "toys_educational": {
+        "label": "Розвиваючі іграшки",
+        "emoji": "🎓",
+        "keywords": ["розвива", "навчал", "освітн"],
+        "parent": "toys",
+    },
+    # КУХНЯ
+    "kitchen": {
+        "label": "Кухонні товари",
+        "emoji": "🍳",
+        "keywords": ["посуд", "кухн", "кастр", "сковор", "таріл", "чашк", "келих", "ложк", "вилк", "ніж"],
+        "parent": None,
+    },
+    # ПОБУТОВА ХІМІЯ
+    "household": {
+        "label": "Побутова хімія",
+        "emoji": "🧹",
+        "keywords": ["миюч", "чист", "прання", "засіб", "порошок", "гель", "швабр", "щітк", "губк", "ганчір"],
+        "parent": None,
+    },
+    # КОСМЕТИКА
+    "cosmetics": {
+        "label": "Косметика та гігієна",
+        "emoji": "💄",
+        "keywords": ["косметик", "гігієн", "шампун", "мило", "крем", "зубн паст", "дезодоран"],
+        "parent": None,
+    },
+    # КАНЦЕЛЯРІЯ
+    "stationery": {
+        "label": "Канцелярія",
+        "emoji": "✏️",
+        "keywords": ["зошит", "ручк", "олівц", "карандаш", "пенал", "папір", "блокнот", "фарб", "маркер"],
+        "parent": None,
+    },
+    # ДЛЯ ДОМУ
+    "home": {
+        "label": "Товари для дому",
+        "emoji": "🏠",
+        "keywords": ["для дому", "домашн", "декор", "текстиль", "рушник", "постільн", "подушк", "ковдр"],
+        "parent": None,
+    },
+    # СПЕЦІАЛЬНА КАТЕГОРІЯ
+    "recommended": {
+        "label": "⭐ Рекомендовано для вас",
+        "emoji": "⭐",
+        "keywords": [],
+        "parent": None,
+        "special": True,
+    },
+}
+
+
+class KeywordAutomaton:
+    """
+    Багатошаблонний пошук підрядків для балів категорій.
+    Ключове слово без пробілів може трапитись лише всередині одного токена
+    (str.split), тож кожен унікальний токен проганяється через автомат один раз -
+    результат запам'ятовується (словник товарів малий і сталий).
+    Автомат: префіксне дерево слів, скомпільоване в regex (обхід у C, на позиції -
+    найдовше слово), і вихідні множини як у Aho–Corasick: знайдене слово тягне всі
+    ключові слова, що є його підрядками, тож перекриття й префікси враховано.
+    Фрази з пробілом ("для дому") перевіряються по всьому тексту.
+    Бал категорії = кількість різних її ключових слів у тексті (як у `keyword in text`).
+    """
+
+    # Межа кешу токенів; при переповненні кеш просто очищується
+    TOKEN_CACHE_LIMIT = 100_000
+
+    def __init__(self, keywords_by_code: Dict[str, Sequence[str]]):
+        self.codes = list(keywords_by_code)
+        words = sorted({kw for kws in keywords_by_code.values() for kw in kws if kw})
+        word_index = {w: i for i, w in enumerate(words)}
+
+        # Ключове слово, повторене в категорії, рахується двічі - як і раніше
+        self._word_codes: List[List[int]] = [[] for _ in words]
+        for ci, code in enumerate(self.codes):
+            for kw in keywords_by_code[code]:
+                if kw:
+                    self._word_codes[word_index[kw]].append(ci)
+
+        token_words = [w for w in words if len(w.split()) == 1 and w.strip() == w]
+        self._phrases = [(w, word_index[w]) for w in words if w not in token_words]
+        self._outputs: Dict[str, Tuple[int, ...]] = {
+            w: tuple(word_index[o] for o in token_words if o in w) for w in token_words
+        }
+        self._pattern = re.compile(self._trie_regex(token_words)) if token_words else None
+        self._token_hits: Dict[str, Tuple[int, ...]] = {}
+
+    @staticmethod
+    def _trie_regex(words: Sequence[str]) -> str:
+        trie: Dict[str, Any] = {}
+        for word in words:
+            node = trie
+            for ch in word:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+        def build(node: Dict[str, Any]) -> str:
+            branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+            if not branches:
+                return ""
+            body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            # Кінець слова всередині гілки: продовження необов'язкове (жадібне - найдовше слово)
+            return "(?:" + body + ")?" if "" in node else body
+
+        return build(trie)
+
+    def _match_token(self, token: str) -> Tuple[int, ...]:
+        found: set = set()
+        search, pos = self._pattern.search, 0
+        while True:
+            m = search(token, pos)
+            if m is None:
+                return tuple(found)
+            found.update(self._outputs[m.group()])
+            pos = m.start() + 1
+
+    def _hits(self, tokens: Iterable[str]) -> Dict[str, Tuple[int, ...]]:
+        """Збіги для унікальних токенів: кожен проганяється через автомат не більше разу"""
+        cache = self._token_hits
+        hits: Dict[str, Tuple[int, ...]] = {}
+        for token in tokens:
+            found = cache.get(token)
+            if found is None:
+                if len(cache) >= self.TOKEN_CACHE_LIMIT:
+                    cache.clear()
+                found = cache[token] = self._match_token(token)
+            hits[token] = found
+        return hits
+
+    def _found(self, text: str, tokens: set, hits: Dict[str, Tuple[int, ...]]) -> set:
+        found: set = set()
+        for token in tokens:
+            found.update(hits[token])
+        for phrase, wi in self._phrases:
+            if phrase in text:
+                found.add(wi)
+        return found
+
+    def _counts(self, found: set) -> Dict[str, int]:
+        counts = [0] * len(self.codes)
+        for wi in found:
+            for ci in self._word_codes[wi]:
+                counts[ci] += 1
+        # Порядок схеми - для стабільного сортування при однакових балах
+        return {self.codes[ci]: n for ci, n in enumerate(counts) if n}
+
+    def scores(self, text: str) -> Dict[str, int]:
+        """Бали категорій для тексту (лише ненульові)"""
+        return self.scores_batch([text])[0]
+
+    def scores_batch(self, texts: Sequence[str]) -> List[Dict[str, int]]:
+        """
+        Бали для багатьох текстів: токени всіх текстів збираються в одну множину,
+        і кожен унікальний токен зіставляється з автоматом один раз на весь батч.
+        """
+        lowered = [text.lower() if text else "" for text in texts]
+        token_sets = [set(text.split()) if self._pattern is not None else set() for text in lowered]
+        hits = self._hits(set().union(*token_sets))
+        return [
+            self._counts(self._found(text, tokens, hits)) if text else {}
+            for text, tokens in zip(lowered, token_sets)
+        ]
+
+
+def _rank(scores: Dict[str, int], top_n: int) -> List[str]:
+    # Сортуємо за кількістю збігів
+    return [code for code, _ in sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_n]]
+
+
+KEYWORD_AUTOMATON = KeywordAutomaton(
+    {code: data.get("keywords", []) for code, data in CATEGORY_SCHEMA.items() if not data.get("special")}
+)
+
+def _build_hierarchy() -> Dict[str, List[str]]:
+    hierarchy: Dict[str, List[str]] = {}
+    for code, data in CATEGORY_SCHEMA.items():
+        parent = data.get("parent")
+        if parent:
+            hierarchy.setdefault(parent, []).append(code)
+    return hierarchy
+
+
+# Схема статична - ієрархію рахуємо один раз
+CATEGORY_HIERARCHY = _build_hierarchy()
+
+
+def get_category_hierarchy() -> Dict[str, List[str]]:
+    """Повертає ієрархію категорій (батько -> діти)"""
+    return CATEGORY_HIERARCHY
+
+
+def find_matching_categories(text: str, top_n: int = 3) -> List[str]:
+    """Знаходить найбільш релевантні категорії для тексту"""
+    return _rank(KEYWORD_AUTOMATON.scores(text), top_n)
+
+
+def _product_text(
+    title_ua: Optional[str], title_ru: Optional[str], description_ua: Optional[str], description_ru: Optional[str]
+) -> str:
+    return " ".join(filter(None, [title_ua, title_ru, description_ua, description_ru]))
+
+
+def assign_category_code(
+    title_ua: Optional[str], title_ru: Optional[str], description_ua: Optional[str], description_ru: Optional[str]
+) -> Optional[str]:
+    """Автоматично присвоює категорію товару"""
+    matches = find_matching_categories(_product_text(title_ua, title_ru, description_ua, description_ru), top_n=1)
+    return matches[0] if matches else None
+
+
+def assign_category_codes(
+    products: Sequence[Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]]
+) -> List[Optional[str]]:
+    """Пакетний assign_category_code: (title_ua, title_ru, description_ua, description_ru) для кожного товару"""
+    scores = KEYWORD_AUTOMATON.scores_batch([_product_text(*fields) for fields in products])
+    return [(_rank(s, 1) or [None])[0] for s in scores]
+
+
+def _with_parent(code: Optional[str]) -> List[str]:
+    if not code:
+        return []
+    parent = CATEGORY_SCHEMA.get(code, {}).get("parent")
+    return [code, parent] if parent else [code]
+
+
+def product_category_codes(product: Dict[str, Any]) -> List[str]:
+    """Значення поля category_codes для документа: код категорії та (якщо є) батьківський"""
+    return products_category_codes([product])[0]
+
+
+def products_category_codes(products: Sequence[Dict[str, Any]]) -> List[List[str]]:
+    """category_codes для пачки документів (один прохід автомата)"""
+    codes = assign_category_codes(
+        [(p.get("title_ua"), p.get("title_ru"), p.get("description_ua"), p.get("description_ru")) for p in products]
+    )
+    return [_with_parent(code) for code in codes]
+
+
+def category_codes_for(code: Optional[str]) -> List[str]:
+    """Значення category_codes для коду категорії (з батьківським, якщо є)"""
+    return _with_parent(code)
+
+
+def _unit(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(map(operator.mul, vector, vector)))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+class CategoryCentroidClassifier:
+    """
+    Nearest-centroid класифікатор категорій на нормалізованих векторах товарів.
+    Кандидати запиту класифікуються одним матричним добутком (numpy) або
+    циклом скалярних добутків, якщо numpy немає.
+    """
+
+    def __init__(
+        self,
+        centroids: Dict[str, List[float]],
+        min_similarity: float = 0.35,
+        min_margin: float = 0.02,
+        example_counts: Optional[Dict[str, int]] = None,
+    ):
+        self.codes = list(centroids)
+        self.centroids = {code: _unit(vector) for code, vector in centroids.items()}
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.example_counts = example_counts or {}
+        self._matrix = np.asarray([self.centroids[c] for c in self.codes], dtype=np.float32) if np else None
+
+    @property
+    def vectorized(self) -> bool:
+        """True - класифікація одним матричним добутком (numpy встановлено)"""
+        return self._matrix is not None
+
+    @classmethod
+    def fit(
+        cls, labelled_vectors: Iterable[Tuple[str, Sequence[float]]], min_examples: int = 5, **kwargs: Any
+    ) -> "CategoryCentroidClassifier":
+        sums: Dict[str, List[float]] = {}
+        counts: Dict[str, int] = {}
+        for code, vector in labelled_vectors:
+            unit = _unit(vector)
+            acc = sums.get(code)
+            if acc is None:
+                sums[code] = unit
+            else:
+                for i, x in enumerate(unit):
+                    acc[i] += x
+            counts[code] = counts.get(code, 0) + 1
+
+        # Категорії з малою кількістю прикладів не беруть участі (центроїд ненадійний)
+        centroids = {code: acc for code, acc in sums.items() if counts[code] >= min_examples}
+        return cls(centroids, example_counts=counts, **kwargs)
+
+    def _similarities(self, vectors: Sequence[Sequence[float]]) -> List[List[float]]:
+        if self._matrix is not None:
+            batch = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(batch, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            return ((batch / norms) @ self._matrix.T).tolist()
+        rows = [self.centroids[c] for c in self.codes]
+        return [[sum(map(operator.mul, unit, row)) for row in rows] for unit in map(_unit, vectors)]
+
+    def classify_batch(self, vectors: Sequence[Sequence[float]]) -> List[Optional[Tuple[str, float, float]]]:
+        """
+        (code, similarity, margin) для кожного вектора; None - класифікатор не впевнений
+        (similarity < min_similarity або відрив від другої категорії < min_margin).
+        """
+        if not self.codes or not vectors:
+            return [None for _ in vectors]
+        results: List[Optional[Tuple[str, float, float]]] = []
+        for sims in self._similarities(vectors):
+            best = max(range(len(sims)), key=sims.__getitem__)
+            second = max((s for i, s in enumerate(sims) if i != best), default=0.0)
+            margin = sims[best] - second
+            confident = sims[best] >= self.min_similarity and margin >= self.min_margin
+            results.append((self.codes[best], sims[best], margin) if confident else None)
+        return results
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "centroids": self.centroids,
+            "example_counts": self.example_counts,
+            "min_similarity": self.min_similarity,
+            "min_margin": self.min_margin,
+        }
+
+    def save(self, path: str, report: Optional[Dict[str, Any]] = None) -> None:
+        """JSON (атомарно через tmp-файл); report - метрики побудови для перегляду"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({**self.to_dict(), "report": report or {}}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, **overrides: Any) -> "CategoryCentroidClassifier":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        params = {"min_similarity": data.get("min_similarity", 0.35), "min_margin": data.get("min_margin", 0.02)}
+        params.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(data["centroids"], example_counts=data.get("example_counts"), **params)
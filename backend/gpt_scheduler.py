@@ -0,0 +1,173 @@
+"""
+Планувальник запитів до OpenAI.
+Token bucket-и для лімітів RPM/TPM, пріоритетні смуги (аналіз запиту раніше
+за рекомендації) і глобальна пауза за `retry-after` після 429.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# Менше значення - вищий пріоритет; batch - /chat/search/batch, після живого трафіку
+LANE_PRIORITIES = {"analyze": 0, "reco": 1, "batch": 3}
+DEFAULT_PRIORITY = 2
+
+# Грубе наближення для кирилиці/JSON: ~3 символи на токен
+CHARS_PER_TOKEN = 3
+
+
+class GPTRateLimitedError(Exception):
+    """OpenAI повернув 429; retry_after - рекомендована пауза в секундах"""
+
+    def __init__(self, retry_after: float, message: str = ""):
+        super().__init__(message or f"OpenAI rate limited, retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Bucket з поповненням rate_per_minute / 60 за секунду, місткість - хвилинний ліміт"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = float(rate_per_minute) / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def consume(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """Корекція після відповіді (фактичні токени замість оцінки); може піти в мінус"""
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+def estimate_tokens(payload: Dict[str, Any]) -> int:
+    """Оцінка TPM-вартості запиту: промпт за довжиною + max_tokens відповіді"""
+    chars = sum(len(str(m.get("content") or "")) for m in payload.get("messages") or [])
+    return chars // CHARS_PER_TOKEN + int(payload.get("max_tokens") or 0)
+
+
+def parse_retry_after(headers: Mapping[str, str], default: float = 1.0) -> float:
+    """Секунди паузи з `retry-after-ms` / `retry-after` (секунди або HTTP-дата)"""
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return default
+
+
+class GPTScheduler:
+    """
+    Черга з пріоритетами перед OpenAI. acquire() повертає керування, коли
+    в bucket-ах є місце для запиту і немає активної паузи після 429.
+    Запити обслуговуються строго за (пріоритет, порядок надходження).
+    """
+
+    def __init__(self, rpm_limit: float, tpm_limit: float):
+        self.rpm = TokenBucket(rpm_limit)
+        self.tpm = TokenBucket(tpm_limit)
+        self.paused_until = 0.0
+        self._heap: List[Tuple[int, int, str, int, "asyncio.Future[float]"]] = []
+        self._seq = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._dispatcher: Optional["asyncio.Task[None]"] = None
+        self.counters: Dict[str, int] = {"dispatched": 0, "rate_limited": 0, "cancelled": 0}
+
+    def queue_depth(self) -> Dict[str, int]:
+        depth: Dict[str, int] = {}
+        for _, _, lane, _, fut in self._heap:
+            if not fut.done():
+                depth[lane] = depth.get(lane, 0) + 1
+        return depth
+
+    async def acquire(self, lane: str, tokens: int) -> float:
+        """Чекає на слот; повертає час очікування в мс"""
+        loop = asyncio.get_running_loop()
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        fut: "asyncio.Future[float]" = loop.create_future()
+        heapq.heappush(self._heap, (LANE_PRIORITIES.get(lane, DEFAULT_PRIORITY), next(self._seq), lane, tokens, fut))
+        self._changed.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        t0 = time.monotonic()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            self.counters["cancelled"] += 1
+            raise
+        return (time.monotonic() - t0) * 1000
+
+    async def _dispatch(self) -> None:
+        while self._heap:
+            _, _, lane, tokens, fut = self._heap[0]
+            if fut.done():
+                heapq.heappop(self._heap)
+                continue
+
+            now = time.monotonic()
+            wait = max(self.paused_until - now, self.rpm.time_until(1, now), self.tpm.time_until(tokens, now))
+            if wait > 0:
+                # Прокидаємось раніше, якщо прийшов запит з вищим пріоритетом
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            self.rpm.consume(1, now)
+            self.tpm.consume(tokens, now)
+            self.counters["dispatched"] += 1
+            fut.set_result(now)
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        if actual_tokens:
+            self.tpm.adjust(estimated_tokens - actual_tokens)
+
+    def pause(self, seconds: float) -> None:
+        """Після 429 усі смуги чекають retry-after; нові запити не стартують раніше"""
+        self.counters["rate_limited"] += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        if self._changed is not None:
+            self._changed.set()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self.rpm._refill(now)
+        self.tpm._refill(now)
+        return {
+            **self.counters,
+            "queue_depth": self.queue_depth(),
+            "paused_for_seconds": round(max(0.0, self.paused_until - now), 3),
+            "rpm_available": round(self.rpm.tokens, 1),
+            "tpm_available": round(self.tpm.tokens, 1),
+        }
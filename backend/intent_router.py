@@ -0,0 +1,335 @@
+"""
+Локальний роутер намірів перед GPT асистентом.
+Очевидні запити (привітання, подяка, беззмістовний набір символів, короткий
+конкретний товарний запит) обробляються локально, решта йде в GPT.
+
+Два рівні:
+1. Лексичні правила (мікросекунди, без мережі).
+2. Nearest-centroid класифікатор на embedding-ах, побудований з залогованих
+   рішень GPT (запит → action).
+"""
+
+import hashlib
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+EmbedFn = Callable[[str], Awaitable[Optional[List[float]]]]
+KeywordMatcher = Callable[[str], List[str]]
+
+# Дії, які роутер має право вирішувати локально (clarification потребує GPT)
+LOCAL_ACTIONS = ("greeting", "invalid", "product_search")
+
+GREETING_PHRASES = {
+    "hello": ("привіт", "привіт привіт", "привітик", "вітаю", "добрий день", "доброго дня", "добрий ранок",
+              "доброго ранку", "добрий вечір", "доброго вечора", "здрастуйте", "здравствуйте", "здоров",
+              "hello", "hi", "hey", "хай", "салют", "агов"),
+    "thanks": ("дякую", "дуже дякую", "щиро дякую", "дяки", "спасибі", "спасибо", "дякую вам", "thanks",
+               "thank you", "супер дякую", "дякую все"),
+    "bye": ("до побачення", "бувай", "бувайте", "па", "па па", "до зустрічі", "добраніч", "на все добре",
+            "пока", "bye"),
+}
+
+GREETING_MESSAGES = {
+    "hello": "Вітаю! Я AI-консультант TA-DA!. Напишіть, що шукаєте, і я підберу товари.",
+    "thanks": "Будь ласка! Звертайтеся, якщо ще щось потрібно знайти.",
+    "bye": "Гарного дня! Повертайтеся до TA-DA! за покупками.",
+}
+
+INVALID_MESSAGE = "Вибачте, я можу допомогти лише з пошуком товарів TA-DA!. Напишіть, що саме шукаєте."
+
+PRODUCT_SEARCH_MESSAGE = "Шукаю для вас товари..."
+
+# Маркери запитів, яким потрібне розуміння GPT (порада, подарунок, уточнення, порівняння)
+_AMBIGUOUS_WORDS = {"що", "який", "яка", "яке", "які", "чи", "як", "а", "ще", "щось", "каталог", "чого", "навіщо"}
+_AMBIGUOUS_STEMS = ("?", "порад", "подар", "допомож", "підкаж", "підбер", "краще", "порівн", "інш")
+
+_KEYBOARD_RUNS = ("qwert", "asdf", "zxcv", "йцук", "фыва", "фіва", "ячсм", "цукен", "hjkl")
+_VOWELS = set("аеєиіїоуюяыэёaeiouy")
+_TOKEN_RE = re.compile(r"[a-zа-яіїєґё']+|\d+", re.IGNORECASE)
+_LATIN_OR_DIGIT_RE = re.compile(r"[a-z\d]")
+
+
+def _normalize(query: str) -> str:
+    normalized = re.sub(r"\s+", " ", (query or "").lower()).strip()
+    return normalized.strip(" .,!?;:…\"'«»)(")
+
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else vector
+
+
+def _is_holdout(query: str) -> bool:
+    """Детермінований поділ train/holdout (~20%) для чесної оцінки точності"""
+    return int(hashlib.md5(query.encode("utf-8")).hexdigest()[:8], 16) % 5 == 0
+
+
+@dataclass
+class RouteDecision:
+    action: str
+    confidence: float
+    source: str
+    assistant_message: str
+    semantic_subqueries: List[str] = field(default_factory=list)
+
+    def to_assistant_response(self) -> Dict[str, Any]:
+        """Формат, сумісний з GPTService.unified_chat_assistant"""
+        return {
+            "action": self.action,
+            "confidence": self.confidence,
+            "assistant_message": self.assistant_message,
+            "semantic_subqueries": list(self.semantic_subqueries),
+            "categories": None,
+            "needs_user_input": self.action != "product_search",
+            "routed_by": self.source,
+        }
+
+
+class IntentCentroidClassifier:
+    """Nearest-centroid класифікатор намірів на нормалізованих embedding-ах"""
+
+    def __init__(self, min_similarity: float = 0.55, min_margin: float = 0.05, min_examples: int = 20):
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.min_examples = min_examples
+        self.centroids: Dict[str, List[float]] = {}
+        self.example_counts: Dict[str, int] = {}
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.centroids)
+
+    def fit(self, labelled_vectors: Iterable[Tuple[str, List[float]]]) -> None:
+        sums: Dict[str, List[float]] = {}
+        counts: Dict[str, int] = {}
+        for action, vector in labelled_vectors:
+            unit = _unit(vector)
+            acc = sums.get(action)
+            if acc is None:
+                sums[action] = list(unit)
+            else:
+                for i, x in enumerate(unit):
+                    acc[i] += x
+            counts[action] = counts.get(action, 0) + 1
+
+        self.example_counts = counts
+        # Класи з малою кількістю прикладів не беруть участі (центроїд ненадійний)
+        self.centroids = {
+            action: _unit([x / counts[action] for x in acc])
+            for action, acc in sums.items()
+            if counts[action] >= self.min_examples
+        }
+
+    def classify(self, vector: List[float]) -> Optional[Tuple[str, float, float]]:
+        """Повертає (action, similarity, margin) або None, якщо класифікатор не готовий"""
+        if not self.centroids:
+            return None
+        unit = _unit(vector)
+        scored = sorted(
+            ((sum(x * y for x, y in zip(unit, c)), action) for action, c in self.centroids.items()),
+            reverse=True,
+        )
+        best_sim, best_action = scored[0]
+        margin = best_sim - scored[1][0] if len(scored) > 1 else best_sim
+        return best_action, best_sim, margin
+
+    def is_confident(self, similarity: float, margin: float) -> bool:
+        return similarity >= self.min_similarity and margin >= self.min_margin
+
+
+class IntentRouter:
+    """
+    Роутер намірів: лексичні правила + centroid класифікатор.
+    Повертає RouteDecision, коли впевнений, або None (→ GPT).
+    """
+
+    def __init__(
+        self,
+        keyword_matcher: Optional[KeywordMatcher] = None,
+        classifier: Optional[IntentCentroidClassifier] = None,
+        max_product_tokens: int = 5,
+    ):
+        self.keyword_matcher = keyword_matcher
+        self.classifier = classifier or IntentCentroidClassifier()
+        self.max_product_tokens = max_product_tokens
+        self.stats_counters: Dict[str, int] = {"total": 0, "forwarded": 0}
+        self.last_evaluation: Optional[Dict[str, Any]] = None
+        # Вектори запитів попередньої перебудови: нормалізований запит → embedding
+        self._vectors: Dict[str, List[float]] = {}
+
+    # ---------- Лексичні правила ----------
+
+    @staticmethod
+    def _greeting_kind(normalized: str) -> Optional[str]:
+        for kind, phrases in GREETING_PHRASES.items():
+            if normalized in phrases:
+                return kind
+        return None
+
+    @staticmethod
+    def _looks_like_gibberish(normalized: str) -> bool:
+        if any(run in normalized for run in _KEYBOARD_RUNS):
+            return True
+        # Частка голосних - лише для кириличних слів: латинські моделі/абревіатури
+        # ("RTX 4060", "USB HDMI") майже без голосних, але це валідні товарні запити
+        letters = [
+            ch
+            for token in normalized.split()
+            if not _LATIN_OR_DIGIT_RE.search(token)
+            for ch in token
+            if ch.isalpha()
+        ]
+        if len(letters) < 5:
+            return False
+        vowel_ratio = sum(1 for ch in letters if ch in _VOWELS) / len(letters)
+        return vowel_ratio < 0.15
+
+    def _is_simple_product_query(self, normalized: str) -> bool:
+        if self.keyword_matcher is None:
+            return False
+        tokens = _TOKEN_RE.findall(normalized)
+        if any(t in _AMBIGUOUS_WORDS for t in tokens) or any(stem in normalized for stem in _AMBIGUOUS_STEMS):
+            return False
+        # Одне загальне слово ("іграшки") - кандидат на clarification, це вирішує GPT
+        if not (2 <= len(tokens) <= self.max_product_tokens):
+            return False
+        return bool(self.keyword_matcher(normalized))
+
+    def route_by_rules(self, query: str, has_context: bool) -> Optional[RouteDecision]:
+        normalized = _normalize(query)
+        if not normalized:
+            return None
+
+        kind = self._greeting_kind(normalized)
+        if kind:
+            return RouteDecision("greeting", 0.99, "rules", GREETING_MESSAGES[kind])
+
+        if self._looks_like_gibberish(normalized):
+            return RouteDecision("invalid", 0.95, "rules", INVALID_MESSAGE)
+
+        # Контекстні уточнення ("а синя?") має доповнювати GPT з історії
+        if not has_context and self._is_simple_product_query(normalized):
+            return RouteDecision("product_search", 0.9, "rules", PRODUCT_SEARCH_MESSAGE, [query.strip()])
+
+        return None
+
+    # ---------- Centroid класифікатор ----------
+
+    def _decision_from_centroid(self, query: str, action: str, similarity: float) -> Optional[RouteDecision]:
+        if action == "greeting":
+            return RouteDecision(action, similarity, "centroid", GREETING_MESSAGES["hello"])
+        if action == "invalid":
+            return RouteDecision(action, similarity, "centroid", INVALID_MESSAGE)
+        if action == "product_search":
+            return RouteDecision(action, similarity, "centroid", PRODUCT_SEARCH_MESSAGE, [query.strip()])
+        return None
+
+    async def route(self, query: str, has_context: bool, embed: Optional[EmbedFn] = None) -> Optional[RouteDecision]:
+        self.stats_counters["total"] += 1
+
+        decision = self.route_by_rules(query, has_context)
+        if decision is None and not has_context and embed is not None and self.classifier.ready:
+            vector = await embed(query)
+            verdict = self.classifier.classify(vector) if vector else None
+            if verdict:
+                action, similarity, margin = verdict
+                if action in LOCAL_ACTIONS and self.classifier.is_confident(similarity, margin):
+                    decision = self._decision_from_centroid(query, action, similarity)
+
+        if decision is None:
+            self.stats_counters["forwarded"] += 1
+        else:
+            key = f"skipped_{decision.source}"
+            self.stats_counters[key] = self.stats_counters.get(key, 0) + 1
+        return decision
+
+    # ---------- Побудова та оцінка ----------
+
+    async def rebuild(self, decisions: List[Tuple[str, str]], embed: EmbedFn) -> Dict[str, Any]:
+        """
+        Перебудовує центроїди з залогованих рішень GPT (query, action).
+        ~20% запитів (детерміновано за хешем) відкладаються для оцінки точності.
+        Вектори з попередньої перебудови перевикористовуються — embedding
+        рахується лише для нових запитів, по одному (без паралельних викликів).
+        """
+        latest: Dict[str, str] = {}
+        for query, action in decisions:
+            normalized = _normalize(query)
+            if normalized and action:
+                latest[normalized] = action
+
+        train, holdout = [], []
+        for normalized, action in latest.items():
+            (holdout if _is_holdout(normalized) else train).append((normalized, action))
+
+        previous, current = self._vectors, {}
+        counts = {"embedded": 0, "reused": 0}
+
+        async def cached_embed(normalized: str) -> Optional[List[float]]:
+            vector = current.get(normalized) or previous.get(normalized)
+            if vector is None:
+                vector = await embed(normalized)
+                counts["embedded"] += 1
+            else:
+                counts["reused"] += 1
+            if vector:
+                current[normalized] = vector
+            return vector
+
+        labelled = []
+        for normalized, action in train:
+            vector = await cached_embed(normalized)
+            if vector:
+                labelled.append((action, vector))
+
+        self.classifier.fit(labelled)
+        evaluation = await self.evaluate(holdout, cached_embed)
+        # Тримаємо лише вектори поточного набору рішень — пам'ять обмежена max_examples
+        self._vectors = current
+        evaluation.update(counts)
+        self.last_evaluation = evaluation
+        return self.last_evaluation
+
+    async def evaluate(self, decisions: List[Tuple[str, str]], embed: Optional[EmbedFn] = None) -> Dict[str, Any]:
+        """Точність роутера відносно рішень GPT: тільки там, де роутер впевнений"""
+        covered = correct = 0
+        by_source: Dict[str, Dict[str, int]] = {}
+
+        for query, gpt_action in decisions:
+            decision = self.route_by_rules(query, has_context=False)
+            if decision is None and embed is not None and self.classifier.ready:
+                vector = await embed(query)
+                verdict = self.classifier.classify(vector) if vector else None
+                if verdict and verdict[0] in LOCAL_ACTIONS and self.classifier.is_confident(verdict[1], verdict[2]):
+                    decision = self._decision_from_centroid(query, verdict[0], verdict[1])
+            if decision is None:
+                continue
+
+            covered += 1
+            src = by_source.setdefault(decision.source, {"covered": 0, "correct": 0})
+            src["covered"] += 1
+            if decision.action == gpt_action:
+                correct += 1
+                src["correct"] += 1
+
+        total = len(decisions)
+        return {
+            "evaluated": total,
+            "covered": covered,
+            "coverage": round(covered / total, 4) if total else 0.0,
+            "accuracy": round(correct / covered, 4) if covered else 0.0,
+            "by_source": by_source,
+            "centroid_examples": dict(self.classifier.example_counts),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.stats_counters["total"]
+        skipped = total - self.stats_counters["forwarded"]
+        return {
+            **self.stats_counters,
+            "skip_rate": round(skipped / total, 4) if total else 0.0,
+            "classifier_ready": self.classifier.ready,
+            "evaluation": self.last_evaluation,
+        }
@@ -0,0 +1,163 @@
+"""
+Інкрементальний витяг JSON з відповіді GPT.
+Один прохід по тексту: стан рядка/escape, стек дужок, позиції відкриття.
+Працює і з повним текстом, і з потоком чанків (streaming) - завершені елементи
+масиву "recommendations" віддаються одразу, як тільки закривається їх об'єкт.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURAL_TOP = re.compile(r'[{}\[\]":,]')
+# Глибше першого рівня ключі не відстежуються - ":" і "," можна пропускати
+_STRUCTURAL_NESTED = re.compile(r'[{}\[\]"]')
+
+
+class IncrementalJSONExtractor:
+    """
+    Шукає JSON-об'єкти верхнього рівня в довільному тексті (prose, ```json блоки).
+    Кожен байт сканується один раз; json.loads викликається лише для
+    закритих об'єктів верхнього рівня та елементів масиву items_key
+    (items_key=None - без розбору елементів, для одноразового витягу).
+    """
+
+    def __init__(self, items_key: Optional[str] = "recommendations"):
+        self.items_key = items_key
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._string_start = -1
+        self._object_start = -1
+        self._item_start = -1
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._items_depth = -1
+        self._best: Optional[Dict[str, Any]] = None
+        self._best_len = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Додає чанк тексту, повертає елементи items_key, які завершились у ньому"""
+        completed: List[Dict[str, Any]] = []
+        if not chunk:
+            return completed
+        self._buf += chunk
+        buf = self._buf
+        stack = self._stack
+        end = len(buf)
+        i = self._pos
+
+        # Стрибки регулярками між структурними символами замість побайтового циклу
+        while i < end:
+            if self._in_string:
+                m = _STRING_SPECIAL.search(buf, i)
+                if m is None:
+                    i = end
+                    break
+                i = m.start()
+                if buf[i] == "\\":
+                    if i + 1 >= end:
+                        break  # escape розірваний чанком - дочитаємо з наступним
+                    i += 2
+                    continue
+                self._in_string = False
+                if len(stack) == 1:
+                    self._last_string = buf[self._string_start + 1 : i]
+                i += 1
+                continue
+
+            if not stack:
+                i = buf.find("{", i)
+                if i == -1:
+                    i = end
+                    break
+                self._object_start = i
+                self._current_key = None
+                stack.append("{")
+                i += 1
+                continue
+
+            m = (_STRUCTURAL_TOP if len(stack) == 1 else _STRUCTURAL_NESTED).search(buf, i)
+            if m is None:
+                i = end
+                break
+            i = m.start()
+            ch = buf[i]
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                if len(stack) == 1:
+                    self._current_key = self._last_string
+            elif ch == ",":
+                if len(stack) == 1:
+                    self._current_key = None
+            elif ch == "{" or ch == "[":
+                if ch == "[" and len(stack) == 1 and self.items_key and self._current_key == self.items_key:
+                    self._items_depth = 2
+                elif ch == "{" and len(stack) == self._items_depth:
+                    self._item_start = i
+                stack.append(ch)
+            else:
+                stack.pop()
+                if ch == "}" and self._item_start != -1 and len(stack) == self._items_depth:
+                    item = self._loads(buf[self._item_start : i + 1])
+                    if isinstance(item, dict):
+                        completed.append(item)
+                    self._item_start = -1
+                elif ch == "]" and len(stack) == 1 and self._items_depth == 2:
+                    self._items_depth = -1
+                elif not stack:
+                    self._close_object(buf[self._object_start : i + 1])
+            i += 1
+
+        self._pos = i
+        # Текст до початку незакритого об'єкта більше не потрібен
+        if not stack and not self._in_string:
+            self._buf = buf[i:]
+            self._pos = 0
+        return completed
+
+    def _close_object(self, text: str) -> None:
+        self._items_depth = -1
+        self._item_start = -1
+        parsed = self._loads(text)
+        if isinstance(parsed, dict) and len(text) > self._best_len:
+            self._best, self._best_len = parsed, len(text)
+
+    @staticmethod
+    def _loads(text: str) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return None
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """Найдовший коректний об'єкт верхнього рівня, знайдений на цей момент"""
+        return self._best
+
+
+def extract_json(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Одноразовий витяг JSON-об'єкта з повного тексту відповіді.
+    Швидкі шляхи (json.loads у C): весь текст або проміжок від першої "{" до
+    останньої "}" (```json блок, текст навколо). Якщо проміжок парситься - це
+    єдиний об'єкт верхнього рівня. Інакше - однопрохідний сканер.
+    """
+    if not text:
+        return None
+
+    first, last = text.find("{"), text.rfind("}")
+    if first == -1 or last < first:
+        return None
+
+    parsed = IncrementalJSONExtractor._loads(text[first : last + 1])
+    if isinstance(parsed, dict):
+        return parsed
+
+    extractor = IncrementalJSONExtractor(items_key=None)
+    extractor.feed(text[first : last + 1])
+    return extractor.result()
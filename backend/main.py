@@ -5,11 +5,15 @@ import json
 import logging
 import os
 import re
+import secrets
+import sys
 import time
-from collections import OrderedDict
-from contextlib import asynccontextmanager
-from dataclasses import dataclass
-from typing import Any, Awaitable, Callable, Dict, Generator, List, Optional, Set, Tuple
+from array import array
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Annotated, Any, Awaitable, Callable, Deque, Dict, Generator, Iterable, List, Literal, Optional, Set, Tuple
 from urllib.parse import urlparse
 
 import httpx
@@ -40,6 +44,7 @@ def _urlsafe_b64_to_json(b64: str) -> Optional[Any]:
 
 from dotenv import load_dotenv
 from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_scan
 from pydantic import BaseModel, Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from tenacity import (
@@ -49,6 +54,21 @@ from tenacity import (
     wait_exponential,
 )
 
+from categories import (
+    CATEGORY_CODES_FIELD,
+    CATEGORY_SCHEMA,
+    CategoryCentroidClassifier,
+    assign_category_codes,
+    category_codes_for,
+    find_matching_categories,
+    get_category_hierarchy,
+)
+from gpt_scheduler import GPTRateLimitedError, GPTScheduler, estimate_tokens, parse_retry_after
+from intent_router import IntentCentroidClassifier, IntentRouter
+from json_stream import extract_json
+from storage_backends import FLOAT_VECTOR_CODEC, JSON_CODEC, Codec, StorageBackend, create_storage_backend
+from suggest_index import SOURCE_QUERY, SOURCE_TITLE, SuggestIndex
+
 # Logging configuration
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("search-backend")
@@ -77,15 +97,169 @@ def log_performance_metrics(
         logger.info(f"⏱️ {operation} took {duration_ms:.1f}ms", extra=log_data)
 
 
-def _safe_chunks(text: str, chunk_size: int = 1) -> Generator[str, None, None]:
-    """Розбиває текст на чанки безпечно (по межах символів)"""
-    if not text:
-        return
-    
-    for i in range(0, len(text), chunk_size):
-        chunk = text[i:i + chunk_size]
-        if chunk:  # Перевірка на пустоту
-            yield chunk
+class PerfMetrics:
+    """In-process лічильники та гістограми продуктивності (для /metrics)"""
+
+    def __init__(self, reservoir_size: int = 512):
+        self.reservoir_size = reservoir_size
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Dict[str, Any]] = {}
+
+    def incr(self, name: str, value: float = 1.0) -> None:
+        self.counters[name] = self.counters.get(name, 0.0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        h = self.histograms.get(name)
+        if h is None:
+            h = {"count": 0, "sum": 0.0, "max": 0.0, "samples": deque(maxlen=self.reservoir_size)}
+            self.histograms[name] = h
+        h["count"] += 1
+        h["sum"] += value
+        h["max"] = max(h["max"], value)
+        h["samples"].append(value)
+
+    @staticmethod
+    def _percentile(sorted_values: List[float], pct: float) -> float:
+        if not sorted_values:
+            return 0.0
+        idx = min(len(sorted_values) - 1, int(round(pct * (len(sorted_values) - 1))))
+        return sorted_values[idx]
+
+    def snapshot(self) -> Dict[str, Any]:
+        histograms = {}
+        for name, h in self.histograms.items():
+            values = sorted(h["samples"])
+            histograms[name] = {
+                "count": h["count"],
+                "avg": round(h["sum"] / h["count"], 2) if h["count"] else 0.0,
+                "p50": round(self._percentile(values, 0.50), 2),
+                "p95": round(self._percentile(values, 0.95), 2),
+                "p99": round(self._percentile(values, 0.99), 2),
+                "max": round(h["max"], 2),
+            }
+        return {"counters": dict(self.counters), "histograms": histograms}
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.histograms.clear()
+
+
+metrics = PerfMetrics()
+
+# Per-request акумулятор GPT usage/таймінгів (заповнюється в GPTService._chat)
+_request_gpt_usage: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_gpt_usage", default=None)
+
+
+class Deadline:
+    """
+    Бюджет часу одного запиту. Створюється в ендпоінті й передається в кожен етап:
+    етап бере таймаут із залишку бюджету, а необов'язкову роботу пропускає.
+    """
+
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def allows(self, seconds: float) -> bool:
+        return self.remaining() >= seconds
+
+    def timeout(self, cap: float, reserve: float = 0.0) -> float:
+        """Таймаут етапу: не більше cap і не довше залишку (мінус резерв на наступні етапи)"""
+        return max(0.0, min(cap, self.remaining() - reserve))
+
+    @staticmethod
+    def miss(stage: str) -> None:
+        metrics.incr(f"deadline.miss.{stage}")
+        _mark_degraded()
+
+    @staticmethod
+    def skip(stage: str) -> None:
+        metrics.incr(f"deadline.skip.{stage}")
+        _mark_degraded()
+
+
+def _stage_timeout(deadline: Optional[Deadline], cap: float, reserve: float = 0.0) -> float:
+    return deadline.timeout(cap, reserve) if deadline is not None else cap
+
+
+class RequestTrace:
+    """
+    Спани етапів одного запиту (мс). Спани з однаковою назвою сумуються;
+    підзапити мають суфікс індексу (embed_1, knn_2), у гістограмах - спільну
+    назву stage.<етап>_subquery_ms.
+    """
+
+    def __init__(self):
+        self.spans: Dict[str, float] = {}
+        # Відповідь зібрана не повністю (пропущений етап, локальний fallback) - не кешуємо
+        self.degraded = False
+        # Етап GPT → tier відповіді (primary|fallback|local)
+        self.gpt_tiers: Dict[str, str] = {}
+
+    def add(self, name: str, duration_ms: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + duration_ms
+
+    @contextmanager
+    def span(self, name: str) -> Generator[None, None, None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def timings(self) -> Dict[str, float]:
+        return {name: round(ms, 2) for name, ms in self.spans.items()}
+
+    def server_timing(self) -> str:
+        """Значення заголовка Server-Timing: "gpt_analysis;dur=812.4, knn_1;dur=35.1" """
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.spans.items())
+
+    def observe(self) -> None:
+        for name, ms in self.spans.items():
+            metrics.observe(f"stage.{re.sub(r'_[0-9]+$', '_subquery', name)}_ms", ms)
+
+
+_request_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def _trace_span(name: str):
+    """Спан у трейсі поточного запиту; поза запитом - no-op"""
+    trace = _request_trace.get()
+    return trace.span(name) if trace is not None else nullcontext()
+
+
+def _trace_add(name: str, duration_ms: float) -> None:
+    trace = _request_trace.get()
+    if trace is not None:
+        trace.add(name, duration_ms)
+
+
+def _mark_degraded() -> None:
+    trace = _request_trace.get()
+    if trace is not None:
+        trace.degraded = True
+
+
+_WORD_RE = re.compile(r"\S+\s*|\s+")
+_SENTENCE_END = (".", "!", "?", "…", ":", "\n")
+
+
+def _text_chunks(text: str, target_chars: int = 48) -> Generator[str, None, None]:
+    """Чанки тексту по межах слів: слова об'єднуються до ~target_chars, кінець речення закриває чанк"""
+    buf: List[str] = []
+    size = 0
+    for match in _WORD_RE.finditer(text or ""):
+        word = match.group()
+        buf.append(word)
+        size += len(word)
+        if size >= target_chars or word.rstrip(" \t").endswith(_SENTENCE_END):
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
 
 
 # Settings
@@ -103,6 +277,7 @@ class Settings(BaseSettings):
     max_retries: int = Field(default=3, env="MAX_RETRIES")
     cache_ttl_seconds: int = Field(default=3600, env="CACHE_TTL_SECONDS")
     knn_num_candidates: int = Field(default=500, env="KNN_NUM_CANDIDATES")
+    es_search_timeout_seconds: float = Field(default=30.0, env="ES_SEARCH_TIMEOUT_SECONDS")
     hybrid_alpha: float = Field(default=0.7, env="HYBRID_ALPHA")
     hybrid_fusion: str = Field(default="weighted", env="HYBRID_FUSION")
     bm25_min_score: float = Field(default=2.5, env="BM25_MIN_SCORE")
@@ -110,11 +285,82 @@ class Settings(BaseSettings):
 
     # GPT
     openai_api_key: str = Field(default="", env="OPENAI_API_KEY")
+    openai_base_url: str = Field(default="https://api.openai.com/v1", env="OPENAI_BASE_URL")
     gpt_model: str = Field(default="gpt-4o-mini", env="GPT_MODEL")
     enable_gpt_chat: bool = Field(default=True, env="ENABLE_GPT_CHAT")
     gpt_temperature: float = Field(default=0.3, env="GPT_TEMPERATURE")
     gpt_analyze_timeout_seconds: float = Field(default=15.0, env="GPT_ANALYZE_TIMEOUT_SECONDS")
 
+    # Request deadline (наскрізний бюджет часу чат-запиту)
+    chat_request_budget_seconds: float = Field(default=25.0, env="CHAT_REQUEST_BUDGET_SECONDS")
+    deadline_analysis_reserve_seconds: float = Field(default=4.0, env="DEADLINE_ANALYSIS_RESERVE_SECONDS")
+    deadline_min_reco_seconds: float = Field(default=2.0, env="DEADLINE_MIN_RECO_SECONDS")
+    deadline_min_categorization_seconds: float = Field(default=0.5, env="DEADLINE_MIN_CATEGORIZATION_SECONDS")
+    ta_da_timeout_seconds: float = Field(default=20.0, env="TA_DA_TIMEOUT_SECONDS")
+
+    # Tiered execution: основна модель → (після soft deadline) GPT_FALLBACK_MODEL → (після hard timeout) локальний fallback
+    enable_gpt_hedging: bool = Field(default=True, env="ENABLE_GPT_HEDGING")
+    gpt_fallback_model: str = Field(default="", env="GPT_FALLBACK_MODEL")
+    gpt_analyze_soft_deadline_seconds: float = Field(default=4.0, env="GPT_ANALYZE_SOFT_DEADLINE_SECONDS")
+    gpt_reco_soft_deadline_seconds: float = Field(default=8.0, env="GPT_RECO_SOFT_DEADLINE_SECONDS")
+
+    # Assistant response cache
+    enable_assistant_cache: bool = Field(default=True, env="ENABLE_ASSISTANT_CACHE")
+    assistant_cache_size: int = Field(default=5000, env="ASSISTANT_CACHE_SIZE")
+    assistant_cache_ttl_seconds: int = Field(default=6 * 3600, env="ASSISTANT_CACHE_TTL_SECONDS")
+    assistant_cache_path: str = Field(default="", env="ASSISTANT_CACHE_PATH")
+
+    # Recommendation cache (query + candidate set, invalidated by index generation)
+    enable_reco_cache: bool = Field(default=True, env="ENABLE_RECO_CACHE")
+    reco_cache_size: int = Field(default=2000, env="RECO_CACHE_SIZE")
+    reco_cache_ttl_seconds: int = Field(default=24 * 3600, env="RECO_CACHE_TTL_SECONDS")
+    reco_cache_min_overlap: float = Field(default=0.8, env="RECO_CACHE_MIN_OVERLAP")
+    index_generation_refresh_seconds: int = Field(default=60, env="INDEX_GENERATION_REFRESH_SECONDS")
+
+    # Full chat-result cache for context-free queries (stale-while-revalidate)
+    enable_result_cache: bool = Field(default=True, env="ENABLE_RESULT_CACHE")
+    result_cache_size: int = Field(default=1000, env="RESULT_CACHE_SIZE")
+    result_cache_fresh_seconds: int = Field(default=15 * 60, env="RESULT_CACHE_FRESH_SECONDS")
+    result_cache_ttl_seconds: int = Field(default=6 * 3600, env="RESULT_CACHE_TTL_SECONDS")
+
+    # Vector category classifier (centroids from build_category_centroids.py); keywords stay as fallback
+    category_centroids_path: str = Field(default="", env="CATEGORY_CENTROIDS_PATH")
+    category_centroid_min_similarity: Optional[float] = Field(default=None, env="CATEGORY_CENTROID_MIN_SIMILARITY")
+    category_centroid_min_margin: Optional[float] = Field(default=None, env="CATEGORY_CENTROID_MIN_MARGIN")
+
+    # Typeahead /suggest: назви товарів + популярні запити з логів
+    enable_suggest: bool = Field(default=True, env="ENABLE_SUGGEST")
+    suggest_limit: int = Field(default=8, env="SUGGEST_LIMIT")
+    suggest_max_catalog_titles: int = Field(default=200000, env="SUGGEST_MAX_CATALOG_TITLES")
+    suggest_max_logged_queries: int = Field(default=5000, env="SUGGEST_MAX_LOGGED_QUERIES")
+    # Вага одного успішного запиту відносно одного товару з такою назвою
+    suggest_query_weight: float = Field(default=5.0, env="SUGGEST_QUERY_WEIGHT")
+    # Запит відвідувача стає підказкою для всіх лише після N різних сесій (розмов)
+    suggest_min_query_sessions: int = Field(default=3, env="SUGGEST_MIN_QUERY_SESSIONS")
+
+    # /chat/search/batch: офлайн-оцінка та прогрів кешів
+    batch_max_queries: int = Field(default=2000, env="BATCH_MAX_QUERIES")
+    batch_concurrency: int = Field(default=8, env="BATCH_CONCURRENCY")
+    batch_gpt_concurrency: int = Field(default=4, env="BATCH_GPT_CONCURRENCY")
+    batch_msearch_max: int = Field(default=64, env="BATCH_MSEARCH_MAX")
+    batch_msearch_window_ms: float = Field(default=5.0, env="BATCH_MSEARCH_WINDOW_MS")
+    # Операторський токен /chat/search/batch (Authorization: Bearer ...); порожньо - без перевірки
+    batch_api_token: str = Field(default="", env="BATCH_API_TOKEN")
+
+    # Local intent router (skips GPT for obvious queries)
+    enable_intent_router: bool = Field(default=True, env="ENABLE_INTENT_ROUTER")
+    intent_router_min_similarity: float = Field(default=0.55, env="INTENT_ROUTER_MIN_SIMILARITY")
+    intent_router_min_margin: float = Field(default=0.05, env="INTENT_ROUTER_MIN_MARGIN")
+    intent_router_min_examples: int = Field(default=20, env="INTENT_ROUTER_MIN_EXAMPLES")
+    intent_router_max_examples: int = Field(default=2000, env="INTENT_ROUTER_MAX_EXAMPLES")
+    intent_router_embed_timeout_seconds: float = Field(default=2.0, env="INTENT_ROUTER_EMBED_TIMEOUT_SECONDS")
+    intent_router_rebuild_interval_seconds: int = Field(default=3600, env="INTENT_ROUTER_REBUILD_INTERVAL_SECONDS")
+
+    # OpenAI rate limits (планувальник запитів)
+    enable_gpt_scheduler: bool = Field(default=True, env="ENABLE_GPT_SCHEDULER")
+    openai_rpm_limit: int = Field(default=500, env="OPENAI_RPM_LIMIT")
+    openai_tpm_limit: int = Field(default=200000, env="OPENAI_TPM_LIMIT")
+
     # Tokens
     gpt_max_tokens_analyze: int = Field(default=2000, env="GPT_MAX_TOKENS_ANALYZE")
     gpt_max_tokens_reco: int = Field(default=2500, env="GPT_MAX_TOKENS_RECO")
@@ -126,7 +372,9 @@ class Settings(BaseSettings):
 
     # History
     search_history_ttl_days: int = Field(default=7, env="SEARCH_HISTORY_TTL_DAYS")
+    # Кільцевий буфер історії на розмову (conversation_id) і ліміт розмов у пам'яті процесу
     max_search_history: int = Field(default=20, env="MAX_SEARCH_HISTORY")
+    max_history_conversations: int = Field(default=10000, env="MAX_HISTORY_CONVERSATIONS")
     max_chat_display_items: int = Field(default=100, env="MAX_CHAT_DISPLAY_ITEMS")
 
     # Lazy loading settings
@@ -134,6 +382,19 @@ class Settings(BaseSettings):
     load_more_batch_size: int = Field(default=20, env="LOAD_MORE_BATCH_SIZE")
     search_results_ttl_seconds: int = Field(default=3600, env="SEARCH_RESULTS_TTL_SECONDS")
     max_sessions: int = Field(default=300, env="MAX_SEARCH_SESSIONS")
+    # dialog_context між раундами чату: клієнт передає короткий dialog_token замість base64 у URL
+    dialog_state_ttl_seconds: int = Field(default=3600, env="DIALOG_STATE_TTL_SECONDS")
+    dialog_state_cache_size: int = Field(default=10000, env="DIALOG_STATE_CACHE_SIZE")
+
+    # Спільний стан для кількох воркерів/реплік: memory (у процесі) | sqlite (одна машина) | redis
+    storage_backend: str = Field(default="memory", env="STORAGE_BACKEND")
+    storage_sqlite_path: str = Field(default="search_logs/shared_state.sqlite3", env="STORAGE_SQLITE_PATH")
+    storage_redis_url: str = Field(default="redis://localhost:6379/0", env="STORAGE_REDIS_URL")
+    storage_redis_key_prefix: str = Field(default="tada:", env="STORAGE_REDIS_KEY_PREFIX")
+    # Які кеші тримати у спільному сховищі (сесії - завжди, якщо воно задане)
+    storage_shared_caches_csv: str = Field(
+        default="embedding_cache,assistant_cache,reco_cache,result_cache", env="STORAGE_SHARED_CACHES"
+    )
 
     # Embedding concurrency settings
     embedding_max_concurrent: int = Field(default=2, env="EMBEDDING_MAX_CONCURRENT")
@@ -144,10 +405,15 @@ class Settings(BaseSettings):
     chat_search_min_score_absolute: float = Field(default=0.35, env="CHAT_SEARCH_MIN_SCORE_ABSOLUTE")
     chat_search_subquery_weight_decay: float = Field(default=0.85, env="CHAT_SEARCH_SUBQUERY_WEIGHT_DECAY")
     chat_search_max_k_per_subquery: int = Field(default=25, env="CHAT_SEARCH_MAX_K_PER_SUBQUERY")
+    enable_speculative_retrieval: bool = Field(default=True, env="ENABLE_SPECULATIVE_RETRIEVAL")
+    enable_category_fast_path: bool = Field(default=True, env="ENABLE_CATEGORY_FAST_PATH")
     
     # SSE settings
     sse_slow_mode: bool = Field(default=False, env="SSE_SLOW_MODE")
     sse_delay_seconds: float = Field(default=0.02, env="SSE_DELAY_SECONDS")
+    # assistant_delta: фрагменти по межах слів/речень ~N символів
+    sse_chunk_chars: int = Field(default=48, env="SSE_CHUNK_CHARS")
+    sse_progressive_mode: bool = Field(default=True, env="SSE_PROGRESSIVE_MODE")
 
     # TA-DA external API proxy
     ta_da_api_base_url: str = Field(default="https://api.ta-da.net.ua/v1.2/mobile", env="TA_DA_API_BASE_URL")
@@ -207,8 +473,18 @@ class Dependencies:
     es_client: Optional[AsyncElasticsearch] = None
     http_client: Optional[httpx.AsyncClient] = None
     embedding_cache: Optional["TTLCache"] = None
+    assistant_cache: Optional["TTLCache"] = None
+    reco_cache: Optional["TTLCache"] = None
+    result_cache: Optional["TTLCache"] = None
+    dialog_state_cache: Optional["TTLCache"] = None
+    storage_backend: Optional[StorageBackend] = None
+    index_generation: str = ""
     gpt_service: Optional["GPTService"] = None
     context_manager: Optional["SearchContextManager"] = None
+    intent_router: Optional[IntentRouter] = None
+    category_classifier: Optional[CategoryCentroidClassifier] = None
+    suggest_index: Optional[SuggestIndex] = None
+    gpt_scheduler: Optional[GPTScheduler] = None
 
 
 dependencies = Dependencies()
@@ -216,25 +492,75 @@ dependencies = Dependencies()
 
 # TTL Cache
 class TTLCache:
-    def __init__(self, capacity: int = 1000, ttl_seconds: int = 3600):
+    """
+    LRU-кеш з TTL у пам'яті процесу; з backend - записи у спільному сховищі (ключ "<name>:<key>",
+    значення через codec), тоді кеш спільний для всіх воркерів. Помилка сховища - промах, а не збій запиту.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1000,
+        ttl_seconds: int = 3600,
+        name: Optional[str] = None,
+        backend: Optional[StorageBackend] = None,
+        codec: Codec = JSON_CODEC,
+    ):
         self.capacity = capacity
         self.ttl_seconds = ttl_seconds
+        self.name = name
         self.cache: OrderedDict = OrderedDict()
         self.timestamps: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
         self._lock = asyncio.Lock()
+        self.backend = backend
+        self.codec = codec
+        self._prefix = f"{name or 'cache'}:"
+        # Розмір у спільному сховищі на момент останнього cleanup_expired
+        self._backend_size = 0
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.name:
+            metrics.incr(f"{self.name}.{'hits' if hit else 'misses'}")
+
+    def _backend_error(self, op: str, e: Exception) -> None:
+        metrics.incr(f"{self.name or 'cache'}.backend_errors")
+        logger.warning(f"Cache {self.name} {op} failed ({self.backend.name}): {e}")
 
     async def get(self, key: str) -> Optional[Any]:
+        if self.backend is not None:
+            try:
+                raw = await self.backend.get(self._prefix + key)
+                value = self.codec.decode(raw) if raw is not None else None
+            except Exception as e:
+                self._backend_error("get", e)
+                value = None
+            self._record(value is not None)
+            return value
         async with self._lock:
             if key not in self.cache:
+                self._record(False)
                 return None
             if time.time() - self.timestamps.get(key, 0) > self.ttl_seconds:
                 self.cache.pop(key, None)
                 self.timestamps.pop(key, None)
+                self._record(False)
                 return None
             self.cache.move_to_end(key)
+            self._record(True)
             return self.cache[key]
 
     async def put(self, key: str, value: Any) -> None:
+        if self.backend is not None:
+            try:
+                await self.backend.set(self._prefix + key, self.codec.encode(value), self.ttl_seconds)
+            except Exception as e:
+                self._backend_error("put", e)
+            return
         async with self._lock:
             now = time.time()
             if key in self.cache:
@@ -246,6 +572,12 @@ class TTLCache:
                 self.timestamps.pop(oldest_key, None)
 
     async def cleanup_expired(self) -> int:
+        if self.backend is not None:
+            # Ємність у спільному сховищі тримається тут, а не при кожному put
+            removed = await self.backend.cleanup_expired(self._prefix)
+            removed += await self.backend.trim(self._prefix, self.capacity)
+            self._backend_size = await self.backend.count(self._prefix)
+            return removed
         async with self._lock:
             now = time.time()
             expired_keys = [k for k, t in self.timestamps.items() if now - t > self.ttl_seconds]
@@ -255,12 +587,78 @@ class TTLCache:
             return len(expired_keys)
 
     async def clear(self) -> None:
+        if self.backend is not None:
+            await self.backend.clear(self._prefix)
+            self._backend_size = 0
+            return
         async with self._lock:
             self.cache.clear()
             self.timestamps.clear()
 
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "backend": self.backend.name if self.backend is not None else "memory",
+            "capacity": self.capacity,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    async def save_to_file(self, path: str) -> int:
+        """Зберігає непрострочені записи у JSON (атомарно через tmp-файл); спільне сховище не потребує"""
+        if self.backend is not None:
+            return 0
+        async with self._lock:
+            now = time.time()
+            entries = [
+                [k, self.timestamps.get(k, now), v]
+                for k, v in self.cache.items()
+                if now - self.timestamps.get(k, 0) <= self.ttl_seconds
+            ]
+
+        def _write() -> None:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+        await asyncio.to_thread(_write)
+        return len(entries)
+
+    async def load_from_file(self, path: str) -> int:
+        """Відновлює записи з JSON, зберігаючи їх початковий час створення"""
+        if self.backend is not None or not os.path.exists(path):
+            return 0
+
+        def _read() -> List[Any]:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        try:
+            entries = await asyncio.to_thread(_read)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load cache from {path}: {e}")
+            return 0
+
+        loaded = 0
+        async with self._lock:
+            now = time.time()
+            for entry in entries[-self.capacity :]:
+                if not isinstance(entry, list) or len(entry) != 3:
+                    continue
+                key, ts, value = entry
+                if now - float(ts) > self.ttl_seconds:
+                    continue
+                self.cache[key] = value
+                self.timestamps[key] = float(ts)
+                loaded += 1
+        return loaded
+
     def __len__(self) -> int:
-        return len(self.cache)
+        return self._backend_size if self.backend is not None else len(self.cache)
 
 
 # Pydantic Models
@@ -290,6 +688,7 @@ class SearchResult(BaseModel):
     weight: Optional[float] = None
     availability: bool = True
     highlight: Optional[Dict[str, List[str]]] = None
+    category_codes: Optional[List[str]] = None
 
     @classmethod
     def from_hit(cls, hit: Dict[str, Any]) -> "SearchResult":
@@ -313,6 +712,7 @@ class SearchResult(BaseModel):
             weight=src.get("weight"),
             availability=src.get("availability", True),
             highlight=hit.get("highlight"),
+            category_codes=src.get(CATEGORY_CODES_FIELD),
         )
 
 
@@ -353,15 +753,33 @@ class SearchHistoryItem(BaseModel):
     keywords: List[str] = Field(default_factory=list)
     timestamp: float
     results_count: int = 0
+    # Раунд без пошуку товарів (greeting|clarification|invalid) теж у історії: уточнення спирається на нього
+    action: str = "product_search"
 
 
 class ChatSearchRequest(BaseModel):
     query: str = Field(min_length=1, max_length=500)
+    # Порожня історія + conversation_id - береться історія розмови з сервера
     search_history: List[SearchHistoryItem] = Field(default_factory=list)
+    conversation_id: Optional[str] = Field(default=None, max_length=100)
     session_id: str
     k: int = Field(default=50, ge=1, le=200)
+    # dialog_token з попередньої відповіді має пріоритет над dialog_context (старі клієнти)
     dialog_context: Optional[Dict[str, Any]] = None
+    dialog_token: Optional[str] = Field(default=None, max_length=64)
     selected_category: Optional[str] = Field(default=None)
+    # Персоналізований контекст: не брати і не класти відповідь у кеш результатів
+    bypass_cache: bool = Field(default=False)
+
+
+class ChatSearchBatchRequest(BaseModel):
+    queries: List[Annotated[str, Field(max_length=500)]] = Field(min_length=1)
+    k: int = Field(default=50, ge=1, le=200)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=16)
+    # use - як звичайний запит; bypass - без кешу відповідей; refresh - перерахувати і покласти в кеш
+    cache_mode: Literal["use", "bypass", "refresh"] = Field(default="use")
+    # Лише id/score товарів замість назв (для великих оцінок)
+    compact: bool = Field(default=False)
 
 
 class LoadMoreRequest(BaseModel):
@@ -400,169 +818,65 @@ class ChatSearchResponse(BaseModel):
     assistant_message: Optional[str] = None
     dialog_state: Optional[str] = None
     dialog_context: Optional[Dict[str, Any]] = None
+    dialog_token: Optional[str] = None
     needs_user_input: bool = True
     actions: Optional[List[Dict[str, Any]]] = Field(default=None)
     categories: Optional[List[Dict[str, Any]]] = Field(default=None)
     stage_timings_ms: Optional[Dict[str, float]] = Field(default=None)
 
 
-# 🎯 ПОКРАЩЕНА СИСТЕМА КАТЕГОРІЙ (на основі реального асортименту TA-DA)
-CATEGORY_SCHEMA: Dict[str, Dict[str, Any]] = {
-    # ОДЯГ
-    "clothing": {
-        "label": "Одяг",
-        "emoji": "👕",
-        "keywords": [
-            "одяг",
-            "одежд",
-            "футболк",
-            "сороч",
-            "штан",
-            "брюк",
-            "джинс",
-            "куртк",
-            "кофт",
-            "светр",
-            "худі",
-            "платт",
-            "сукн",
-            "спідниц",
-        ],
-        "parent": None,
-    },
-    "clothing_men": {"label": "Чоловічий одяг", "emoji": "👔", "keywords": ["чоловіч", "мужск"], "parent": "clothing"},
-    "clothing_women": {"label": "Жіночий одяг", "emoji": "👗", "keywords": ["жіноч", "женск"], "parent": "clothing"},
-    "clothing_kids": {
-        "label": "Дитячий одяг",
-        "emoji": "👶",
-        "keywords": ["дитяч", "детск", "для хлопчик", "для дівчинк"],
-        "parent": "clothing",
-    },
-    # ВЗУТТЯ
-    "footwear": {
-        "label": "Взуття",
-        "emoji": "👟",
-        "keywords": ["взутт", "обув", "капці", "тапочк", "шльопанц", "черевик", "чобіт", "кросівк", "туфл", "босоніжк"],
-        "parent": None,
-    },
-    # АКСЕСУАРИ
-    "accessories": {
-        "label": "Аксесуари",
-        "emoji": "🧦",
-        "keywords": [
-            "шкарп",
-            "носк",
-            "колгот",
-            "панчох",
-            "шапк",
-            "шарф",
-            "рукавиц",
-            "перчатк",
-            "ремін",
-            "пояс",
-            "сумк",
-            "рюкзак",
-        ],
-        "parent": None,
-    },
-    # ІГРАШКИ
-    "toys": {
-        "label": "Іграшки",
-        "emoji": "🧸",
-        "keywords": ["іграш", "игруш", "ляльк", "кукл", "машинк", "конструктор", "пазл", "м'яч", "плюш"],
-        "parent": None,
-    },
-    "toys_educational": {
-        "label": "Розвиваючі іграшки",
-        "emoji": "🎓",
-        "keywords": ["розвива", "навчал", "освітн"],
-        "parent": "toys",
-    },
-    # КУХНЯ
-    "kitchen": {
-        "label": "Кухонні товари",
-        "emoji": "🍳",
-        "keywords": ["посуд", "кухн", "кастр", "сковор", "таріл", "чашк", "келих", "ложк", "вилк", "ніж"],
-        "parent": None,
-    },
-    # ПОБУТОВА ХІМІЯ
-    "household": {
-        "label": "Побутова хімія",
-        "emoji": "🧹",
-        "keywords": ["миюч", "чист", "прання", "засіб", "порошок", "гель", "швабр", "щітк", "губк", "ганчір"],
-        "parent": None,
-    },
-    # КОСМЕТИКА
-    "cosmetics": {
-        "label": "Косметика та гігієна",
-        "emoji": "💄",
-        "keywords": ["косметик", "гігієн", "шампун", "мило", "крем", "зубн паст", "дезодоран"],
-        "parent": None,
-    },
-    # КАНЦЕЛЯРІЯ
-    "stationery": {
-        "label": "Канцелярія",
-        "emoji": "✏️",
-        "keywords": ["зошит", "ручк", "олівц", "карандаш", "пенал", "папір", "блокнот", "фарб", "маркер"],
-        "parent": None,
-    },
-    # ДЛЯ ДОМУ
-    "home": {
-        "label": "Товари для дому",
-        "emoji": "🏠",
-        "keywords": ["для дому", "домашн", "декор", "текстиль", "рушник", "постільн", "подушк", "ковдр"],
-        "parent": None,
-    },
-    # СПЕЦІАЛЬНА КАТЕГОРІЯ
-    "recommended": {
-        "label": "⭐ Рекомендовано для вас",
-        "emoji": "⭐",
-        "keywords": [],
-        "parent": None,
-        "special": True,
-    },
-}
-
-
-def _get_category_hierarchy() -> Dict[str, List[str]]:
-    """Повертає ієрархію категорій (батько -> діти)"""
-    hierarchy: Dict[str, List[str]] = {}
-    for code, data in CATEGORY_SCHEMA.items():
-        parent = data.get("parent")
-        if parent:
-            hierarchy.setdefault(parent, []).append(code)
-    return hierarchy
-
-
-def _find_matching_categories(text: str, top_n: int = 3) -> List[str]:
-    """Знаходить найбільш релевантні категорії для тексту"""
-    text_lower = text.lower()
-    scores: Dict[str, int] = {}
-
-    for code, data in CATEGORY_SCHEMA.items():
-        if data.get("special"):  # Пропускаємо спеціальні категорії
-            continue
-        score = 0
-        for keyword in data.get("keywords", []):
-            if keyword in text_lower:
-                score += 1
-        if score > 0:
-            scores[code] = score
-
-    # Сортуємо за кількістю збігів
-    sorted_codes = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-    return [code for code, _ in sorted_codes[:top_n]]
-
-
-def _assign_category_code(sr: "SearchResult") -> Optional[str]:
-    """Автоматично присвоює категорію товару"""
-    text = " ".join(filter(None, [sr.title_ua, sr.title_ru, sr.description_ua, sr.description_ru])).lower()
+def _assign_category_codes(products: List["SearchResult"]) -> List[Optional[str]]:
+    """
+    Категорії товарів: коди з індексу (reindex_products.py), для решти -
+    один пакетний прохід автомата ключових слів.
+    """
+    # [] - товар проіндексовано, але жодна категорія не підійшла
+    codes = [(p.category_codes[0] if p.category_codes else None) for p in products]
+    missing = [i for i, p in enumerate(products) if p.category_codes is None]
+    if missing:
+        metrics.incr("categories.computed_at_query", len(missing))
+        computed = assign_category_codes(
+            [
+                (products[i].title_ua, products[i].title_ru, products[i].description_ua, products[i].description_ru)
+                for i in missing
+            ]
+        )
+        for i, code in zip(missing, computed):
+            codes[i] = code
+    return codes
 
-    if not text:
-        return None
 
-    matches = _find_matching_categories(text, top_n=1)
-    return matches[0] if matches else None
+async def _classify_by_centroids(
+    products: List["SearchResult"], es_service: "ElasticsearchService", deadline: Optional[Deadline] = None
+) -> None:
+    """
+    Категорії за векторами для товарів без кодів з індексу: один mget векторів
+    і один матричний добуток з центроїдами. Невпевнені товари лишаються для
+    ключових слів (_assign_category_codes).
+    """
+    classifier = dependencies.category_classifier
+    pending = [p for p in products if not p.category_codes]
+    if classifier is None or not pending:
+        return
+    with _trace_span("category_centroids"):
+        try:
+            vectors = await es_service.get_vectors(
+                [p.id for p in pending], timeout=_stage_timeout(deadline, settings.es_search_timeout_seconds)
+            )
+        except asyncio.TimeoutError:
+            # Без векторів - лише ключові слова
+            Deadline.skip("categorization")
+            logger.warning("⏱️ Category centroids skipped: request deadline reached")
+            return
+        pending = [p for p in pending if p.id in vectors]
+        predictions = classifier.classify_batch([vectors[p.id] for p in pending])
+    assigned = 0
+    for p, prediction in zip(pending, predictions):
+        if prediction is not None:
+            p.category_codes = category_codes_for(prediction[0])
+            assigned += 1
+    metrics.incr("categories.centroid_assigned", assigned)
+    metrics.incr("categories.centroid_unsure", len(pending) - assigned)
 
 
 def _aggregate_categories(
@@ -570,13 +884,12 @@ def _aggregate_categories(
 ) -> Tuple[Dict[str, List[SearchResult]], List[Tuple[str, int]]]:
     """Групує товари по категоріям"""
     buckets: Dict[str, List[SearchResult]] = {}
-    for p in products:
-        code = _assign_category_code(p)
+    for p, code in zip(products, _assign_category_codes(products)):
         if code:
             buckets.setdefault(code, []).append(p)
 
     # Якщо товарів багато в дочірніх категоріях - об'єднуємо в батьківську
-    hierarchy = _get_category_hierarchy()
+    hierarchy = get_category_hierarchy()
     for parent, children in hierarchy.items():
         child_count = sum(len(buckets.get(child, [])) for child in children)
         parent_count = len(buckets.get(parent, []))
@@ -632,6 +945,50 @@ def _build_human_reason(query: str, sr: "SearchResult") -> str:
     return "Відповідає вашому запиту"
 
 
+def _normalize_query(query: str) -> str:
+    """Нормалізує запит для ключів кешу (регістр, пробіли, крайня пунктуація)"""
+    normalized = re.sub(r"\s+", " ", (query or "").lower()).strip()
+    return normalized.strip(" .,!?;:…\"'«»")
+
+
+def _assistant_cache_key(
+    query: str, search_history: List["SearchHistoryItem"], dialog_context: Optional[Dict[str, Any]]
+) -> str:
+    """Ключ кешу асистента: тільки ті частини контексту, які реально потрапляють у промпт"""
+    recent = [
+        [_normalize_query(h.query), h.results_count] + ([h.action] if h.action != "product_search" else [])
+        for h in (search_history or [])[-3:]
+    ]
+    base = json.dumps(
+        {
+            "model": settings.gpt_model,
+            "query": _normalize_query(query),
+            "history": recent,
+            "clarification": bool(dialog_context and dialog_context.get("clarification_asked")),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.md5(base.encode("utf-8")).hexdigest()
+
+
+def _reco_cache_key(query: str, index_generation: str) -> str:
+    """Ключ кешу рекомендацій: модель + версія індексу + нормалізований запит"""
+    base = f"{settings.gpt_model}|{index_generation}|{_normalize_query(query)}"
+    return hashlib.md5(base.encode("utf-8")).hexdigest()
+
+
+def _result_cache_key(query: str, k: int, index_generation: str) -> str:
+    """Ключ кешу повної відповіді чату (лише для запитів без історії та фільтра)"""
+    base = f"{settings.gpt_model}|{index_generation}|{k}|{_normalize_query(query)}"
+    return hashlib.md5(base.encode("utf-8")).hexdigest()
+
+
+def _candidate_fingerprint(candidate_ids: List[str]) -> str:
+    """Хеш впорядкованого списку кандидатів, які бачив GPT"""
+    return hashlib.md5("|".join(candidate_ids).encode("utf-8")).hexdigest()
+
+
 def _validate_query_basic(query: str) -> Tuple[bool, Optional[str]]:
     """Базова валідація запиту"""
     if not query or not query.strip():
@@ -655,52 +1012,23 @@ def _validate_query_basic(query: str) -> Tuple[bool, Optional[str]]:
 
 
 def _extract_json_safely(text: str) -> Dict[str, Any]:
-    """Витягує JSON з відповіді GPT"""
+    """Витягує JSON з відповіді GPT (один прохід, див. json_stream)"""
     if not text:
         return {}
 
-    # Спробувати code block
-    match = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(1))
-        except json.JSONDecodeError:
-            pass
-
-    # Знайти JSON об'єкт
-    stack, start_index = [], -1
-    best_json = {}
-    max_len = 0
-
-    for i, char in enumerate(text):
-        if char == "{":
-            if not stack:
-                start_index = i
-            stack.append("{")
-        elif char == "}":
-            if stack:
-                stack.pop()
-                if not stack and start_index != -1:
-                    substring = text[start_index : i + 1]
-                    try:
-                        parsed = json.loads(substring)
-                        if len(substring) > max_len:
-                            best_json, max_len = parsed, len(substring)
-                    except json.JSONDecodeError:
-                        continue
-
-    if best_json:
-        return best_json
+    parsed = extract_json(text)
+    if parsed is not None:
+        return parsed
 
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        logger.warning(f"Failed to extract JSON: {text[:200]}...")
-        return {}
+    logger.warning(f"Failed to extract JSON: {text[:200]}...")
+    return {}
 
 
 # Services
 class EmbeddingService:
+    # Спільні для всіх інстансів (сервіс створюється на кожен запит)
+    _inflight: Dict[str, "asyncio.Task[Optional[List[float]]]"] = {}
+
     def __init__(self, http_client: httpx.AsyncClient, cache: TTLCache):
         self.http_client = http_client
         self.cache = cache
@@ -762,7 +1090,7 @@ class EmbeddingService:
             logger.error(f"Failed to call embedding API: {last_exc}")
         return None
 
-    async def generate_embedding(self, text: str) -> Optional[List[float]]:
+    async def generate_embedding(self, text: str, deadline: Optional[Deadline] = None) -> Optional[List[float]]:
         text = (text or "").strip()
         if not text:
             return None
@@ -773,6 +1101,26 @@ class EmbeddingService:
             logger.debug("Embedding cache hit")
             return cached
 
+        # Один запит до Ollama на текст, навіть якщо його одночасно чекають кілька споживачів
+        # (роутер, спекулятивний пошук, основний пайплайн). shield: скасування одного
+        # споживача не скасовує генерацію для інших, а результат все одно потрапить у кеш.
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate_uncached(key, text))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        if deadline is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(task), timeout=deadline.timeout(settings.embedding_single_timeout)
+            )
+        except asyncio.TimeoutError:
+            Deadline.miss("embedding")
+            logger.warning("⏱️ Embedding skipped: request deadline reached")
+            return None
+
+    async def _generate_uncached(self, key: str, text: str) -> Optional[List[float]]:
         try:
             t0 = time.time()
             emb = await asyncio.wait_for(self._call_ollama_api(text), timeout=settings.embedding_single_timeout)
@@ -788,7 +1136,7 @@ class EmbeddingService:
         return None
 
     async def generate_embeddings_parallel(
-        self, texts: List[str], max_concurrent: Optional[int] = None
+        self, texts: List[str], max_concurrent: Optional[int] = None, deadline: Optional[Deadline] = None
     ) -> List[Optional[List[float]]]:
         if not texts:
             return []
@@ -796,11 +1144,12 @@ class EmbeddingService:
         max_concurrent = max_concurrent or settings.embedding_max_concurrent
         semaphore = asyncio.Semaphore(max_concurrent)
 
-        async def generate_with_semaphore(text: str) -> Optional[List[float]]:
+        async def generate_with_semaphore(index: int, text: str) -> Optional[List[float]]:
             async with semaphore:
-                return await self.generate_embedding(text)
+                with _trace_span(f"embed_{index}"):
+                    return await self.generate_embedding(text, deadline)
 
-        tasks = [generate_with_semaphore(text) for text in texts]
+        tasks = [generate_with_semaphore(i, text) for i, text in enumerate(texts, 1)]
         embeddings = await asyncio.gather(*tasks, return_exceptions=True)
 
         result = []
@@ -822,6 +1171,26 @@ class EmbeddingService:
         return result
 
 
+PRODUCT_SOURCE_FIELDS = [
+    "title_ua",
+    "title_ru",
+    "description_ua",
+    "description_ru",
+    "sku",
+    "good_code",
+    "uktzed",
+    "measurement_unit_ua",
+    "vat",
+    "discounted",
+    "height",
+    "width",
+    "length",
+    "weight",
+    "availability",
+    CATEGORY_CODES_FIELD,
+]
+
+
 class ElasticsearchService:
     def __init__(self, es_client: AsyncElasticsearch):
         self.es_client = es_client
@@ -843,25 +1212,24 @@ class ElasticsearchService:
                 logger.error(f"kNN search failed (both modes): {e1} | {e2}")
                 return []
 
-    async def semantic_search(self, query_vector: List[float], k: int = 10) -> List[Dict]:
+    async def semantic_search(
+        self, query_vector: List[float], k: int = 10, deadline: Optional[Deadline] = None
+    ) -> List[Dict]:
+        # У пакетному режимі kNN конкурентних запитів збираються в один _msearch
+        batch = _request_batch.get()
+        search = batch.knn.search(query_vector, k) if batch is not None else self._semantic_search(query_vector, k)
+        if deadline is None:
+            return await search
         try:
-            _source = [
-                "title_ua",
-                "title_ru",
-                "description_ua",
-                "description_ru",
-                "sku",
-                "good_code",
-                "uktzed",
-                "measurement_unit_ua",
-                "vat",
-                "discounted",
-                "height",
-                "width",
-                "length",
-                "weight",
-                "availability",
-            ]
+            return await asyncio.wait_for(search, timeout=deadline.timeout(settings.es_search_timeout_seconds))
+        except asyncio.TimeoutError:
+            Deadline.miss("es")
+            logger.warning("⏱️ kNN search skipped: request deadline reached")
+            return []
+
+    async def _semantic_search(self, query_vector: List[float], k: int = 10) -> List[Dict]:
+        try:
+            _source = PRODUCT_SOURCE_FIELDS
             search_params = {
                 "index": settings.index_name,
                 "size": k,
@@ -885,54 +1253,141 @@ class ElasticsearchService:
             logger.error(f"Semantic search error: {e}")
             return []
 
+    @staticmethod
+    def _knn_body(query_vector: List[float], k: int) -> Dict[str, Any]:
+        return {
+            "size": k,
+            "query": {
+                "knn": {
+                    "field": settings.vector_field_name,
+                    "query_vector": query_vector,
+                    "k": k,
+                    "num_candidates": min(settings.knn_num_candidates, max(100, k * 20)),
+                }
+            },
+            "_source": PRODUCT_SOURCE_FIELDS,
+        }
+
+    async def msearch_knn(self, queries: List[Tuple[List[float], int]]) -> List[List[Dict]]:
+        """kNN для багатьох векторів одним _msearch; помилкові елементи - окремим пошуком"""
+        if not queries:
+            return []
+        searches: List[Dict[str, Any]] = []
+        for vector, k in queries:
+            searches.extend(({"index": settings.index_name}, self._knn_body(vector, k)))
+        try:
+            res = await self.es_client.msearch(searches=searches)
+            responses = res.get("responses", [])
+        except Exception as e:
+            logger.warning(f"msearch failed, falling back to single searches: {e}")
+            responses = []
+
+        results: List[Optional[List[Dict]]] = [None] * len(queries)
+        for i, item in enumerate(responses[: len(queries)]):
+            if "error" not in item:
+                results[i] = item.get("hits", {}).get("hits", [])
+        failed = [i for i, hits in enumerate(results) if hits is None]
+        if failed:
+            metrics.incr("es.msearch_fallbacks", len(failed))
+            fallback = await asyncio.gather(*(self._semantic_search(*queries[i]) for i in failed))
+            for i, hits in zip(failed, fallback):
+                results[i] = hits
+        return [hits or [] for hits in results]
+
+    async def get_by_ids(self, ids: List[str]) -> List[Dict]:
+        """Документи за id (mget) у порядку ids; відсутні пропускаються"""
+        if not ids:
+            return []
+        try:
+            res = await self.es_client.mget(index=settings.index_name, ids=ids, _source=PRODUCT_SOURCE_FIELDS)
+            return [doc for doc in res.get("docs", []) if doc.get("found")]
+        except Exception as e:
+            logger.error(f"mget error: {e}")
+            return []
+
+    async def scan_titles(self, limit: int) -> List[str]:
+        """Назви товарів (ua/ru) з усього індексу, для підказок"""
+        titles: List[str] = []
+        async for doc in async_scan(
+            self.es_client, index=settings.index_name, _source=["title_ua", "title_ru"], size=1000
+        ):
+            src = doc.get("_source") or {}
+            titles.extend(t for t in (src.get("title_ua"), src.get("title_ru")) if t)
+            if len(titles) >= limit:
+                break
+        return titles[:limit]
+
+    async def get_vectors(self, ids: List[str], timeout: Optional[float] = None) -> Dict[str, List[float]]:
+        """
+        Вектори товарів (settings.vector_field_name) за id; без вектора - пропускаються.
+        Перевищення timeout - asyncio.TimeoutError (викликач вирішує, чи пропустити етап)
+        """
+        if not ids:
+            return {}
+        try:
+            res = await asyncio.wait_for(
+                self.es_client.mget(index=settings.index_name, ids=ids, _source=[settings.vector_field_name]),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            raise
+        except Exception as e:
+            logger.error(f"mget vectors error: {e}")
+            return {}
+        vectors = {}
+        for doc in res.get("docs", []):
+            vector = (doc.get("_source") or {}).get(settings.vector_field_name) if doc.get("found") else None
+            if vector:
+                vectors[doc["_id"]] = vector
+        return vectors
+
     async def multi_semantic_search(
-        self, query_vectors: List[Tuple[str, List[float]]], k_per_query: int = 20
+        self,
+        query_vectors: List[Tuple[str, List[float]]],
+        k_per_query: int = 20,
+        precomputed: Optional[Dict[str, List[Dict]]] = None,
+        deadline: Optional[Deadline] = None,
     ) -> Dict[str, List[Dict]]:
+        """kNN для кожного підзапиту; precomputed - вже отримані hits (напр. спекулятивні)"""
         if not query_vectors:
             return {}
 
+        precomputed = precomputed or {}
         tasks = []
         subquery_names = []
 
-        for subquery, vector in query_vectors:
-            if vector is not None:
-                tasks.append(self.semantic_search(vector, k_per_query))
-                subquery_names.append(subquery)
+        async def traced_search(index: int, vector: List[float]) -> List[Dict]:
+            with _trace_span(f"knn_{index}"):
+                return await self.semantic_search(vector, k_per_query, deadline)
 
-        if not tasks:
-            return {}
+        for index, (subquery, vector) in enumerate(query_vectors, 1):
+            if vector is not None and subquery not in precomputed:
+                tasks.append(traced_search(index, vector))
+                subquery_names.append(subquery)
 
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        results = await asyncio.gather(*tasks, return_exceptions=True) if tasks else []
 
-        output = {}
-        for i, (subquery, result) in enumerate(zip(subquery_names, results)):
+        fetched: Dict[str, List[Dict]] = {}
+        for subquery, result in zip(subquery_names, results):
             if not isinstance(result, Exception):
-                output[subquery] = result
+                fetched[subquery] = result
             else:
                 logger.warning(f"Search error for '{subquery}': {result}")
-                output[subquery] = []
+                fetched[subquery] = []
+
+        # Зберігаємо порядок підзапитів: від нього залежить вага при злитті
+        output = {}
+        for subquery, vector in query_vectors:
+            if subquery in precomputed:
+                output[subquery] = precomputed[subquery][:k_per_query]
+            elif subquery in fetched:
+                output[subquery] = fetched[subquery]
 
         return output
 
     async def bm25_search(self, query_text: str, k: int = 10) -> List[Dict]:
         try:
-            _source = [
-                "title_ua",
-                "title_ru",
-                "description_ua",
-                "description_ru",
-                "sku",
-                "good_code",
-                "uktzed",
-                "measurement_unit_ua",
-                "vat",
-                "discounted",
-                "height",
-                "width",
-                "length",
-                "weight",
-                "availability",
-            ]
+            _source = PRODUCT_SOURCE_FIELDS
             res = await self.es_client.search(
                 index=settings.index_name,
                 min_score=float(settings.bm25_min_score),
@@ -1098,57 +1553,124 @@ class ElasticsearchService:
             logger.error(f"Index stats error: {e}")
             return {"documents_count": 0, "index_size_bytes": 0, "health": "unknown"}
 
+    async def get_index_generation(self) -> Optional[str]:
+        """
+        Версія каталогу: uuid індексу + кількість документів + мітка _meta.catalog_generation,
+        яку пише reindex_products.py (оновлення товарів на місці не змінює кількість).
+        Лічильники indexing/deleted не використовуються: вони скидаються при рестарті ES
+        і змінюються при злитті сегментів.
+        """
+        try:
+            stats, mapping = await asyncio.gather(
+                self.es_client.indices.stats(index=settings.index_name, metric=["docs"]),
+                self.es_client.indices.get_mapping(index=settings.index_name),
+            )
+            for name, idx in (stats.get("indices") or {}).items():
+                docs = (idx.get("primaries") or {}).get("docs") or {}
+                meta = ((mapping.get(name) or {}).get("mappings") or {}).get("_meta") or {}
+                return ":".join(
+                    str(x)
+                    for x in (
+                        idx.get("uuid") or name,
+                        docs.get("count", 0),
+                        meta.get("catalog_generation", ""),
+                    )
+                )
+            return None
+        except Exception as e:
+            logger.warning(f"Index generation error: {e}")
+            return None
+
 
-class GPTService:
-    def __init__(self, http_client: httpx.AsyncClient):
-        self.http_client = http_client
-        self.base_url = "https://api.openai.com/v1"
+class KnnBatcher:
+    """
+    Збирає kNN-запити конкурентних пайплайнів пакетного пошуку і відправляє
+    їх одним _msearch: після window_ms від першого запиту або при max_batch.
+    """
 
-    @retry(
-        stop=stop_after_attempt(settings.max_retries),
-        wait=wait_exponential(multiplier=1, min=1, max=8),
-        retry=retry_if_exception_type((httpx.RequestError, httpx.TimeoutException)),
-    )
-    async def _chat(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        r = await self.http_client.post(
-            f"{self.base_url}/chat/completions",
-            headers={"Authorization": f"Bearer {settings.openai_api_key}", "Content-Type": "application/json"},
-            json=payload,
-            timeout=settings.request_timeout,
-        )
-        if r.status_code != 200:
-            logger.error(f"OpenAI error: {r.status_code}, {r.text[:200]}")
-        r.raise_for_status()
-        return r.json()
+    def __init__(self, es_service: ElasticsearchService, window_ms: float = 5.0, max_batch: int = 64):
+        self.es_service = es_service
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending: List[Tuple[List[float], int, "asyncio.Future[List[Dict]]"]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self.searches = 0
+        self.msearch_calls = 0
+
+    async def search(self, vector: List[float], k: int) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        fut: "asyncio.Future[List[Dict]]" = loop.create_future()
+        self._pending.append((vector, k, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[List[float], int, "asyncio.Future[List[Dict]]"]]) -> None:
+        self.searches += len(batch)
+        self.msearch_calls += 1
+        try:
+            results = await self.es_service.msearch_knn([(vector, k) for vector, k, _ in batch])
+        except Exception as e:
+            logger.error(f"Batched kNN failed: {e}")
+            results = [[] for _ in batch]
+        for (_, _, fut), hits in zip(batch, results):
+            if not fut.done():
+                fut.set_result(hits)
 
-    async def unified_chat_assistant(
-        self, query: str, search_history: List[SearchHistoryItem], dialog_context: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, Any]:
-        """🎯 ПОКРАЩЕНИЙ УНІВЕРСАЛЬНИЙ GPT АСИСТЕНТ для TA-DA"""
 
-        if not settings.enable_gpt_chat or not settings.openai_api_key:
-            raise ValueError("GPT is disabled")
+@dataclass
+class ChatBatchContext:
+    """Спільні ресурси пакетного чат-пошуку (/chat/search/batch)"""
 
-        # Формуємо контекст історії
-        context = ""
-        if search_history:
-            recent = search_history[-3:]
-            context = "**Історія діалогу:**\n" + "\n".join(
-                [f'- "{h.query}" (знайдено {h.results_count} товарів)' for h in recent]
-            )
+    knn: KnnBatcher
+    gpt_pool: asyncio.Semaphore
+    # kNN сирих запитів, отримані одним _msearch до старту пайплайнів
+    prefetched: Dict[str, List[Dict]] = field(default_factory=dict)
+
+
+_request_batch: ContextVar[Optional[ChatBatchContext]] = ContextVar("request_batch", default=None)
+
+
+def _gpt_deadlines_apply() -> bool:
+    """
+    Пакетний пошук чекає основну модель без soft/hard deadline: годинник стартує до пулу
+    BATCH_GPT_CONCURRENCY і черги "batch" планувальника, тож дедлайн спрацьовував би
+    на очікуванні в черзі, а не на повільній моделі
+    """
+    return _request_batch.get() is None
+
+
+# Фонове оновлення застарілого запису кешу відповідей (_schedule_result_refresh)
+_request_refresh: ContextVar[bool] = ContextVar("request_refresh", default=False)
+
+
+def _logs_user_activity() -> bool:
+    """Пакет і фонове оновлення кешу - не запити відвідувачів: у логи пошуку, навчальні дані роутера і підказки не пишуться"""
+    return _request_batch.get() is None and not _request_refresh.get()
 
-        # Перевірка чи було уточнення
-        clarification_note = ""
-        if dialog_context and dialog_context.get("clarification_asked"):
-            clarification_note = """
-⚠️ **КРИТИЧНО ВАЖЛИВО**: Користувач ВЖЕ отримав уточнення раніше!
-🚫 НЕ ПИТАЙ БІЛЬШЕ уточнень!
-✅ ОБОВ'ЯЗКОВО дай action: "product_search"
-✅ Використай відповідь користувача для створення semantic_subqueries
-"""
 
-        # 🎯 ПОКРАЩЕНИЙ ПРОМПТ з реальною інформацією про TA-DA
-        prompt = f"""Ти - розумний AI консультант інтернет-магазину **TA-DA!** (https://ta-da.ua/)
+def _note_gpt_tier(stage: str, tier: str) -> None:
+    trace = _request_trace.get()
+    if trace is not None:
+        trace.gpt_tiers[stage] = tier
+
+
+# 🎯 Статичні system-промпти: будуються один раз при імпорті і стоять на початку
+# кожного запиту, щоб OpenAI prompt caching повторно використовував цей префікс.
+_ASSISTANT_SYSTEM_PROMPT = """Ти - розумний AI консультант інтернет-магазину **TA-DA!** (https://ta-da.ua/)
 
 📍 **ПРО МАГАЗИН TA-DA!:**
 TA-DA! - це великий український онлайн-гіпермаркет товарів для дому та родини. У нас 38,000+ товарів:
@@ -1171,10 +1693,6 @@ TA-DA! - це великий український онлайн-гіперма
 - Товари для дому та побуту
 - Швидка доставка по Україні
 
-{context}{clarification_note}
-
-**Запит користувача:** "{query}"
-
 ---
 
 ## 🎯 ТВОЯ РОЛЬ - РОЗУМНИЙ АСИСТЕНТ
@@ -1249,14 +1767,14 @@ TA-DA! - це великий український онлайн-гіперма
 
 ## 📋 ФОРМАТ ВІДПОВІДІ (JSON):
 
-{{
+{
   "action": "greeting|invalid|clarification|product_search",
   "confidence": 0.85,
   "assistant_message": "Текст українською (1-3 речення)",
   "semantic_subqueries": ["підзапит1", "підзапит2"],  // ТІЛЬКИ для product_search
   "categories": ["Категорія1", "Категорія2"],  // ТІЛЬКИ для clarification
   "needs_user_input": true
-}}
+}
 
 ---
 
@@ -1268,77 +1786,15 @@ TA-DA! - це великий український онлайн-гіперма
 4. **РЕЛЕВАНТНІСТЬ**: semantic_subqueries мають бути дійсно про товари з TA-DA
 5. **CLARIFICATION**: Якщо було раніше - більше НЕ питай, відразу product_search!
 
+Історія діалогу та запит користувача - у наступному повідомленні.
 Проаналізуй запит користувача та дай відповідь у форматі JSON."""
 
-        try:
-            data = await asyncio.wait_for(
-                self._chat(
-                    {
-                        "model": settings.gpt_model,
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": settings.gpt_temperature,
-                        "response_format": {"type": "json_object"},
-                        "max_tokens": settings.gpt_max_tokens_analyze,
-                    }
-                ),
-                timeout=settings.gpt_analyze_timeout_seconds,
-            )
 
-            content = data["choices"][0]["message"]["content"]
-            result = _extract_json_safely(content)
+_RECO_SYSTEM_PROMPT = """Ти - експертний консультант магазину TA-DA! (https://ta-da.ua/)
 
-            if "action" not in result:
-                raise ValueError("Missing 'action' in GPT response")
-
-            # Defaults
-            result.setdefault("confidence", 0.8)
-            result.setdefault("assistant_message", "Шукаю для вас товари...")
-            result.setdefault("semantic_subqueries", [])
-            result.setdefault("categories", None)
-            result.setdefault("needs_user_input", result["action"] in ["greeting", "invalid", "clarification"])
-
-            logger.info(f"✅ GPT: action={result['action']}, conf={result['confidence']:.2f}")
-            return result
-
-        except asyncio.TimeoutError:
-            logger.error("⏱️ GPT timeout")
-            raise TimeoutError("GPT timeout")
-        except Exception as e:
-            logger.error(f"❌ GPT error: {e}", exc_info=True)
-            raise
-
-    async def analyze_products(
-        self, products: List[SearchResult], query: str
-    ) -> Tuple[List[ProductRecommendation], Optional[str]]:
-        """🎯 ПОКРАЩЕНИЙ АНАЛІЗ ТОВАРІВ з урахуванням специфіки TA-DA"""
-
-        if not products:
-            return [], "На жаль, не знайдено відповідних товарів."
-
-        if not settings.enable_gpt_chat or not settings.openai_api_key:
-            return self._local_recommendations(products, query)
-
-        items = [
-            {
-                "index": i + 1,
-                "id": p.id,
-                "title": p.title_ua or p.title_ru or "",
-                "desc": (p.description_ua or p.description_ru or "")[:200],
-            }
-            for i, p in enumerate(products[:25])
-        ]
-
-        # 🎯 ПОКРАЩЕНИЙ ПРОМПТ для аналізу
-        prompt = f"""Ти - експертний консультант магазину TA-DA! (https://ta-da.ua/)
-
-📌 **КОНТЕКСТ:**
-TA-DA! - український гіпермаркет товарів для дому з 38,000+ позицій.
-Основні категорії: одяг, взуття, аксесуари, іграшки, кухонний посуд, побутова хімія, косметика, канцелярія.
-
-**Запит користувача:** "{query}"
-
-**Знайдені товари ({len(items)} кандидатів):**
-{json.dumps(items, ensure_ascii=False, indent=1)}
+📌 **КОНТЕКСТ:**
+TA-DA! - український гіпермаркет товарів для дому з 38,000+ позицій.
+Основні категорії: одяг, взуття, аксесуари, іграшки, кухонний посуд, побутова хімія, косметика, канцелярія.
 
 ---
 
@@ -1369,23 +1825,23 @@ TA-DA! - український гіпермаркет товарів для д
 
 ### ФОРМАТ ВІДПОВІДІ (JSON):
 
-{{
+{
   "recommendations": [
-    {{
+    {
       "product_index": 1,
       "relevance_score": 0.92,
       "reason": "Ідеально підходить: футболка Beki чорна 48 розмір - точно те що ви шукали",
       "bucket": "must_have"
-    }},
-    {{
+    },
+    {
       "product_index": 3,
       "relevance_score": 0.78,
       "reason": "Чудова альтернатива: футболка базова чорна, зручна бавовна",
       "bucket": "good_to_have"
-    }}
+    }
   ],
   "assistant_message": "Я підібрав для вас 8 варіантів чорних футболок. Топ-3 найкращі варіанти враховують ваш розмір та стиль."
-}}
+}
 
 ### ⚡ ВАЖЛИВО:
 
@@ -1398,87 +1854,514 @@ TA-DA! - український гіпермаркет товарів для д
   - "good_to_have" - решта хороших варіантів
 - **assistant_message**: 2-3 речення, поясни що підібрав і чому ці товари хороші
 
+Запит користувача та список знайдених товарів - у наступному повідомленні.
 Проаналізуй товари та дай рекомендації у JSON форматі."""
 
+
+_network_backoff = wait_exponential(multiplier=1, min=1, max=8)
+
+
+def _gpt_retry_wait(retry_state) -> float:
+    """429: пауза retry-after (без планувальника - тут, з ним - у черзі); мережа - експоненційно"""
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    if isinstance(exc, GPTRateLimitedError):
+        return 0.0 if get_gpt_scheduler() is not None else exc.retry_after
+    return _network_backoff(retry_state)
+
+
+class GPTService:
+    # Поля рішення асистента, які безпечно повторно використовувати з кешу
+    CACHEABLE_ASSISTANT_FIELDS = (
+        "action",
+        "confidence",
+        "assistant_message",
+        "semantic_subqueries",
+        "categories",
+        "needs_user_input",
+    )
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        assistant_cache: Optional[TTLCache] = None,
+        reco_cache: Optional[TTLCache] = None,
+        scheduler: Optional[GPTScheduler] = None,
+    ):
+        self.http_client = http_client
+        self.base_url = settings.openai_base_url.rstrip("/")
+        self.assistant_cache = assistant_cache
+        self.reco_cache = reco_cache
+        self.scheduler = scheduler
+
+    @retry(
+        stop=stop_after_attempt(settings.max_retries),
+        wait=_gpt_retry_wait,
+        retry=retry_if_exception_type((httpx.RequestError, httpx.TimeoutException, GPTRateLimitedError)),
+    )
+    async def _chat(self, payload: Dict[str, Any], stage: str = "chat") -> Dict[str, Any]:
+        estimated = estimate_tokens(payload)
+        # Пакетний пошук: обмежений пул одночасних викликів і нижчий пріоритет за живий трафік
+        batch = _request_batch.get()
+        async with batch.gpt_pool if batch is not None else nullcontext():
+            if self.scheduler is not None:
+                lane = "batch" if batch is not None else stage
+                metrics.observe("gpt_scheduler.queue_depth", sum(self.scheduler.queue_depth().values()))
+                wait_ms = await self.scheduler.acquire(lane, estimated)
+                metrics.observe(f"gpt_scheduler.{lane}.wait_ms", wait_ms)
+
+            t0 = time.time()
+            r = await self.http_client.post(
+                f"{self.base_url}/chat/completions",
+                headers={"Authorization": f"Bearer {settings.openai_api_key}", "Content-Type": "application/json"},
+                json=payload,
+                timeout=settings.request_timeout,
+            )
+        if r.status_code == 429:
+            retry_after = parse_retry_after(r.headers)
+            logger.warning(f"⏳ OpenAI 429 ({stage}), retry after {retry_after:.2f}s")
+            metrics.incr(f"gpt.{stage}.rate_limited")
+            if self.scheduler is not None:
+                self.scheduler.pause(retry_after)
+            raise GPTRateLimitedError(retry_after)
+        if r.status_code != 200:
+            logger.error(f"OpenAI error: {r.status_code}, {r.text[:200]}")
+        r.raise_for_status()
+        data = r.json()
+        if self.scheduler is not None:
+            self.scheduler.settle(estimated, (data.get("usage") or {}).get("total_tokens"))
+        self._record_usage(stage, data.get("usage"), (time.time() - t0) * 1000)
+        return data
+
+    @staticmethod
+    def _record_usage(stage: str, usage: Optional[Dict[str, Any]], duration_ms: float) -> None:
+        """Облік токенів з поля `usage` відповіді OpenAI: глобальні метрики + поточний запит"""
+        usage = usage or {}
+        counts = {
+            "prompt_tokens": float(usage.get("prompt_tokens") or 0),
+            "cached_tokens": float((usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0),
+            "completion_tokens": float(usage.get("completion_tokens") or 0),
+        }
+
+        metrics.incr(f"gpt.{stage}.calls")
+        metrics.observe(f"gpt.{stage}.latency_ms", duration_ms)
+        for name, value in counts.items():
+            metrics.incr(f"gpt.{stage}.{name}", value)
+
+        request_usage = _request_gpt_usage.get()
+        if request_usage is not None:
+            request_usage[f"gpt_{stage}_ms"] = request_usage.get(f"gpt_{stage}_ms", 0.0) + duration_ms
+            for name, value in counts.items():
+                key = f"gpt_{stage}_{name}"
+                request_usage[key] = request_usage.get(key, 0.0) + value
+
+    async def unified_chat_assistant(
+        self,
+        query: str,
+        search_history: List[SearchHistoryItem],
+        dialog_context: Optional[Dict[str, Any]] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Dict[str, Any]:
+        """🎯 ПОКРАЩЕНИЙ УНІВЕРСАЛЬНИЙ GPT АСИСТЕНТ для TA-DA"""
+
+        if not settings.enable_gpt_chat or not settings.openai_api_key:
+            raise ValueError("GPT is disabled")
+
+        cache_key = None
+        if self.assistant_cache is not None and settings.enable_assistant_cache:
+            cache_key = _assistant_cache_key(query, search_history, dialog_context)
+            cached = await self.assistant_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"⚡ Assistant cache hit: action={cached.get('action')}")
+                _note_gpt_tier("analyze", "cache")
+                return {**{k: (list(v) if isinstance(v, list) else v) for k, v in cached.items()}, "tier": "cache"}
+
+        # Формуємо контекст історії
+        context = ""
+        if search_history:
+            recent = search_history[-3:]
+            context = "**Історія діалогу:**\n" + "\n".join(
+                [
+                    f'- "{h.query}" (знайдено {h.results_count} товарів)'
+                    if h.action == "product_search"
+                    else f'- "{h.query}" (без пошуку товарів, відповідь: {h.action})'
+                    for h in recent
+                ]
+            )
+
+        # Перевірка чи було уточнення
+        clarification_note = ""
+        if dialog_context and dialog_context.get("clarification_asked"):
+            clarification_note = """
+⚠️ **КРИТИЧНО ВАЖЛИВО**: Користувач ВЖЕ отримав уточнення раніше!
+🚫 НЕ ПИТАЙ БІЛЬШЕ уточнень!
+✅ ОБОВ'ЯЗКОВО дай action: "product_search"
+✅ Використай відповідь користувача для створення semantic_subqueries
+"""
+
+        # Динамічна частина (історія + запит) - в кінці, після статичного system-префікса
+        prompt = f'{context}{clarification_note}\n\n**Запит користувача:** "{query}"'
+
+        messages = [
+            {"role": "system", "content": _ASSISTANT_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+
+        async def analyze_with(model: str) -> Dict[str, Any]:
+            data = await self._chat(
+                {
+                    "model": model,
+                    "messages": messages,
+                    "temperature": settings.gpt_temperature,
+                    "response_format": {"type": "json_object"},
+                    "max_tokens": settings.gpt_max_tokens_analyze,
+                },
+                stage="analyze",
+            )
+            parsed = _extract_json_safely(data["choices"][0]["message"]["content"])
+            if "action" not in parsed:
+                raise ValueError("Missing 'action' in GPT response")
+            return parsed
+
+        # Резерв бюджету на embeddings + kNN + рекомендації після аналізу
+        hard_timeout = _stage_timeout(
+            deadline, settings.gpt_analyze_timeout_seconds, settings.deadline_analysis_reserve_seconds
+        )
+
         try:
-            data = await asyncio.wait_for(
-                self._chat(
-                    {
-                        "model": settings.gpt_model,
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": 0.2,  # Нижча температура для точніших рекомендацій
-                        "response_format": {"type": "json_object"},
-                        "max_tokens": settings.gpt_max_tokens_reco,
-                    }
-                ),
-                timeout=settings.gpt_reco_timeout_seconds,
+            if settings.enable_gpt_hedging:
+                result, tier = await self._run_tiers(
+                    "analyze",
+                    analyze_with,
+                    min(settings.gpt_analyze_soft_deadline_seconds, hard_timeout),
+                    hard_timeout,
+                    local=lambda: self._local_analysis(query),
+                    deadline=deadline,
+                )
+            else:
+                try:
+                    result = await asyncio.wait_for(
+                        analyze_with(settings.gpt_model), timeout=hard_timeout if _gpt_deadlines_apply() else None
+                    )
+                except asyncio.TimeoutError:
+                    if deadline is not None:
+                        Deadline.miss("gpt_analyze")
+                    raise
+                tier = "primary"
+
+            # Defaults
+            result.setdefault("confidence", 0.8)
+            result.setdefault("assistant_message", "Шукаю для вас товари...")
+            result.setdefault("semantic_subqueries", [])
+            result.setdefault("categories", None)
+            result.setdefault("needs_user_input", result["action"] in ["greeting", "invalid", "clarification"])
+            result["tier"] = tier
+            _note_gpt_tier("analyze", tier)
+
+            logger.info(f"✅ GPT: action={result['action']}, conf={result['confidence']:.2f}, tier={tier}")
+
+            # Кешуємо тільки відповіді основної моделі
+            if cache_key is not None and tier == "primary":
+                cached_value = {k: result.get(k) for k in self.CACHEABLE_ASSISTANT_FIELDS}
+                await self.assistant_cache.put(
+                    cache_key, {k: (list(v) if isinstance(v, list) else v) for k, v in cached_value.items()}
+                )
+            return result
+
+        except asyncio.TimeoutError:
+            logger.error("⏱️ GPT timeout")
+            raise TimeoutError("GPT timeout")
+        except Exception as e:
+            logger.error(f"❌ GPT error: {e}", exc_info=True)
+            raise
+
+    async def _run_tiers(
+        self,
+        stage: str,
+        call: Callable[[str], Awaitable[Any]],
+        soft_deadline: float,
+        hard_deadline: float,
+        local: Callable[[], Any],
+        deadline: Optional[Deadline] = None,
+    ) -> Tuple[Any, str]:
+        """
+        Tiered execution: основна модель стартує одразу; якщо до soft deadline
+        немає валідної відповіді (або вона впала) - паралельно стартує
+        GPT_FALLBACK_MODEL (якщо задана і відрізняється від основної).
+        Перемагає перша валідна відповідь; локальний fallback - лише після
+        hard deadline або якщо всі моделі впали. Повертає (результат, tier).
+        """
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        if hard_deadline <= 0:
+            # Бюджет запиту вичерпано ще до старту - одразу локальна відповідь
+            Deadline.skip(f"gpt_{stage}")
+            self._record_tier(stage, "local", 0.0, False)
+            return local(), "local"
+
+        pending: Dict["asyncio.Task[Any]", str] = {
+            asyncio.create_task(call(settings.gpt_model)): "primary"
+        }
+        hedged = False
+        soft_passed = False
+        # Пакет: fallback-модель/локальна відповідь лише якщо основна модель впала
+        timed = _gpt_deadlines_apply()
+
+        try:
+            while pending:
+                limit = hard_deadline if soft_passed else min(soft_deadline, hard_deadline)
+                timeout = max(0.0, t0 + limit - loop.time()) if timed else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tier = pending.pop(task)
+                    if task.exception() is None:
+                        self._record_tier(stage, tier, (loop.time() - t0) * 1000, hedged)
+                        return task.result(), tier
+                    logger.warning(f"⚠️ GPT {stage} tier={tier} failed: {task.exception()}")
+
+                elapsed = loop.time() - t0
+                if not soft_passed and (not pending or (timed and elapsed >= soft_deadline)):
+                    soft_passed = True
+                    fallback_model = settings.gpt_fallback_model
+                    if fallback_model and fallback_model != settings.gpt_model:
+                        hedged = True
+                        logger.info(f"🪂 GPT {stage}: hedging with {fallback_model}")
+                        pending[asyncio.create_task(call(fallback_model))] = "fallback"
+                    # Без окремої резервної моделі повільну основну відповідь чекаємо до hard deadline
+                elif timed and elapsed >= hard_deadline:
+                    if deadline is not None:
+                        Deadline.miss(f"gpt_{stage}")
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        result = local()
+        self._record_tier(stage, "local", (loop.time() - t0) * 1000, hedged)
+        return result, "local"
+
+    @staticmethod
+    def _record_tier(stage: str, tier: str, elapsed_ms: float, hedged: bool) -> None:
+        if tier == "local":
+            _mark_degraded()
+        metrics.incr(f"gpt.{stage}.tier.{tier}.wins")
+        metrics.observe(f"gpt.{stage}.tier.{tier}.latency_ms", elapsed_ms)
+        if hedged:
+            metrics.incr(f"gpt.{stage}.hedged")
+
+    @staticmethod
+    def _local_analysis(query: str) -> Dict[str, Any]:
+        """Локальний fallback аналізу: запит як єдиний підзапит пошуку"""
+        return {
+            "action": "product_search",
+            "confidence": 0.5,
+            "assistant_message": "Шукаю для вас товари...",
+            "semantic_subqueries": [query.strip()],
+            "categories": None,
+            "needs_user_input": False,
+        }
+
+    async def analyze_products(
+        self, products: List[SearchResult], query: str, deadline: Optional[Deadline] = None
+    ) -> Tuple[List[ProductRecommendation], Optional[str]]:
+        """🎯 ПОКРАЩЕНИЙ АНАЛІЗ ТОВАРІВ з урахуванням специфіки TA-DA"""
+
+        if not products:
+            return [], "На жаль, не знайдено відповідних товарів."
+
+        if not settings.enable_gpt_chat or not settings.openai_api_key:
+            return self._local_recommendations(products, query)
+
+        # GPT-рекомендації необов'язкові: мало часу - одразу локальні
+        if deadline is not None and not deadline.allows(settings.deadline_min_reco_seconds):
+            Deadline.skip("gpt_reco")
+            logger.info(f"⏱️ GPT recommendations skipped: {deadline.remaining():.2f}s left")
+            return self._local_recommendations(products, query)
+
+        candidate_ids = [p.id for p in products[:25]]
+        reco_key = None
+        if self.reco_cache is not None and settings.enable_reco_cache:
+            reco_key = _reco_cache_key(query, dependencies.index_generation)
+            cached = await self._cached_recommendations(reco_key, candidate_ids, products)
+            if cached is not None:
+                _note_gpt_tier("reco", "cache")
+                return cached
+
+        items = [
+            {
+                "index": i + 1,
+                "title": p.title_ua or p.title_ru or "",
+                "desc": (p.description_ua or p.description_ru or "")[:200],
+            }
+            for i, p in enumerate(products[:25])
+        ]
+
+        # Компактний JSON кандидатів (без відступів і id) - менше вхідних токенів
+        prompt = f"""**Запит користувача:** "{query}"
+
+**Знайдені товари ({len(items)} кандидатів):**
+{json.dumps(items, ensure_ascii=False, separators=(",", ":"))}"""
+
+        messages = [
+            {"role": "system", "content": _RECO_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+
+        async def recommend_with(model: str) -> Tuple[List[ProductRecommendation], Optional[str]]:
+            data = await self._chat(
+                {
+                    "model": model,
+                    "messages": messages,
+                    "temperature": 0.2,  # Нижча температура для точніших рекомендацій
+                    "response_format": {"type": "json_object"},
+                    "max_tokens": settings.gpt_max_tokens_reco,
+                },
+                stage="reco",
             )
+            parsed = self._parse_recommendations(data["choices"][0]["message"]["content"], products)
+            if not parsed[0]:
+                raise ValueError("Empty recommendations in GPT response")
+            return parsed
 
-            content = data["choices"][0]["message"]["content"]
-            obj = _extract_json_safely(content)
+        hard_timeout = _stage_timeout(deadline, settings.gpt_reco_timeout_seconds)
 
-            recs: List[ProductRecommendation] = []
-            raw_recos = obj.get("recommendations", [])
+        try:
+            if settings.enable_gpt_hedging:
+                (recs, msg), tier = await self._run_tiers(
+                    "reco",
+                    recommend_with,
+                    min(settings.gpt_reco_soft_deadline_seconds, hard_timeout),
+                    hard_timeout,
+                    local=lambda: self._local_recommendations(products, query),
+                    deadline=deadline,
+                )
+            else:
+                try:
+                    recs, msg = await asyncio.wait_for(
+                        recommend_with(settings.gpt_model), timeout=hard_timeout if _gpt_deadlines_apply() else None
+                    )
+                except asyncio.TimeoutError:
+                    if deadline is not None:
+                        Deadline.miss("gpt_reco")
+                    raise
+                tier = "primary"
 
-            for r in raw_recos:
-                if not isinstance(r, dict):
-                    continue
-                idx = int(r.get("product_index", 0)) - 1
-                relevance = float(r.get("relevance_score", 0.0))
+            logger.info(f"🎯 GPT: {len(recs)} products from {len(products)}, tier={tier}")
+            _note_gpt_tier("reco", tier)
+
+            if reco_key is not None and tier == "primary":
+                await self.reco_cache.put(
+                    reco_key,
+                    {
+                        "fingerprint": _candidate_fingerprint(candidate_ids),
+                        "candidate_ids": candidate_ids,
+                        "recommendations": [r.model_dump() for r in recs],
+                        "assistant_message": msg,
+                    },
+                )
 
-                # Приймаємо score >= 0.4 (трохи нижче для більшого recall)
-                if relevance >= 0.4 and 0 <= idx < len(products):
-                    prod = products[idx]
+            return recs, msg
+
+        except Exception as e:
+            logger.warning(f"⚠️ GPT analysis failed: {e}")
+            _mark_degraded()
+            _note_gpt_tier("reco", "local")
+            return self._local_recommendations(products, query)
+
+    @staticmethod
+    def _parse_recommendations(
+        content: str, products: List[SearchResult]
+    ) -> Tuple[List[ProductRecommendation], Optional[str]]:
+        """Відповідь GPT → ProductRecommendation (з добором до мінімуму 5)"""
+        obj = _extract_json_safely(content)
+
+        recs: List[ProductRecommendation] = []
+        raw_recos = obj.get("recommendations", [])
+
+        for r in raw_recos:
+            if not isinstance(r, dict):
+                continue
+            idx = int(r.get("product_index", 0)) - 1
+            relevance = float(r.get("relevance_score", 0.0))
+
+            # Приймаємо score >= 0.4 (трохи нижче для більшого recall)
+            if relevance >= 0.4 and 0 <= idx < len(products):
+                prod = products[idx]
+                recs.append(
+                    ProductRecommendation(
+                        product_id=prod.id,
+                        relevance_score=relevance,
+                        reason=r.get("reason", "Рекомендовано"),
+                        title=prod.title_ua or prod.title_ru,
+                        bucket=r.get("bucket", "good_to_have"),
+                    )
+                )
+
+        recs.sort(key=lambda x: x.relevance_score, reverse=True)
+        
+        # Гарантуємо мінімум 5 рекомендацій якщо є товари
+        if len(recs) < 5 and len(products) >= 5:
+            logger.warning(f"Only {len(recs)} recs with score>=0.4, adding more")
+            
+            # Знаходимо max_score для нормалізації
+            max_score = max([float(p.score) for p in products], default=1.0) or 1.0
+            
+            # Додаємо ще товари з нижчим score
+            existing_ids = {r.product_id for r in recs}
+            for i, prod in enumerate(products):
+                if len(recs) >= 7:
+                    break
+                if prod.id not in existing_ids:
                     recs.append(
                         ProductRecommendation(
                             product_id=prod.id,
-                            relevance_score=relevance,
-                            reason=r.get("reason", "Рекомендовано"),
+                            relevance_score=max(0.35, float(prod.score) / max_score),
+                            reason="Потенційно відповідає вашому запиту",
                             title=prod.title_ua or prod.title_ru,
-                            bucket=r.get("bucket", "good_to_have"),
+                            bucket="also_consider"
                         )
                     )
-
-            recs.sort(key=lambda x: x.relevance_score, reverse=True)
+                    existing_ids.add(prod.id)
             
-            # Гарантуємо мінімум 5 рекомендацій якщо є товари
-            if len(recs) < 5 and len(products) >= 5:
-                logger.warning(f"Only {len(recs)} recs with score>=0.4, adding more")
-                
-                # Знаходимо max_score для нормалізації
-                max_score = max([float(p.score) for p in products], default=1.0) or 1.0
-                
-                # Додаємо ще товари з нижчим score
-                existing_ids = {r.product_id for r in recs}
-                for i, prod in enumerate(products):
-                    if len(recs) >= 7:
-                        break
-                    if prod.id not in existing_ids:
-                        recs.append(
-                            ProductRecommendation(
-                                product_id=prod.id,
-                                relevance_score=max(0.35, float(prod.score) / max_score),
-                                reason="Потенційно відповідає вашому запиту",
-                                title=prod.title_ua or prod.title_ru,
-                                bucket="also_consider"
-                            )
-                        )
-                        existing_ids.add(prod.id)
-                
-                recs.sort(key=lambda x: x.relevance_score, reverse=True)
-            
-            msg = obj.get("assistant_message") or f"Я підібрав для вас {len(recs)} варіантів."
+            recs.sort(key=lambda x: x.relevance_score, reverse=True)
+        
+        msg = obj.get("assistant_message") or f"Я підібрав для вас {len(recs)} варіантів."
+        return recs, msg
 
-            logger.info(f"🎯 GPT: {len(recs)} products from {len(products)}")
+    async def _cached_recommendations(
+        self, key: str, candidate_ids: List[str], products: List[SearchResult]
+    ) -> Optional[Tuple[List[ProductRecommendation], Optional[str]]]:
+        """
+        Рекомендації з кешу для того ж запиту і версії індексу.
+        Той самий впорядкований список кандидатів - повне повторне використання;
+        сильне перекриття (>= reco_cache_min_overlap) - беремо рекомендації,
+        які все ще є серед кандидатів, якщо їх лишилось достатньо.
+        """
+        entry = await self.reco_cache.get(key)
+        if not entry:
+            return None
 
-            if not recs:
-                return self._local_recommendations(products, query)
+        if entry["fingerprint"] == _candidate_fingerprint(candidate_ids):
+            metrics.incr("reco_cache.exact")
+            logger.info(f"🎯 Reco cache hit (exact): {len(entry['recommendations'])} products")
+            return [ProductRecommendation(**r) for r in entry["recommendations"]], entry["assistant_message"]
 
-            return recs, msg
+        current = set(candidate_ids)
+        previous = set(entry["candidate_ids"])
+        overlap = len(current & previous) / max(len(current), len(previous), 1)
+        if overlap >= settings.reco_cache_min_overlap:
+            titles = {p.id: p.title_ua or p.title_ru for p in products}
+            recs = [
+                ProductRecommendation(**{**r, "title": titles.get(r["product_id"], r.get("title"))})
+                for r in entry["recommendations"]
+                if r["product_id"] in current
+            ]
+            if len(recs) >= min(5, len(products)):
+                metrics.incr("reco_cache.partial")
+                logger.info(f"🎯 Reco cache hit (partial, overlap={overlap:.2f}): {len(recs)} products")
+                return recs, entry["assistant_message"]
 
-        except Exception as e:
-            logger.warning(f"⚠️ GPT analysis failed: {e}")
-            return self._local_recommendations(products, query)
+        metrics.incr("reco_cache.stale")
+        return None
 
     def _local_recommendations(
         self, products: List[SearchResult], query: str
@@ -1589,6 +2472,303 @@ TA-DA! - український гіпермаркет товарів для д
         return labels, id_buckets
 
 
+def _arrange_chat_results(
+    candidate_results: List[SearchResult],
+    recommendations: List[ProductRecommendation],
+    id_buckets: Dict[str, List[str]],
+    selected_category: Optional[str],
+    k: int,
+) -> Dict[str, Any]:
+    """Впорядковує кандидатів (спершу рекомендовані), додає категорію recommended та фільтр категорії"""
+    sorted_candidates = sorted(
+        candidate_results,
+        key=lambda r: float(r.score),
+        reverse=True
+    )
+    
+    candidate_map = {r.id: r for r in sorted_candidates}
+    reco_ids = [rec.product_id for rec in recommendations if rec.product_id in candidate_map]
+    reco_id_set = set(reco_ids)
+    ordered_from_reco = [candidate_map[rid] for rid in reco_ids]
+    remaining = [r for r in sorted_candidates if r.id not in reco_id_set]
+    
+    # Add recommended category
+    id_buckets = dict(id_buckets)
+    if reco_ids:
+        id_buckets["recommended"] = reco_ids
+        logger.info(f"⭐ Added recommended category with {len(reco_ids)} products")
+    
+    # Apply category filter if selected
+    max_display = min(k, settings.max_chat_display_items)
+    all_ordered = ordered_from_reco + remaining
+    filtered_count = 0
+    category_found = True
+    
+    if selected_category:
+        if selected_category in id_buckets:
+            allowed_ids = set(id_buckets[selected_category])
+            all_ordered = [r for r in all_ordered if r.id in allowed_ids]
+            filtered_count = len(all_ordered)
+            logger.info(f"🔍 Filtered by '{selected_category}': {filtered_count} products")
+        else:
+            logger.warning(f"⚠️ Category '{selected_category}' not found in buckets")
+            category_found = False
+    
+    categories_payload = _categories_payload(id_buckets)
+    
+    # Action buttons
+    actions = None
+    if categories_payload:
+        actions = [
+            {
+                "type": "button",
+                "action": "select_category",
+                "value": cat["code"],
+                "label": cat["label"],
+                "emoji": cat.get("emoji", "📦"),
+                "count": cat["count"],
+                **({"special": "recommended"} if cat.get("special") else {})
+            }
+            for cat in categories_payload[:10]
+        ]
+    
+    return {
+        "all_ordered": all_ordered,
+        "final_results": all_ordered[:max_display],
+        "reco_ids": reco_ids,
+        "id_buckets": id_buckets,
+        "categories_payload": categories_payload,
+        "actions": actions,
+        "filtered_count": filtered_count,
+        "category_found": category_found,
+    }
+
+
+async def _category_from_session(
+    query: str,
+    session_id: str,
+    selected_category: str,
+    k: int,
+    search_history: List[SearchHistoryItem],
+    context_manager: "SearchContextManager",
+) -> Optional[Dict[str, Any]]:
+    """
+    Відповідь на клік по категорії з результатів, збережених для сесії.
+    None - сесії немає, TTL минув або запит інший (тоді - повний пайплайн).
+    """
+    stored = await context_manager.get_session(session_id)
+    if stored is None:
+        return None
+    saved = stored.get("dialog_context") or {}
+    if not saved.get("id_buckets") or saved.get("query") != _normalize_query(query):
+        return None
+
+    candidates = await context_manager.session_products(stored, candidates=True)
+    recommendations = [ProductRecommendation(**r) for r in saved.get("recommendations", [])]
+    arranged = _arrange_chat_results(candidates, recommendations, saved["id_buckets"], selected_category, k)
+
+    assistant_message = saved.get("assistant_message") or "Ось підібрані товари."
+    dialog_state = "final_results"
+    if not arranged["category_found"]:
+        assistant_message += " Обрана категорія недоступна — показую всі результати."
+        dialog_state = "category_not_found"
+
+    await context_manager.store_search_results(
+        session_id=session_id,
+        all_results=arranged["all_ordered"],
+        total_found=stored["total_found"],
+        dialog_context=saved,
+        candidates=candidates,
+    )
+
+    id_buckets = arranged["id_buckets"]
+    return {
+        "state": dialog_state,
+        "action": "product_search",
+        "assistant_message": assistant_message,
+        "results": arranged["final_results"],
+        "recommendations": recommendations,
+        "categories_payload": arranged["categories_payload"],
+        "dialog_context": {
+            "original_query": query,
+            "session_id": session_id,
+            "available_categories": [cat["code"] for cat in arranged["categories_payload"]],
+            "category_buckets": id_buckets,
+            "current_filter": selected_category if selected_category in id_buckets else None,
+            "filtered_count": arranged["filtered_count"],
+        },
+        "query_analysis": QueryAnalysis(
+            original_query=query,
+            expanded_query=query,
+            keywords=[w for w in query.split() if len(w) > 2][:5],
+            context_used=bool(search_history),
+            intent="product_search",
+            semantic_subqueries=saved.get("semantic_subqueries", []),
+        ),
+        "search_time_ms": 0.0,
+        "actions": arranged["actions"],
+    }
+
+
+async def _speculative_raw_query_search(
+    query: str, embedding_service: EmbeddingService, es_service: ElasticsearchService, deadline: Deadline
+) -> Tuple[List[Dict], float]:
+    """Embedding + kNN сирого запиту паралельно з GPT-аналізом (прогріває кеш embedding-ів)"""
+    t0 = time.time()
+    batch = _request_batch.get()
+    if batch is not None and _normalize_query(query) in batch.prefetched:
+        return batch.prefetched[_normalize_query(query)], 0.0
+    vector = await embedding_service.generate_embedding(query, deadline)
+    hits = (
+        await es_service.semantic_search(vector, settings.chat_search_max_k_per_subquery, deadline) if vector else []
+    )
+    return hits, (time.time() - t0) * 1000
+
+
+def _cancel_speculation(task: Optional["asyncio.Task[Tuple[List[Dict], float]]"], reason: str) -> None:
+    if task is None:
+        return
+    task.cancel()
+    metrics.incr(f"speculation.{reason}")
+
+
+async def _store_chat_result(
+    cache_key: str, result: Dict[str, Any], session_id: str, context_manager: "SearchContextManager"
+) -> None:
+    """Кешує повну відповідь: id та скори товарів (документи не зберігаються), рекомендації, категорії"""
+    if result["state"] != "final_results":
+        return
+    stored = await context_manager.get_session(session_id)
+    if stored is None:
+        return
+    dialog_ctx = {k: v for k, v in (result["dialog_context"] or {}).items() if k != "session_id"}
+    await get_result_cache().put(
+        cache_key,
+        {
+            "cached_at": time.time(),
+            "ordered": [[doc_id, score] for doc_id, score in zip(*stored["all_results"])],
+            "display_count": len(result["results"]),
+            "total_found": stored["total_found"],
+            "session_context": stored["dialog_context"],
+            "recommendations": [r.model_dump() for r in result["recommendations"]],
+            "categories_payload": result["categories_payload"],
+            "actions": result["actions"],
+            "assistant_message": result["assistant_message"],
+            "dialog_context": dialog_ctx,
+            "query_analysis": result["query_analysis"].model_dump(),
+        },
+    )
+
+
+async def _cached_chat_result(
+    cache_key: str,
+    query: str,
+    session_id: str,
+    es_service: ElasticsearchService,
+    context_manager: "SearchContextManager",
+    conversation_id: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Відповідь з кешу: товари підтягуються з ES за id (mget), сесія заповнюється
+    як після звичайного пошуку. result["stale"] - запис старший за RESULT_CACHE_FRESH_SECONDS.
+    """
+    entry = await get_result_cache().get(cache_key)
+    if entry is None:
+        return None
+
+    t0 = time.time()
+    scores = dict(entry["ordered"])
+    docs = await es_service.get_by_ids([doc_id for doc_id, _ in entry["ordered"]])
+    if not docs:
+        metrics.incr("result_cache.rehydrate_failed")
+        return None
+    all_ordered = [SearchResult.from_hit({**doc, "_score": scores.get(doc["_id"], 0.0)}) for doc in docs]
+    present = {r.id for r in all_ordered}
+
+    await context_manager.store_search_results(
+        session_id=session_id,
+        all_results=all_ordered,
+        total_found=entry["total_found"],
+        dialog_context=entry["session_context"],
+    )
+    query_analysis = QueryAnalysis(**entry["query_analysis"])
+    await context_manager.add_search(
+        conversation_id,
+        query=query,
+        keywords=query_analysis.keywords,
+        results_count=min(entry["display_count"], len(all_ordered)),
+    )
+
+    stale = time.time() - entry["cached_at"] > settings.result_cache_fresh_seconds
+    metrics.incr(f"result_cache.{'stale' if stale else 'fresh'}")
+    return {
+        "state": "final_results",
+        "action": "product_search",
+        "assistant_message": entry["assistant_message"],
+        "results": all_ordered[: entry["display_count"]],
+        "recommendations": [
+            ProductRecommendation(**r) for r in entry["recommendations"] if r["product_id"] in present
+        ],
+        "categories_payload": entry["categories_payload"],
+        "dialog_context": {**entry["dialog_context"], "session_id": session_id},
+        "query_analysis": query_analysis,
+        "search_time_ms": (time.time() - t0) * 1000.0,
+        "actions": entry["actions"],
+        "stale": stale,
+    }
+
+
+# Фонові оновлення застарілих записів кешу відповідей (по одному на ключ)
+_result_refresh_tasks: Dict[str, "asyncio.Task[None]"] = {}
+
+
+def _schedule_result_refresh(
+    cache_key: str,
+    query: str,
+    k: int,
+    gpt_service: GPTService,
+    embedding_service: EmbeddingService,
+    es_service: ElasticsearchService,
+    context_manager: "SearchContextManager",
+    intent_router: Optional[IntentRouter],
+) -> None:
+    if cache_key in _result_refresh_tasks:
+        return
+
+    async def refresh() -> None:
+        # Власні трейс і usage: задача успадковує контекст запиту, який її запустив
+        trace = RequestTrace()
+        _request_trace.set(trace)
+        _request_gpt_usage.set(None)
+        _request_refresh.set(True)
+        session_id = f"result-cache-refresh:{cache_key}"
+        try:
+            result = await _run_chat_search_pipeline(
+                query=query,
+                session_id=session_id,
+                k=k,
+                selected_category=None,
+                dialog_context=None,
+                search_history=[],
+                gpt_service=gpt_service,
+                embedding_service=embedding_service,
+                es_service=es_service,
+                context_manager=context_manager,
+                intent_router=intent_router,
+            )
+            if not trace.degraded:
+                await _store_chat_result(cache_key, result, session_id, context_manager)
+                metrics.incr("result_cache.refreshed")
+        except Exception as e:
+            logger.warning(f"Result cache refresh failed for '{query}': {e}")
+        finally:
+            await context_manager.clear_search_results(session_id)
+
+    task = asyncio.create_task(refresh())
+    _result_refresh_tasks[cache_key] = task
+    task.add_done_callback(lambda _t: _result_refresh_tasks.pop(cache_key, None))
+
+
 async def execute_chat_search_logic(
     query: str,
     session_id: str,
@@ -1600,11 +2780,123 @@ async def execute_chat_search_logic(
     embedding_service: EmbeddingService,
     es_service: ElasticsearchService,
     context_manager: "SearchContextManager",
-    status_callback: Optional[Callable[[str, str], Awaitable[None]]] = None
+    status_callback: Optional[Callable[[str, str], Awaitable[None]]] = None,
+    intent_router: Optional[IntentRouter] = None,
+    event_callback: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+    deadline: Optional[Deadline] = None,
+    use_result_cache: bool = True,
+    refresh_result_cache: bool = False,
+    conversation_id: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     🎯 Загальна логіка чат-пошуку для POST та SSE ендпоінтів.
-    
+
+    Обгортка над _run_chat_search_pipeline: збирає спани етапів і GPT usage
+    поточного запиту в result["stage_timings_ms"], спани - також у
+    result["server_timing"] (значення заголовка Server-Timing) і гістограми stage.*.
+
+    event_callback (progressive mode): отримує події "products" (кандидати, категорії,
+    локальні рекомендації - до GPT-рекомендацій) та "recommendations_update".
+
+    deadline: бюджет часу запиту (за замовчуванням CHAT_REQUEST_BUDGET_SECONDS від виклику).
+
+    use_result_cache: запити без історії, уточнення та фільтра категорії беруться з кешу
+    повних відповідей (False - персоналізований контекст, завжди повний пайплайн).
+    refresh_result_cache: завжди повний пайплайн, але відповідь кладеться в кеш (прогрів).
+
+    conversation_id: історія розмови на сервері - підставляється, якщо клієнт не передав
+    search_history, успішний пошук додається до неї.
+    """
+    deadline = deadline or Deadline(settings.chat_request_budget_seconds)
+    usage: Dict[str, float] = {}
+    trace = RequestTrace()
+    token = _request_gpt_usage.set(usage)
+    trace_token = _request_trace.set(trace)
+    try:
+        if conversation_id and not search_history:
+            with trace.span("history"):
+                search_history = await context_manager.get_history(conversation_id)
+
+        cache_key = None
+        if (
+            use_result_cache
+            and settings.enable_result_cache
+            and not selected_category
+            and not search_history
+            and not (dialog_context and dialog_context.get("clarification_asked"))
+        ):
+            cache_key = _result_cache_key(query, k, dependencies.index_generation)
+
+        result = None
+        if cache_key is not None and not refresh_result_cache:
+            with trace.span("result_cache"):
+                result = await _cached_chat_result(
+                    cache_key, query, session_id, es_service, context_manager, conversation_id
+                )
+            if result is not None and result.pop("stale", False):
+                _schedule_result_refresh(
+                    cache_key, query, k, gpt_service, embedding_service, es_service, context_manager, intent_router
+                )
+
+        if result is None:
+            result = await _run_chat_search_pipeline(
+                query=query,
+                session_id=session_id,
+                k=k,
+                selected_category=selected_category,
+                dialog_context=dialog_context,
+                search_history=search_history,
+                gpt_service=gpt_service,
+                embedding_service=embedding_service,
+                es_service=es_service,
+                context_manager=context_manager,
+                status_callback=status_callback,
+                intent_router=intent_router,
+                event_callback=event_callback,
+                deadline=deadline,
+                conversation_id=conversation_id,
+            )
+            if cache_key is not None and not trace.degraded:
+                await _store_chat_result(cache_key, result, session_id, context_manager)
+
+        # Товарні пошуки пишуться в історію пайплайном (з ключовими словами і кількістю товарів);
+        # привітання/уточнення/незрозумілий запит - тут, щоб наступний раунд мав контекст
+        if result["action"] in ("greeting", "clarification", "invalid") and not selected_category:
+            await context_manager.add_search(conversation_id, query, [], 0, action=result["action"])
+    finally:
+        _request_trace.reset(trace_token)
+        _request_gpt_usage.reset(token)
+
+    trace.observe()
+    timings = trace.timings()
+    timings.update({k: round(v, 2) for k, v in usage.items()})
+    result["stage_timings_ms"] = timings or None
+    result["server_timing"] = trace.server_timing()
+    result["degraded"] = trace.degraded
+    result["gpt_tiers"] = dict(trace.gpt_tiers)
+    return result
+
+
+async def _run_chat_search_pipeline(
+    query: str,
+    session_id: str,
+    k: int,
+    selected_category: Optional[str],
+    dialog_context: Optional[Dict[str, Any]],
+    search_history: List[SearchHistoryItem],
+    gpt_service: GPTService,
+    embedding_service: EmbeddingService,
+    es_service: ElasticsearchService,
+    context_manager: "SearchContextManager",
+    status_callback: Optional[Callable[[str, str], Awaitable[None]]] = None,
+    intent_router: Optional[IntentRouter] = None,
+    event_callback: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+    deadline: Optional[Deadline] = None,
+    conversation_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Кроки чат-пошуку: валідація → GPT → embeddings → kNN → пороги → категорії → рекомендації.
+
     Returns:
         Dict з ключами:
         - action: str
@@ -1619,9 +2911,12 @@ async def execute_chat_search_logic(
         - actions: Optional[List[Dict]]
     """
     t0 = time.time()
+    deadline = deadline or Deadline(settings.chat_request_budget_seconds)
     
     # 1. Validation
+    t_stage = time.time()
     is_valid, validation_error = _validate_query_basic(query)
+    _trace_add("validation", (time.time() - t_stage) * 1000)
     if not is_valid:
         return {
             "state": "validation_error",
@@ -1642,15 +2937,80 @@ async def execute_chat_search_logic(
             "actions": None
         }
     
-    # 2. GPT Assistant
+    # 1.2. Category click: фільтр результатів, збережених у сесії, без GPT/ES
+    if selected_category and settings.enable_category_fast_path:
+        t_stage = time.time()
+        fast = await _category_from_session(query, session_id, selected_category, k, search_history, context_manager)
+        _trace_add("category_fast_path", (time.time() - t_stage) * 1000)
+        if fast is not None:
+            metrics.incr("category_fast_path.hits")
+            fast["search_time_ms"] = (time.time() - t0) * 1000.0
+            logger.info(f"⚡ Category '{selected_category}' served from session in {fast['search_time_ms']:.1f}ms")
+            return fast
+        metrics.incr("category_fast_path.misses")
+
+    # 2. Local intent router: очевидні випадки без GPT
+    has_context = bool(search_history) or bool(dialog_context and dialog_context.get("clarification_asked"))
+    assistant_response: Optional[Dict[str, Any]] = None
+
+    # 1.5. Speculative retrieval: сирий запит майже завжди серед semantic_subqueries,
+    # тому embedding + kNN для нього стартують одночасно з аналізом наміру.
+    # Уточнення з контекстом ("а синя?", "дешевше") GPT переписує - сирий текст у підзапити не потрапляє
+    speculative_task: Optional["asyncio.Task[Tuple[List[Dict], float]]"] = None
+    if settings.enable_speculative_retrieval:
+        quick = intent_router.route_by_rules(query, has_context) if intent_router is not None else None
+        if (quick is not None and quick.action == "product_search") or (quick is None and not has_context):
+            speculative_task = asyncio.create_task(
+                _speculative_raw_query_search(query, embedding_service, es_service, deadline)
+            )
+            metrics.incr("speculation.started")
+
+    if intent_router is not None and settings.enable_intent_router:
+        async def _router_embed(text: str) -> Optional[List[float]]:
+            try:
+                return await asyncio.wait_for(
+                    embedding_service.generate_embedding(text, deadline),
+                    timeout=deadline.timeout(settings.intent_router_embed_timeout_seconds),
+                )
+            except asyncio.TimeoutError:
+                return None
+
+        t_stage = time.time()
+        decision = await intent_router.route(query, has_context, embed=_router_embed)
+        _trace_add("intent_router", (time.time() - t_stage) * 1000)
+        if decision is not None:
+            assistant_response = decision.to_assistant_response()
+            metrics.incr(f"intent_router.skipped.{decision.source}")
+            logger.info(f"⚡ Intent router: action={decision.action} via {decision.source}")
+        else:
+            metrics.incr("intent_router.forwarded")
+
+    # 2.5. GPT Assistant
     try:
-        assistant_response = await gpt_service.unified_chat_assistant(
-            query=query,
-            search_history=search_history,
-            dialog_context=dialog_context
-        )
+        if assistant_response is None:
+            with _trace_span("gpt_analysis"):
+                assistant_response = await gpt_service.unified_chat_assistant(
+                    query=query,
+                    search_history=search_history,
+                    dialog_context=dialog_context,
+                    deadline=deadline,
+                )
+            # Лише свіжі відповіді моделі: кеш - повтор уже залогованого рішення, local - не рішення GPT
+            if (
+                SEARCH_LOGGER_AVAILABLE
+                and search_logger
+                and assistant_response.get("tier") in ("primary", "fallback")
+                and _logs_user_activity()
+            ):
+                try:
+                    await asyncio.to_thread(
+                        search_logger.log_intent_decision, query, assistant_response["action"], "gpt", has_context
+                    )
+                except Exception as log_error:
+                    logger.debug(f"Intent decision logging failed: {log_error}")
     except Exception as e:
         logger.error(f"GPT assistant failed: {e}", exc_info=True)
+        _cancel_speculation(speculative_task, "cancelled")
         return {
             "state": "error",
             "action": "error",
@@ -1672,6 +3032,10 @@ async def execute_chat_search_logic(
     
     action = assistant_response["action"]
     logger.info(f"🤖 Action: {action} (conf={assistant_response.get('confidence', 0):.2f})")
+
+    if action != "product_search":
+        _cancel_speculation(speculative_task, "cancelled")
+        speculative_task = None
     
     # 3. Handle greeting
     if action == "greeting":
@@ -1759,6 +3123,31 @@ async def execute_chat_search_logic(
     
     logger.info(f"🔍 Subqueries ({len(semantic_subqueries)}): {semantic_subqueries}")
     
+    # 6.2. Reuse speculative kNN hits if the raw query is among the subqueries
+    precomputed_hits: Dict[str, List[Dict]] = {}
+    if speculative_task is not None:
+        normalized_query = _normalize_query(query)
+        matched = next((sq for sq in semantic_subqueries if _normalize_query(sq) == normalized_query), None)
+        if matched is None:
+            _cancel_speculation(speculative_task, "unused")
+        else:
+            t_wait = time.time()
+            try:
+                spec_hits, spec_ms = await speculative_task
+            except Exception as e:
+                logger.warning(f"Speculative search failed: {e}")
+                spec_hits, spec_ms = [], 0.0
+            _trace_add("speculative_wait", (time.time() - t_wait) * 1000)
+            if spec_hits:
+                precomputed_hits[matched] = spec_hits
+                # Виграш = частина роботи, яка перекрилася з аналізом наміру
+                saved_ms = max(0.0, spec_ms - (time.time() - t_wait) * 1000)
+                metrics.incr("speculation.hits")
+                metrics.observe("speculation.saved_ms", saved_ms)
+                logger.info(f"⚡ Speculative hits reused for '{matched}' (saved {saved_ms:.0f}ms)")
+            else:
+                metrics.incr("speculation.empty")
+
     # 6.5. Notify about database search starting
     if status_callback:
         await status_callback("searching", "Шукаю товари...")
@@ -1767,8 +3156,10 @@ async def execute_chat_search_logic(
     t_embeddings = time.time()
     embeddings = await embedding_service.generate_embeddings_parallel(
         semantic_subqueries,
-        max_concurrent=settings.embedding_max_concurrent
+        max_concurrent=settings.embedding_max_concurrent,
+        deadline=deadline,
     )
+    _trace_add("embeddings", (time.time() - t_embeddings) * 1000)
     log_performance_metrics(
         "embeddings_generation",
         (time.time() - t_embeddings) * 1000,
@@ -1807,7 +3198,10 @@ async def execute_chat_search_logic(
         max(10, 50 // len(valid_queries))
     )
     
-    search_results = await es_service.multi_semantic_search(valid_queries, k_per_subquery)
+    search_results = await es_service.multi_semantic_search(
+        valid_queries, k_per_subquery, precomputed=precomputed_hits, deadline=deadline
+    )
+    _trace_add("knn", (time.time() - t_search) * 1000)
     log_performance_metrics(
         "semantic_search",
         (time.time() - t_search) * 1000,
@@ -1815,6 +3209,7 @@ async def execute_chat_search_logic(
     )
     
     # 9. Merge results with weighted scores
+    t_stage = time.time()
     all_hits_dict = {}
     
     for idx, (subquery, hits) in enumerate(search_results.items()):
@@ -1841,8 +3236,10 @@ async def execute_chat_search_logic(
     )
     
     logger.info(f"📊 Merged results: {len(all_hits)} unique products")
+    _trace_add("merge", (time.time() - t_stage) * 1000)
     
     # 10. Adaptive threshold
+    t_stage = time.time()
     max_score = max([float(h.get("_score", 0.0)) for h in all_hits], default=0.0)
     
     # Покращена логіка порогів
@@ -1895,6 +3292,7 @@ async def execute_chat_search_logic(
             
             if candidate_results:
                 assistant_message_prefix = "Не знайшлося точних збігів, але ось схожі товари: "
+    _trace_add("threshold", (time.time() - t_stage) * 1000)
 
     if not candidate_results:
         # Реально пусто - повертаємо спеціальну відповідь
@@ -1918,9 +3316,13 @@ async def execute_chat_search_logic(
             "actions": None
         }
     
-    # 11. Categorize products
+    # 11. Categorize products (необов'язково: лишилось менше DEADLINE_MIN_CATEGORIZATION_SECONDS - без категорій)
     t_cat = time.time()
     try:
+        if not deadline.allows(settings.deadline_min_categorization_seconds):
+            Deadline.skip("categorization")
+            raise TimeoutError(f"request deadline: {deadline.remaining():.2f}s left")
+        await _classify_by_centroids(candidate_results[:30], es_service, deadline)
         labels, id_buckets = await gpt_service.categorize_products(
             candidate_results[:30],
             query
@@ -1929,94 +3331,101 @@ async def execute_chat_search_logic(
         log_performance_metrics("categorization", (time.time() - t_cat) * 1000, {"categories": len(labels)})
     except Exception as e:
         logger.error(f"Categorization failed: {e}")
+        _mark_degraded()
         labels, id_buckets = [], {}
+    _trace_add("categorization", (time.time() - t_cat) * 1000)
     
+    # 11.2. Progressive mode: кандидати + локальні рекомендації одразу, GPT не блокує first paint
+    if event_callback:
+        local_recs, _ = gpt_service._local_recommendations(candidate_results[:25], query)
+        early = _arrange_chat_results(candidate_results, local_recs, id_buckets, selected_category, k)
+        # Та сама форма, що й у кроці 18: клік по категорії працює ще до відповіді GPT
+        await context_manager.store_search_results(
+            session_id=session_id,
+            all_results=early["all_ordered"],
+            total_found=len(candidate_results),
+            dialog_context={
+                **(dialog_context or {}),
+                "query": _normalize_query(query),
+                "id_buckets": early["id_buckets"],
+                "recommendations": [r.model_dump() for r in local_recs],
+                "assistant_message": "Ось підібрані товари за вашим запитом.",
+                "semantic_subqueries": semantic_subqueries,
+            },
+        )
+        await event_callback("products", {
+            "results": [r.model_dump() for r in early["final_results"]],
+            "recommendations": [r.model_dump() for r in local_recs],
+            "categories": early["categories_payload"],
+            "actions": early["actions"],
+            "total_found": len(candidate_results),
+            "provisional": True,
+        })
+
     # 11.5. Notify about recommendations generation
     if status_callback:
-        await status_callback("recommending", "Даю рекомендації...")
-    
-    # 12. Get recommendations
-    t_reco = time.time()
-    try:
-        recommendations, assistant_message = await gpt_service.analyze_products(
-            candidate_results[:25],
-            query
-        )
-        logger.info(f"⭐ Recommendations: {len(recommendations)} products")
-        log_performance_metrics("recommendations", (time.time() - t_reco) * 1000, {"count": len(recommendations)})
-    except Exception as e:
-        logger.error(f"Recommendations failed: {e}")
-        recommendations = []
-        assistant_message = "Ось підібрані товари за вашим запитом."
-    
-    # Додаємо префікс якщо були послаблені пороги
-    if assistant_message_prefix:
-        assistant_message = assistant_message_prefix + assistant_message
-    
-    # 13. Prepare final results
-    sorted_candidates = sorted(
-        candidate_results,
-        key=lambda r: float(r.score),
-        reverse=True
-    )
-    
-    candidate_map = {r.id: r for r in sorted_candidates}
-    reco_ids = [rec.product_id for rec in recommendations if rec.product_id in candidate_map]
-    ordered_from_reco = [candidate_map[rid] for rid in reco_ids]
-    remaining = [r for r in sorted_candidates if r.id not in set(reco_ids)]
-    
-    # 14. Add recommended category
-    if reco_ids:
-        id_buckets["recommended"] = reco_ids
-        logger.info(f"⭐ Added recommended category with {len(reco_ids)} products")
-    
-    # 15. Apply category filter if selected
-    max_display = min(k, settings.max_chat_display_items)
-    all_ordered = ordered_from_reco + remaining
-    
-    dialog_state = "final_results"
-    filtered_count = 0
-    
-    if selected_category:
-        if selected_category in id_buckets:
-            allowed_ids = set(id_buckets[selected_category])
-            all_ordered = [r for r in all_ordered if r.id in allowed_ids]
-            filtered_count = len(all_ordered)
-            logger.info(f"🔍 Filtered by '{selected_category}': {filtered_count} products")
-        else:
-            logger.warning(f"⚠️ Category '{selected_category}' not found in buckets")
-            assistant_message = (
-                assistant_message or "Ось підібрані товари."
-            ) + " Обрана категорія недоступна — показую всі результати."
-            dialog_state = "category_not_found"
+        await status_callback("recommending", "Даю рекомендації...")
     
-    final_results = all_ordered[:max_display]
+    # 12. Get recommendations
+    t_reco = time.time()
+    try:
+        recommendations, assistant_message = await gpt_service.analyze_products(
+            candidate_results[:25],
+            query,
+            deadline=deadline,
+        )
+        logger.info(f"⭐ Recommendations: {len(recommendations)} products")
+        log_performance_metrics("recommendations", (time.time() - t_reco) * 1000, {"count": len(recommendations)})
+    except Exception as e:
+        logger.error(f"Recommendations failed: {e}")
+        _mark_degraded()
+        recommendations = []
+        assistant_message = "Ось підібрані товари за вашим запитом."
+    _trace_add("recommendations", (time.time() - t_reco) * 1000)
     
-    # 16. Create categories payload
-    categories_payload = _categories_payload(id_buckets)
+    # Додаємо префікс якщо були послаблені пороги
+    if assistant_message_prefix:
+        assistant_message = assistant_message_prefix + assistant_message
     
-    # 17. Create action buttons
-    actions = None
-    if categories_payload:
-        actions = [
-            {
-                "type": "button",
-                "action": "select_category",
-                "value": cat["code"],
-                "label": cat["label"],
-                "emoji": cat.get("emoji", "📦"),
-                "count": cat["count"],
-                **({"special": "recommended"} if cat.get("special") else {})
-            }
-            for cat in categories_payload[:10]
-        ]
+    # 13-17. Order (recommended first), recommended bucket, category filter, payload, buttons
+    arranged = _arrange_chat_results(candidate_results, recommendations, id_buckets, selected_category, k)
+    all_ordered = arranged["all_ordered"]
+    final_results = arranged["final_results"]
+    reco_ids = arranged["reco_ids"]
+    id_buckets = arranged["id_buckets"]
+    categories_payload = arranged["categories_payload"]
+    actions = arranged["actions"]
+    filtered_count = arranged["filtered_count"]
+
+    dialog_state = "final_results"
+    if selected_category and not arranged["category_found"]:
+        assistant_message = (
+            assistant_message or "Ось підібрані товари."
+        ) + " Обрана категорія недоступна — показую всі результати."
+        dialog_state = "category_not_found"
+
+    if event_callback:
+        await event_callback("recommendations_update", {
+            "results": [r.model_dump() for r in final_results],
+            "order": [r.id for r in final_results],
+            "recommendations": [r.model_dump() for r in recommendations],
+            "assistant_message": assistant_message,
+        })
     
-    # 18. Store for pagination
-    context_manager.store_search_results(
+    # 18. Store for pagination (+ все потрібне для перемикання категорій без GPT/ES)
+    t_stage = time.time()
+    await context_manager.store_search_results(
         session_id=session_id,
         all_results=all_ordered,
         total_found=len(candidate_results),
-        dialog_context={}
+        dialog_context={
+            "query": _normalize_query(query),
+            "id_buckets": id_buckets,
+            "recommendations": [r.model_dump() for r in recommendations],
+            "assistant_message": assistant_message,
+            "semantic_subqueries": semantic_subqueries,
+        },
+        candidates=candidate_results if selected_category else None,
     )
     
     # 19. Create query analysis
@@ -2031,15 +3440,18 @@ async def execute_chat_search_logic(
     )
     
     # 20. Add to history
-    context_manager.add_search(
+    await context_manager.add_search(
+        conversation_id,
         query=query,
         keywords=keywords,
         results_count=len(final_results)
     )
+    _trace_add("session_store", (time.time() - t_stage) * 1000)
     
     # 21. Dialog context
     dialog_ctx = {
         "original_query": query,
+        "session_id": session_id,
         "available_categories": [cat["code"] for cat in categories_payload],
         "category_buckets": id_buckets,
         "current_filter": (
@@ -2059,7 +3471,17 @@ async def execute_chat_search_logic(
     )
     
     # 22. Optional logging
-    if SEARCH_LOGGER_AVAILABLE and search_logger:
+    if (
+        dependencies.suggest_index is not None
+        and final_results
+        and not search_history
+        and not selected_category
+        and _logs_user_activity()
+    ):
+        dependencies.suggest_index.add_query(query, conversation_id or session_id, settings.suggest_query_weight)
+
+    if SEARCH_LOGGER_AVAILABLE and search_logger and _logs_user_activity():
+        t_stage = time.time()
         try:
             top_products = [
                 {
@@ -2089,11 +3511,13 @@ async def execute_chat_search_logic(
                     "recommendations_count": len(recommendations),
                     "total_display": len(final_results),
                     "category_filter": selected_category,
-                    "filtered_count": filtered_count if selected_category else None
+                    "filtered_count": filtered_count if selected_category else None,
+                    "conversation_id": conversation_id,
                 }
             )
         except Exception as log_error:
             logger.warning(f"Search logging failed (non-critical): {log_error}")
+        _trace_add("logging", (time.time() - t_stage) * 1000)
     
     return {
         "state": dialog_state,
@@ -2109,99 +3533,430 @@ async def execute_chat_search_logic(
     }
 
 
-class SearchContextManager:
+class ProductPool:
+    """
+    Спільні документи товарів для збережених сесій з лічильником посилань:
+    популярний товар зберігається один раз, а не в кожній сесії, де він трапився.
+    Сесії тримають лише id (канонічний рядок з пулу) і score.
+    """
+
     def __init__(self):
-        self.history: List[SearchHistoryItem] = []
-        self.search_results: Dict[str, Dict[str, Any]] = {}
-        self.max_sessions = settings.max_sessions
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.refs: Dict[str, int] = {}
 
-    def add_search(self, query: str, keywords: List[str], results_count: int) -> None:
-        self.history.append(
-            SearchHistoryItem(query=query, keywords=keywords, timestamp=time.time(), results_count=results_count)
-        )
-        if len(self.history) > settings.max_search_history:
-            self.history = self.history[-settings.max_search_history :]
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def acquire(self, results: List[SearchResult]) -> Tuple[List[str], "array[float]"]:
+        """Кладе документи в пул (свіжіша версія замінює попередню); повертає (ids, scores)"""
+        ids: List[str] = []
+        seen: Set[str] = set()
+        for r in results:
+            # Один об'єкт рядка id на весь процес, а не копія в кожній сесії
+            doc_id = sys.intern(r.id)
+            if doc_id not in seen:
+                seen.add(doc_id)
+                if doc_id in self.refs:
+                    self.refs[doc_id] += 1
+                else:
+                    self.refs[doc_id] = 1
+                self.docs[doc_id] = r.model_dump(exclude={"id", "score"})
+            ids.append(doc_id)
+        return ids, array("d", (float(r.score) for r in results))
+
+    def release(self, ids: Iterable[str]) -> None:
+        for doc_id in set(ids):
+            count = self.refs.get(doc_id, 0) - 1
+            if count > 0:
+                self.refs[doc_id] = count
+            else:
+                self.refs.pop(doc_id, None)
+                self.docs.pop(doc_id, None)
+
+    def hydrate(
+        self, ids: List[str], scores: "array[float]", start: int = 0, end: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Документи [start:end] з score сесії; відсутні в пулі пропускаються"""
+        end = len(ids) if end is None else min(end, len(ids))
+        out = []
+        for i in range(start, end):
+            doc = self.docs.get(ids[i])
+            if doc is not None:
+                out.append({"id": ids[i], "score": scores[i], **doc})
+        return out
 
-    def get_recent_history(self, limit: int = 5) -> List[SearchHistoryItem]:
-        return self.history[-limit:]
 
-    def clear_old_history(self) -> int:
+class SearchContextManager:
+    def __init__(self):
+        # conversation_id -> останні MAX_SEARCH_HISTORY пошуків; порядок - від найдавніше оновленої розмови
+        self.histories: "OrderedDict[str, Deque[SearchHistoryItem]]" = OrderedDict()
+        # session_id -> {"all_results": (ids, scores), "candidates": (ids, scores) | None, ...}
+        # Порядок - від найдавніше використаної сесії: він же порядок для LRU і TTL,
+        # бо timestamp оновлюється при кожному доступі (TTL рахується від останнього використання)
+        self.search_results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.max_sessions = settings.max_sessions
+        self.product_pool = ProductPool()
+        self.evictions = 0
+        self.expirations = 0
+
+    async def add_search(
+        self,
+        conversation_id: Optional[str],
+        query: str,
+        keywords: List[str],
+        results_count: int,
+        action: str = "product_search",
+    ) -> None:
+        """Додає раунд до історії розмови (без conversation_id - нікуди: історію веде клієнт)"""
+        if not conversation_id:
+            return
+        item = SearchHistoryItem(
+            query=query, keywords=keywords, timestamp=time.time(), results_count=results_count, action=action
+        )
+        history = self.histories.pop(conversation_id, None)
+        if history is None:
+            history = deque(maxlen=settings.max_search_history)
+        history.append(item)
+        self.histories[conversation_id] = history
+        while len(self.histories) > settings.max_history_conversations:
+            self.histories.popitem(last=False)
+
+    async def get_history(self, conversation_id: Optional[str]) -> List[SearchHistoryItem]:
+        if not conversation_id:
+            return []
+        history = self.histories.get(conversation_id)
+        if not history:
+            return []
         now = time.time()
         ttl = settings.search_history_ttl_days * 86400
-        old_len = len(self.history)
-        self.history = [h for h in self.history if now - h.timestamp < ttl]
-        return old_len - len(self.history)
+        return [h for h in history if now - h.timestamp < ttl]
 
-    def store_search_results(
-        self, session_id: str, all_results: List[SearchResult], total_found: int, dialog_context: Dict[str, Any]
+    async def clear_old_history(self) -> int:
+        """Видаляє розмови без пошуків довше за SEARCH_HISTORY_TTL_DAYS (з початку порядку)"""
+        now = time.time()
+        ttl = settings.search_history_ttl_days * 86400
+        removed = 0
+        while self.histories:
+            history = next(iter(self.histories.values()))
+            if now - history[-1].timestamp < ttl:
+                break
+            self.histories.popitem(last=False)
+            removed += 1
+        return removed
+
+    def _drop_session(self, session_id: str) -> None:
+        stored = self.search_results.pop(session_id, None)
+        if stored is None:
+            return
+        self.product_pool.release(stored["all_results"][0])
+        if stored["candidates"] is not None:
+            self.product_pool.release(stored["candidates"][0])
+
+    async def store_search_results(
+        self,
+        session_id: str,
+        all_results: List[SearchResult],
+        total_found: int,
+        dialog_context: Dict[str, Any],
+        candidates: Optional[List[SearchResult]] = None,
     ) -> None:
-        self.search_results[session_id] = {
-            "all_results": [r.model_dump() for r in all_results],
+        """
+        all_results - те, що гортає load-more (після фільтра категорії);
+        candidates - повний список, якщо all_results відфільтровано (для перемикання категорій).
+        Документи - у спільному пулі, у сесії лише id і score.
+        """
+        entry = {
+            "all_results": self.product_pool.acquire(all_results),
+            "candidates": self.product_pool.acquire(candidates) if candidates is not None else None,
             "total_found": total_found,
             "dialog_context": dialog_context,
             "timestamp": time.time(),
         }
+        # Повторне збереження (клік по категорії) - посилання старого запису звільняються після acquire
+        self._drop_session(session_id)
+        self.search_results[session_id] = entry
+
+        self._expire(entry["timestamp"])
+        evicted = 0
+        while len(self.search_results) > self.max_sessions:
+            # Найдавніше використана сесія - на початку
+            self._drop_session(next(iter(self.search_results)))
+            evicted += 1
+        if evicted:
+            self.evictions += evicted
+            metrics.incr("sessions.evicted", evicted)
+            logger.info(f"Removed {evicted} least recently used sessions (limit: {self.max_sessions})")
+
+    def _expire(self, now: float) -> int:
+        """Видаляє протерміновані сесії з початку порядку; зупиняється на першій живій"""
+        ttl = settings.search_results_ttl_seconds
+        expired = 0
+        while self.search_results:
+            sid, data = next(iter(self.search_results.items()))
+            if now - data["timestamp"] <= ttl:
+                break
+            self._drop_session(sid)
+            expired += 1
+        if expired:
+            self.expirations += expired
+            metrics.incr("sessions.expired", expired)
+        return expired
 
-        if len(self.search_results) > self.max_sessions:
-            # Видаляємо надлишок (найстаріші сесії)
-            excess_count = len(self.search_results) - self.max_sessions
-            oldest_sessions = sorted(
-                self.search_results.items(),
-                key=lambda kv: kv[1]["timestamp"]
-            )[:excess_count]
-            
-            for sid, _ in oldest_sessions:
-                del self.search_results[sid]
-            
-            logger.info(f"Removed {excess_count} old sessions (limit: {self.max_sessions})")
-
-    def get_search_results(self, session_id: str, offset: int = 0, limit: int = 20) -> Dict[str, Any]:
-        if session_id not in self.search_results:
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Збережений пошук сесії (None - немає або протермінований); доступ оновлює давність"""
+        now = time.time()
+        self._expire(now)
+        stored = self.search_results.get(session_id)
+        if stored is None:
+            return None
+        stored["timestamp"] = now
+        self.search_results.move_to_end(session_id)
+        return stored
+
+    async def session_products(self, stored: Dict[str, Any], candidates: bool = False) -> List[SearchResult]:
+        """Усі товари сесії (candidates=True - повний список до фільтра категорії, якщо є)"""
+        ids, scores = stored["candidates"] if candidates and stored["candidates"] is not None else stored["all_results"]
+        return [SearchResult(**doc) for doc in self.product_pool.hydrate(ids, scores)]
+
+    async def get_search_results(self, session_id: str, offset: int = 0, limit: int = 20) -> Dict[str, Any]:
+        stored = await self.get_session(session_id)
+        if stored is None:
             return {"products": [], "offset": 0, "has_more": False, "total_found": 0}
 
-        stored = self.search_results[session_id]
+        ids, scores = stored["all_results"]
+        end_idx = min(offset + limit, len(ids))
 
-        if time.time() - stored["timestamp"] > settings.search_results_ttl_seconds:
-            del self.search_results[session_id]
-            return {"products": [], "offset": 0, "has_more": False, "total_found": 0}
+        # Документи лише для запитаної сторінки
+        batch = self.product_pool.hydrate(ids, scores, offset, end_idx)
+        has_more = end_idx < len(ids)
+
+        return {"products": batch, "offset": end_idx, "has_more": has_more, "total_found": stored["total_found"]}
 
-        all_results = stored["all_results"]
-        start_idx = offset
-        end_idx = min(offset + limit, len(all_results))
+    async def clear_search_results(self, session_id: str) -> None:
+        self._drop_session(session_id)
 
-        batch = all_results[start_idx:end_idx]
-        has_more = end_idx < len(all_results)
+    async def cleanup_old_results(self) -> int:
+        expired = self._expire(time.time())
+        if expired:
+            logger.info(f"Cleaned {expired} expired sessions")
+        return expired
 
-        return {"products": batch, "offset": end_idx, "has_more": has_more, "total_found": stored["total_found"]}
+    def stats(self) -> Dict[str, Any]:
+        session_refs = sum(
+            len(data["all_results"][0]) + (len(data["candidates"][0]) if data["candidates"] is not None else 0)
+            for data in self.search_results.values()
+        )
+        return {
+            "backend": "memory",
+            "conversations": len(self.histories),
+            "sessions": len(self.search_results),
+            "session_product_refs": session_refs,
+            "pooled_products": len(self.product_pool),
+            "max_sessions": self.max_sessions,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SharedSearchContextManager(SearchContextManager):
+    """
+    Сесії у спільному сховищі: load-more і клік по категорії працюють, хоч би який воркер
+    отримав запит. Як і в ProductPool, документ товару зберігається один раз ("session_product:<id>"),
+    у сесії ("session:<sid>") - лише id, score і контекст. TTL сесії рахується від останнього доступу,
+    документи живуть 2×TTL від запису і продовжуються, лише коли сесія пережила перший TTL -
+    load-more не переписує TTL сотні ключів. Ліміт кількості сесій - політика витіснення сховища.
+    Історія розмови - список у "history:<conversation_id>" з TTL SEARCH_HISTORY_TTL_DAYS від останнього пошуку.
+    """
 
-    def clear_search_results(self, session_id: str) -> None:
-        self.search_results.pop(session_id, None)
+    SESSION_PREFIX = "session:"
+    PRODUCT_PREFIX = "session_product:"
+    HISTORY_PREFIX = "history:"
+
+    def __init__(self, backend: StorageBackend):
+        super().__init__()
+        self.backend = backend
+        self.errors = 0
+
+    def _backend_error(self, op: str, e: Exception) -> None:
+        self.errors += 1
+        metrics.incr("sessions.backend_errors")
+        logger.warning(f"Session {op} failed ({self.backend.name}): {e}")
+
+    async def _load_history(self, conversation_id: str) -> List[Dict[str, Any]]:
+        raw = await self.backend.get(self.HISTORY_PREFIX + conversation_id)
+        return JSON_CODEC.decode(raw) if raw is not None else []
+
+    async def add_search(
+        self,
+        conversation_id: Optional[str],
+        query: str,
+        keywords: List[str],
+        results_count: int,
+        action: str = "product_search",
+    ) -> None:
+        if not conversation_id:
+            return
+        item = SearchHistoryItem(
+            query=query, keywords=keywords, timestamp=time.time(), results_count=results_count, action=action
+        )
+        try:
+            # read-modify-write: запити однієї розмови йдуть послідовно
+            history = await self._load_history(conversation_id)
+            history.append(item.model_dump())
+            await self.backend.set(
+                self.HISTORY_PREFIX + conversation_id,
+                JSON_CODEC.encode(history[-settings.max_search_history :]),
+                settings.search_history_ttl_days * 86400,
+            )
+        except Exception as e:
+            self._backend_error("history store", e)
 
-    def cleanup_old_results(self) -> int:
+    async def get_history(self, conversation_id: Optional[str]) -> List[SearchHistoryItem]:
+        if not conversation_id:
+            return []
+        try:
+            history = await self._load_history(conversation_id)
+        except Exception as e:
+            self._backend_error("history get", e)
+            return []
         now = time.time()
+        ttl = settings.search_history_ttl_days * 86400
+        return [SearchHistoryItem(**h) for h in history if now - h["timestamp"] < ttl]
+
+    async def clear_old_history(self) -> int:
+        return await self.backend.cleanup_expired(self.HISTORY_PREFIX)
+
+    async def store_search_results(
+        self,
+        session_id: str,
+        all_results: List[SearchResult],
+        total_found: int,
+        dialog_context: Dict[str, Any],
+        candidates: Optional[List[SearchResult]] = None,
+    ) -> None:
+        docs: Dict[str, bytes] = {}
+        for r in (*all_results, *(candidates or ())):
+            key = self.PRODUCT_PREFIX + r.id
+            if key not in docs:
+                docs[key] = JSON_CODEC.encode(r.model_dump(exclude={"id", "score"}))
+        session = JSON_CODEC.encode(
+            {
+                "all_results": [[r.id for r in all_results], [float(r.score) for r in all_results]],
+                "candidates": (
+                    [[r.id for r in candidates], [float(r.score) for r in candidates]]
+                    if candidates is not None
+                    else None
+                ),
+                "total_found": total_found,
+                "dialog_context": dialog_context,
+                "docs_at": time.time(),
+            }
+        )
         ttl = settings.search_results_ttl_seconds
-        expired = [sid for sid, data in self.search_results.items() if now - data["timestamp"] > ttl]
-        for sid in expired:
-            del self.search_results[sid]
-        if expired:
-            logger.info(f"Cleaned {len(expired)} expired sessions")
-        return len(expired)
+        try:
+            # Спершу документи: сесія не може посилатися на ще не записані
+            await self.backend.set_many(docs, 2 * ttl)
+            await self.backend.set(self.SESSION_PREFIX + session_id, session, ttl)
+        except Exception as e:
+            self._backend_error("store", e)
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        key = self.SESSION_PREFIX + session_id
+        ttl = settings.search_results_ttl_seconds
+        try:
+            raw = await self.backend.get(key)
+            if raw is None:
+                return None
+            stored = JSON_CODEC.decode(raw)
+            now = time.time()
+            if now - stored["docs_at"] < ttl:
+                await self.backend.touch([key], ttl)
+            else:
+                # Документам лишилось менше TTL - продовжуємо, щоб вони пережили сесію
+                ids = set(stored["all_results"][0])
+                if stored["candidates"] is not None:
+                    ids.update(stored["candidates"][0])
+                await self.backend.touch([self.PRODUCT_PREFIX + doc_id for doc_id in ids], 2 * ttl)
+                stored["docs_at"] = now
+                await self.backend.set(key, JSON_CODEC.encode(stored), ttl)
+        except Exception as e:
+            self._backend_error("get", e)
+            return None
+        return stored
+
+    async def _hydrate(
+        self, ids: List[str], scores: List[float], start: int = 0, end: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        end = len(ids) if end is None else min(end, len(ids))
+        raws = await self.backend.get_many([self.PRODUCT_PREFIX + doc_id for doc_id in ids[start:end]])
+        return [
+            {"id": ids[i], "score": scores[i], **JSON_CODEC.decode(raw)}
+            for i, raw in zip(range(start, end), raws)
+            if raw is not None
+        ]
+
+    async def session_products(self, stored: Dict[str, Any], candidates: bool = False) -> List[SearchResult]:
+        ids, scores = stored["candidates"] if candidates and stored["candidates"] is not None else stored["all_results"]
+        return [SearchResult(**doc) for doc in await self._hydrate(ids, scores)]
+
+    async def get_search_results(self, session_id: str, offset: int = 0, limit: int = 20) -> Dict[str, Any]:
+        stored = await self.get_session(session_id)
+        if stored is None:
+            return {"products": [], "offset": 0, "has_more": False, "total_found": 0}
+
+        ids, scores = stored["all_results"]
+        end_idx = min(offset + limit, len(ids))
+        batch = await self._hydrate(ids, scores, offset, end_idx)
+        return {"products": batch, "offset": end_idx, "has_more": end_idx < len(ids), "total_found": stored["total_found"]}
+
+    async def clear_search_results(self, session_id: str) -> None:
+        # Документи товарів - спільні з іншими сесіями, їх прибирає TTL
+        try:
+            await self.backend.delete([self.SESSION_PREFIX + session_id])
+        except Exception as e:
+            self._backend_error("clear", e)
+
+    async def cleanup_old_results(self) -> int:
+        expired = await self.backend.cleanup_expired(self.SESSION_PREFIX)
+        expired_docs = await self.backend.cleanup_expired(self.PRODUCT_PREFIX)
+        if expired or expired_docs:
+            logger.info(f"Cleaned {expired} expired sessions, {expired_docs} product documents")
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend.name, "ttl_seconds": settings.search_results_ttl_seconds, "errors": self.errors}
 
 
 # Background tasks
 async def periodic_cleanup_task():
     logger.info("Starting periodic cleanup")
+    last_router_rebuild = time.time()
 
     while True:
         try:
             await asyncio.sleep(settings.cleanup_interval_seconds)
 
+            if (
+                settings.enable_intent_router
+                and time.time() - last_router_rebuild >= settings.intent_router_rebuild_interval_seconds
+            ):
+                last_router_rebuild = time.time()
+                await _rebuild_intent_router_safely()
+
             cache = get_embedding_cache()
             expired_cache = await cache.cleanup_expired()
 
+            assistant_cache = get_assistant_cache()
+            expired_cache += await assistant_cache.cleanup_expired()
+            expired_cache += await get_reco_cache().cleanup_expired()
+            expired_cache += await get_result_cache().cleanup_expired()
+            expired_cache += await get_dialog_state_cache().cleanup_expired()
+            if settings.assistant_cache_path:
+                await assistant_cache.save_to_file(settings.assistant_cache_path)
+
             context_mgr = get_context_manager()
-            expired_history = context_mgr.clear_old_history()
-            expired_results = context_mgr.cleanup_old_results()
+            expired_history = await context_mgr.clear_old_history()
+            expired_results = await context_mgr.cleanup_old_results()
 
             logger.info(f"Cleanup: cache={expired_cache}, history={expired_history}, results={expired_results}")
 
@@ -2224,12 +3979,125 @@ def get_http_client() -> httpx.AsyncClient:
     return dependencies.http_client
 
 
+def get_storage_backend() -> Optional[StorageBackend]:
+    """Спільне сховище сесій і кешів; None - STORAGE_BACKEND=memory (стан у пам'яті процесу)"""
+    if dependencies.storage_backend is None:
+        dependencies.storage_backend = create_storage_backend(
+            settings.storage_backend,
+            sqlite_path=settings.storage_sqlite_path,
+            redis_url=settings.storage_redis_url,
+            redis_key_prefix=settings.storage_redis_key_prefix,
+        )
+    return dependencies.storage_backend
+
+
+def _cache_backend(name: str) -> Optional[StorageBackend]:
+    shared = {c.strip() for c in settings.storage_shared_caches_csv.split(",") if c.strip()}
+    return get_storage_backend() if name in shared else None
+
+
 def get_embedding_cache() -> TTLCache:
     if dependencies.embedding_cache is None:
-        dependencies.embedding_cache = TTLCache(settings.embed_cache_size, settings.cache_ttl_seconds)
+        dependencies.embedding_cache = TTLCache(
+            settings.embed_cache_size,
+            settings.cache_ttl_seconds,
+            name="embedding_cache",
+            backend=_cache_backend("embedding_cache"),
+            codec=FLOAT_VECTOR_CODEC,
+        )
     return dependencies.embedding_cache
 
 
+def get_assistant_cache() -> TTLCache:
+    if dependencies.assistant_cache is None:
+        dependencies.assistant_cache = TTLCache(
+            settings.assistant_cache_size,
+            settings.assistant_cache_ttl_seconds,
+            name="assistant_cache",
+            backend=_cache_backend("assistant_cache"),
+        )
+    return dependencies.assistant_cache
+
+
+def get_reco_cache() -> TTLCache:
+    if dependencies.reco_cache is None:
+        dependencies.reco_cache = TTLCache(
+            settings.reco_cache_size,
+            settings.reco_cache_ttl_seconds,
+            name="reco_cache",
+            backend=_cache_backend("reco_cache"),
+        )
+    return dependencies.reco_cache
+
+
+def get_result_cache() -> TTLCache:
+    if dependencies.result_cache is None:
+        dependencies.result_cache = TTLCache(
+            settings.result_cache_size,
+            settings.result_cache_ttl_seconds,
+            name="result_cache",
+            backend=_cache_backend("result_cache"),
+        )
+    return dependencies.result_cache
+
+
+def get_dialog_state_cache() -> TTLCache:
+    """Стан діалогу за токеном; як і сесії, у спільному сховищі, якщо воно задане"""
+    if dependencies.dialog_state_cache is None:
+        dependencies.dialog_state_cache = TTLCache(
+            settings.dialog_state_cache_size,
+            settings.dialog_state_ttl_seconds,
+            name="dialog_state",
+            backend=get_storage_backend(),
+        )
+    return dependencies.dialog_state_cache
+
+
+async def _save_dialog_state(dialog_context: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Зберігає dialog_context відповіді; повертає непрозорий токен для наступного раунду"""
+    if not dialog_context:
+        return None
+    token = secrets.token_urlsafe(12)
+    await get_dialog_state_cache().put(token, dialog_context)
+    return token
+
+
+async def _resolve_dialog_context(
+    dialog_token: Optional[str], dialog_context: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """Контекст за токеном; невідомий або протермінований токен - контекст із запиту (якщо є)"""
+    if dialog_token:
+        saved = await get_dialog_state_cache().get(dialog_token)
+        if saved is not None:
+            return saved
+        logger.info("Dialog token unknown or expired - using request dialog_context")
+    return dialog_context
+
+
+async def refresh_index_generation() -> None:
+    """Оновлює версію каталогу; при зміні записи кешу рекомендацій стають недійсними"""
+    generation = await get_elasticsearch_service().get_index_generation()
+    if not generation or generation == dependencies.index_generation:
+        return
+    if dependencies.index_generation:
+        logger.info(f"📦 Index generation changed: {dependencies.index_generation} -> {generation}")
+        await get_reco_cache().clear()
+        await get_result_cache().clear()
+        if settings.enable_suggest:
+            # Виконується у фоновій задачі periodic_index_generation_task; запити не чекають
+            await _rebuild_suggest_index_safely()
+    dependencies.index_generation = generation
+
+
+async def periodic_index_generation_task():
+    while True:
+        await asyncio.sleep(settings.index_generation_refresh_seconds)
+        try:
+            await refresh_index_generation()
+        except Exception as e:
+            logger.warning(f"Index generation refresh failed: {e}")
+
+
 def get_embedding_service() -> EmbeddingService:
     return EmbeddingService(get_http_client(), get_embedding_cache())
 
@@ -2240,13 +4108,98 @@ def get_elasticsearch_service() -> ElasticsearchService:
 
 def get_gpt_service() -> GPTService:
     if dependencies.gpt_service is None:
-        dependencies.gpt_service = GPTService(get_http_client())
+        dependencies.gpt_service = GPTService(
+            get_http_client(), get_assistant_cache(), get_reco_cache(), get_gpt_scheduler()
+        )
     return dependencies.gpt_service
 
 
+def get_gpt_scheduler() -> Optional[GPTScheduler]:
+    if not settings.enable_gpt_scheduler:
+        return None
+    if dependencies.gpt_scheduler is None:
+        dependencies.gpt_scheduler = GPTScheduler(settings.openai_rpm_limit, settings.openai_tpm_limit)
+    return dependencies.gpt_scheduler
+
+
+def get_intent_router() -> IntentRouter:
+    if dependencies.intent_router is None:
+        dependencies.intent_router = IntentRouter(
+            keyword_matcher=lambda text: find_matching_categories(text, top_n=1),
+            classifier=IntentCentroidClassifier(
+                min_similarity=settings.intent_router_min_similarity,
+                min_margin=settings.intent_router_min_margin,
+                min_examples=settings.intent_router_min_examples,
+            ),
+        )
+    return dependencies.intent_router
+
+
+async def rebuild_intent_router() -> Optional[Dict[str, Any]]:
+    """Перебудовує centroid-класифікатор роутера з залогованих рішень GPT"""
+    if not (SEARCH_LOGGER_AVAILABLE and search_logger):
+        return None
+    decisions = await asyncio.to_thread(
+        search_logger.load_intent_decisions, "gpt", settings.intent_router_max_examples
+    )
+    if not decisions:
+        return None
+
+    embedding_service = get_embedding_service()
+    evaluation = await get_intent_router().rebuild(
+        [(d["query"], d["action"]) for d in decisions], embedding_service.generate_embedding
+    )
+    logger.info(f"Intent router rebuilt from {len(decisions)} decisions: {evaluation}")
+    return evaluation
+
+
+async def rebuild_suggest_index() -> Dict[str, Any]:
+    """Повна перебудова індексу підказок: назви з каталогу + популярні запити з логів"""
+    t0 = time.time()
+    titles = await get_elasticsearch_service().scan_titles(settings.suggest_max_catalog_titles)
+    queries: List[Tuple[str, int]] = []
+    if SEARCH_LOGGER_AVAILABLE and search_logger:
+        queries = await asyncio.to_thread(
+            search_logger.load_popular_queries,
+            1,
+            settings.suggest_max_logged_queries,
+            settings.suggest_min_query_sessions,
+        )
+
+    entries = [(title, 1.0, SOURCE_TITLE) for title in titles]
+    entries += [(query, count * settings.suggest_query_weight, SOURCE_QUERY) for query, count in queries]
+    index = await asyncio.to_thread(
+        SuggestIndex.build,
+        entries,
+        limit=max(settings.suggest_limit, 10),
+        min_query_sessions=settings.suggest_min_query_sessions,
+    )
+    dependencies.suggest_index = index
+    stats = {**index.stats(), "build_ms": round((time.time() - t0) * 1000, 1)}
+    logger.info(f"🔤 Suggest index rebuilt: {stats}")
+    return stats
+
+
+async def _rebuild_suggest_index_safely() -> None:
+    try:
+        await rebuild_suggest_index()
+    except Exception as e:
+        logger.warning(f"Suggest index rebuild failed: {e}")
+
+
+async def _rebuild_intent_router_safely() -> None:
+    try:
+        await rebuild_intent_router()
+    except Exception as e:
+        logger.warning(f"Intent router rebuild failed: {e}")
+
+
 def get_context_manager() -> SearchContextManager:
     if dependencies.context_manager is None:
-        dependencies.context_manager = SearchContextManager()
+        backend = get_storage_backend()
+        dependencies.context_manager = (
+            SharedSearchContextManager(backend) if backend is not None else SearchContextManager()
+        )
     return dependencies.context_manager
 
 
@@ -2258,26 +4211,71 @@ app_start_time = time.time()
 async def lifespan(app: FastAPI):
     logger.info("🚀 Starting TA-DA! Search System")
 
+    storage = get_storage_backend()
+    logger.info(f"🗄️ Storage backend: {storage.name if storage is not None else 'memory'}")
     get_elasticsearch_client()
     get_http_client()
     get_embedding_cache()
 
+    if settings.assistant_cache_path:
+        loaded = await get_assistant_cache().load_from_file(settings.assistant_cache_path)
+        logger.info(f"Assistant cache: loaded {loaded} entries from {settings.assistant_cache_path}")
+
+    try:
+        await refresh_index_generation()
+    except Exception as e:
+        logger.warning(f"Index generation refresh failed: {e}")
+
+    if settings.category_centroids_path and os.path.exists(settings.category_centroids_path):
+        try:
+            classifier = CategoryCentroidClassifier.load(
+                settings.category_centroids_path,
+                min_similarity=settings.category_centroid_min_similarity,
+                min_margin=settings.category_centroid_min_margin,
+            )
+            # Без numpy скалярні добутки на Python для 4096-вимірних векторів надто повільні для запиту
+            if classifier.vectorized:
+                dependencies.category_classifier = classifier
+                logger.info(f"📂 Category centroids: {len(classifier.codes)} categories loaded")
+            else:
+                logger.warning("numpy not installed - category centroids disabled, keyword matching only")
+        except Exception as e:
+            logger.warning(f"Failed to load category centroids: {e}")
+
     cleanup_task = asyncio.create_task(periodic_cleanup_task())
+    generation_task = asyncio.create_task(periodic_index_generation_task())
+    router_task = (
+        asyncio.create_task(_rebuild_intent_router_safely()) if settings.enable_intent_router else None
+    )
+    suggest_task = asyncio.create_task(_rebuild_suggest_index_safely()) if settings.enable_suggest else None
 
     yield
 
     logger.info("🛑 Stopping service")
 
-    cleanup_task.cancel()
-    try:
-        await cleanup_task
-    except asyncio.CancelledError:
-        pass
+    for task in (cleanup_task, generation_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    for task in (router_task, suggest_task):
+        if task and not task.done():
+            task.cancel()
+
+    if settings.assistant_cache_path and dependencies.assistant_cache is not None:
+        try:
+            saved = await dependencies.assistant_cache.save_to_file(settings.assistant_cache_path)
+            logger.info(f"Assistant cache: saved {saved} entries")
+        except Exception as e:
+            logger.warning(f"Failed to persist assistant cache: {e}")
 
     if dependencies.http_client:
         await dependencies.http_client.aclose()
     if dependencies.es_client:
         await dependencies.es_client.close()
+    if dependencies.storage_backend is not None:
+        await dependencies.storage_backend.close()
 
 
 app = FastAPI(
@@ -2376,7 +4374,7 @@ async def readiness_check(es_service: ElasticsearchService = Depends(get_elastic
 
 @app.get("/config")
 async def get_frontend_config():
-    return {"feature_chat_sse": True}
+    return {"feature_chat_sse": True, "feature_chat_progressive": settings.sse_progressive_mode}
 
 
 @app.post("/search", response_model=SearchResponse)
@@ -2433,12 +4431,15 @@ async def search_products(
 @app.post("/chat/search", response_model=ChatSearchResponse)
 async def chat_search(
     request: ChatSearchRequest,
+    response: Response,
     gpt_service: GPTService = Depends(get_gpt_service),
     embedding_service: EmbeddingService = Depends(get_embedding_service),
     es_service: ElasticsearchService = Depends(get_elasticsearch_service),
     context_manager: SearchContextManager = Depends(get_context_manager),
+    intent_router: IntentRouter = Depends(get_intent_router),
 ):
     """🎯 Чат-пошук товарів з GPT асистентом"""
+    deadline = Deadline(settings.chat_request_budget_seconds)
     try:
         query = request.query.strip()
         if not query:
@@ -2451,14 +4452,21 @@ async def chat_search(
             session_id=request.session_id,
             k=request.k,
             selected_category=request.selected_category,
-            dialog_context=request.dialog_context,
+            dialog_context=await _resolve_dialog_context(request.dialog_token, request.dialog_context),
             search_history=request.search_history,
             gpt_service=gpt_service,
             embedding_service=embedding_service,
             es_service=es_service,
-            context_manager=context_manager
+            context_manager=context_manager,
+            intent_router=intent_router,
+            deadline=deadline,
+            use_result_cache=not request.bypass_cache,
+            conversation_id=request.conversation_id,
         )
 
+        if result.get("server_timing"):
+            response.headers["Server-Timing"] = result["server_timing"]
+
         return ChatSearchResponse(
             query_analysis=result["query_analysis"],
             results=result["results"],
@@ -2468,9 +4476,11 @@ async def chat_search(
             assistant_message=result["assistant_message"],
             dialog_state=result["state"],
             dialog_context=result["dialog_context"],
+            dialog_token=await _save_dialog_state(result["dialog_context"]),
             needs_user_input=result["action"] in ["greeting", "invalid", "clarification"],
             actions=result["actions"],
-            categories=result["categories_payload"]
+            categories=result["categories_payload"],
+            stage_timings_ms=result.get("stage_timings_ms")
         )
         
     except Exception as e:
@@ -2494,6 +4504,175 @@ async def chat_search(
         )
 
 
+def _batch_result_line(index: int, query: str, result: Dict[str, Any], compact: bool) -> Dict[str, Any]:
+    if compact:
+        products = [{"id": r.id, "score": round(float(r.score), 4)} for r in result["results"]]
+    else:
+        products = [
+            {"id": r.id, "score": round(float(r.score), 4), "title": r.title_ua or r.title_ru}
+            for r in result["results"]
+        ]
+    line = {
+        "index": index,
+        "query": query,
+        "state": result["state"],
+        "action": result["action"],
+        "results": products,
+        "recommendations": [r.product_id for r in result["recommendations"]],
+        "categories": [cat["code"] for cat in result["categories_payload"] or []],
+        "search_time_ms": round(result["search_time_ms"], 1),
+        "stage_timings_ms": result.get("stage_timings_ms"),
+        # Локальний fallback/пропущений етап - відповідь не кешується і не є відповіддю основної моделі
+        "degraded": result.get("degraded", False),
+        "gpt_tiers": result.get("gpt_tiers") or {},
+    }
+    if not compact:
+        line["assistant_message"] = result["assistant_message"]
+    return line
+
+
+async def _prefetch_batch_queries(
+    queries: List[str],
+    batch: ChatBatchContext,
+    embedding_service: EmbeddingService,
+    es_service: ElasticsearchService,
+) -> None:
+    """Embedding-и всіх сирих запитів пакету, потім їх kNN - через _msearch по batch_msearch_max"""
+    texts: Dict[str, str] = {}
+    for query in queries:
+        texts.setdefault(_normalize_query(query), query)
+    names = list(texts)
+    vectors = await embedding_service.generate_embeddings_parallel(
+        [texts[name] for name in names], max_concurrent=settings.embedding_max_concurrent
+    )
+    if not settings.enable_speculative_retrieval:
+        return
+    pairs = [(name, vector) for name, vector in zip(names, vectors) if vector]
+    for start in range(0, len(pairs), settings.batch_msearch_max):
+        chunk = pairs[start : start + settings.batch_msearch_max]
+        hits = await es_service.msearch_knn([(vector, settings.chat_search_max_k_per_subquery) for _, vector in chunk])
+        batch.knn.msearch_calls += 1
+        batch.knn.searches += len(chunk)
+        batch.prefetched.update((name, h) for (name, _), h in zip(chunk, hits) if h)
+
+
+@app.post("/chat/search/batch")
+async def chat_search_batch(
+    request: ChatSearchBatchRequest,
+    http_request: Request,
+    gpt_service: GPTService = Depends(get_gpt_service),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    es_service: ElasticsearchService = Depends(get_elasticsearch_service),
+    context_manager: SearchContextManager = Depends(get_context_manager),
+    intent_router: IntentRouter = Depends(get_intent_router),
+):
+    """
+    Пакетний чат-пошук для офлайн-оцінки та прогріву кешів.
+    NDJSON: рядок на запит у порядку завершення, останній - {"summary": {...}}.
+    Embedding-и спільні (кеш + in-flight), kNN усіх пайплайнів збираються в _msearch,
+    GPT-виклики - через пул BATCH_GPT_CONCURRENCY з пріоритетом нижчим за живий трафік.
+    """
+    if settings.batch_api_token:
+        auth = http_request.headers.get("authorization", "")
+        if not secrets.compare_digest(auth.encode(), f"Bearer {settings.batch_api_token}".encode()):
+            raise HTTPException(401, "Batch API token required")
+
+    queries = [q.strip() for q in request.queries]
+    if len(queries) > settings.batch_max_queries:
+        raise HTTPException(413, f"Too many queries: {len(queries)} > {settings.batch_max_queries}")
+
+    batch_id = hashlib.md5(f"{time.time()}:{len(queries)}".encode()).hexdigest()[:8]
+    concurrency = request.concurrency or settings.batch_concurrency
+    logger.info(f"📦 Chat batch {batch_id}: {len(queries)} queries, concurrency={concurrency}, cache={request.cache_mode}")
+
+    async def run_one(
+        index: int, query: str, batch: ChatBatchContext, semaphore: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        if not query:
+            return {"index": index, "query": query, "state": "error", "error": "Query empty"}
+        # Кожна задача має власну копію контексту - змінна не витікає за межі пакету
+        _request_batch.set(batch)
+        async with semaphore:
+            session_id = f"batch:{batch_id}:{index}"
+            t0 = time.time()
+            try:
+                result = await execute_chat_search_logic(
+                    query=query,
+                    session_id=session_id,
+                    k=request.k,
+                    selected_category=None,
+                    dialog_context=None,
+                    search_history=[],
+                    gpt_service=gpt_service,
+                    embedding_service=embedding_service,
+                    es_service=es_service,
+                    context_manager=context_manager,
+                    intent_router=intent_router,
+                    use_result_cache=request.cache_mode != "bypass",
+                    refresh_result_cache=request.cache_mode == "refresh",
+                )
+                line = _batch_result_line(index, query, result, request.compact)
+            except Exception as e:
+                logger.warning(f"Batch query '{query}' failed: {e}")
+                line = {"index": index, "query": query, "state": "error", "error": str(e)}
+            finally:
+                await context_manager.clear_search_results(session_id)
+            line["elapsed_ms"] = round((time.time() - t0) * 1000, 1)
+            return line
+
+    async def ndjson_generator():
+        t0 = time.time()
+        batch = ChatBatchContext(
+            knn=KnnBatcher(es_service, settings.batch_msearch_window_ms, settings.batch_msearch_max),
+            gpt_pool=asyncio.Semaphore(settings.batch_gpt_concurrency),
+        )
+        tasks: List["asyncio.Task[Dict[str, Any]]"] = []
+        states: Dict[str, int] = {}
+        elapsed: List[float] = []
+        degraded = 0
+        try:
+            try:
+                await _prefetch_batch_queries([q for q in queries if q], batch, embedding_service, es_service)
+            except Exception as e:
+                logger.warning(f"Batch prefetch failed: {e}")
+            prefetch_ms = (time.time() - t0) * 1000
+
+            semaphore = asyncio.Semaphore(concurrency)
+            tasks = [asyncio.create_task(run_one(i, q, batch, semaphore)) for i, q in enumerate(queries)]
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                states[line["state"]] = states.get(line["state"], 0) + 1
+                if "elapsed_ms" in line:
+                    elapsed.append(line["elapsed_ms"])
+                if line.get("degraded"):
+                    degraded += 1
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+
+            elapsed.sort()
+            summary = {
+                "batch_id": batch_id,
+                "queries": len(queries),
+                "states": states,
+                "degraded": degraded,
+                "elapsed_ms": round((time.time() - t0) * 1000, 1),
+                "prefetch_ms": round(prefetch_ms, 1),
+                "query_p50_ms": elapsed[len(elapsed) // 2] if elapsed else None,
+                "query_p95_ms": elapsed[min(len(elapsed) - 1, int(len(elapsed) * 0.95))] if elapsed else None,
+                "knn_searches": batch.knn.searches,
+                "msearch_calls": batch.knn.msearch_calls,
+                "prefetched_queries": len(batch.prefetched),
+            }
+            metrics.incr("batch.queries", len(queries))
+            logger.info(f"📦 Chat batch {batch_id} done: {summary}")
+            yield json.dumps({"summary": summary}, ensure_ascii=False) + "\n"
+        finally:
+            # Клієнт відключився - решта запитів пакету не потрібна
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson_generator(), media_type="application/x-ndjson")
+
+
 @app.get("/chat/search/sse")
 async def chat_search_sse(
     request: Request,
@@ -2502,13 +4681,19 @@ async def chat_search_sse(
     k: int = 50,
     selected_category: Optional[str] = None,
     dialog_context_b64: Optional[str] = None,
+    dialog_token: Optional[str] = None,
     search_history_b64: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    progressive: Optional[bool] = None,
+    bypass_cache: bool = False,
     gpt_service: GPTService = Depends(get_gpt_service),
     embedding_service: EmbeddingService = Depends(get_embedding_service),
     es_service: ElasticsearchService = Depends(get_elasticsearch_service),
     context_manager: SearchContextManager = Depends(get_context_manager),
+    intent_router: IntentRouter = Depends(get_intent_router),
 ):
     """SSE stream для real-time чат-пошуку з використанням загальної логіки"""
+    deadline = Deadline(settings.chat_request_budget_seconds)
 
     async def event_generator():
         def sse_event(event: str, data: Dict[str, Any]) -> str:
@@ -2518,9 +4703,9 @@ async def chat_search_sse(
             query_stripped = query.strip()
             logger.info(f"💬 Chat SSE: '{query_stripped}'")
 
-            # Decode context
-            dialog_context: Optional[Dict[str, Any]] = None
-            if dialog_context_b64:
+            # Decode context: токен - без base64 у URL; dialog_context_b64 - старі клієнти
+            dialog_context: Optional[Dict[str, Any]] = await _resolve_dialog_context(dialog_token, None)
+            if dialog_context is None and dialog_context_b64:
                 decoded = _urlsafe_b64_to_json(dialog_context_b64)
                 if isinstance(decoded, dict):
                     dialog_context = decoded
@@ -2547,12 +4732,17 @@ async def chat_search_sse(
             # Execute search logic with status callback
             yield sse_event("status", {"message": "Думаю...", "type": "thinking"})
             
-            # Create a queue for status updates
+            # Create a queue for status updates and progressive events: (event, data); None - пошук завершено
             status_queue = asyncio.Queue()
             
             # Define status callback to send status updates during execution
             async def send_status(status_type: str, message: str):
-                await status_queue.put({"type": status_type, "message": message})
+                await status_queue.put(("status", {"type": status_type, "message": message}))
+
+            async def send_event(event: str, data: Dict[str, Any]):
+                await status_queue.put((event, data))
+
+            progressive_mode = settings.sse_progressive_mode if progressive is None else progressive
             
             # Run search logic in background task
             search_task = asyncio.create_task(execute_chat_search_logic(
@@ -2566,21 +4756,29 @@ async def chat_search_sse(
                 embedding_service=embedding_service,
                 es_service=es_service,
                 context_manager=context_manager,
-                status_callback=send_status
+                status_callback=send_status,
+                intent_router=intent_router,
+                event_callback=send_event if progressive_mode else None,
+                deadline=deadline,
+                use_result_cache=not bypass_cache,
+                conversation_id=conversation_id,
             ))
+            # Маркер завершення стає в чергу після всіх статусів задачі: цикл нижче лише чекає
+            # на чергу, без опитування за таймаутом
+            search_task.add_done_callback(lambda _t: status_queue.put_nowait(None))
             
             # Yield status updates as they come
-            while not search_task.done():
-                try:
-                    status_update = await asyncio.wait_for(status_queue.get(), timeout=0.1)
-                    yield sse_event("status", status_update)
-                except asyncio.TimeoutError:
-                    continue
-            
-            # Get remaining status updates
-            while not status_queue.empty():
-                status_update = await status_queue.get()
-                yield sse_event("status", status_update)
+            try:
+                while True:
+                    item = await status_queue.get()
+                    if item is None:
+                        break
+                    event, data = item
+                    yield sse_event(event, data)
+            finally:
+                # Клієнт відключився посеред пошуку - зупиняємо задачу, а не дораховуємо її
+                if not search_task.done():
+                    search_task.cancel()
             
             # Get result
             result = await search_task
@@ -2591,10 +4789,17 @@ async def chat_search_sse(
             # Stream assistant message
             if assistant_message:
                 yield sse_event("assistant_start", {"length": len(assistant_message)})
-                for chunk in _safe_chunks(assistant_message):
-                    yield sse_event("assistant_delta", {"text": chunk})
-                    if settings.sse_slow_mode:
+                deltas = [
+                    sse_event("assistant_delta", {"text": chunk})
+                    for chunk in _text_chunks(assistant_message, settings.sse_chunk_chars)
+                ]
+                if settings.sse_slow_mode:
+                    for delta in deltas:
+                        yield delta
                         await asyncio.sleep(settings.sse_delay_seconds)
+                else:
+                    # Без штучної затримки - один запис у сокет замість запису на кожен фрагмент
+                    yield "".join(deltas)
                 yield sse_event("assistant_end", {})
 
             # Stream additional events for product_search
@@ -2631,11 +4836,19 @@ async def chat_search_sse(
                 assistant_message=assistant_message,
                 dialog_state=result["state"],
                 dialog_context=result["dialog_context"],
+                dialog_token=await _save_dialog_state(result["dialog_context"]),
                 needs_user_input=action in ["greeting", "invalid", "clarification"],
                 actions=result["actions"],
-                categories=result["categories_payload"]
+                categories=result["categories_payload"],
+                stage_timings_ms=result.get("stage_timings_ms")
             ).model_dump()
 
+            if result.get("stage_timings_ms"):
+                yield sse_event("timings", {
+                    "stage_timings_ms": result["stage_timings_ms"],
+                    "server_timing": result.get("server_timing", ""),
+                })
+
             yield sse_event("final", payload)
 
         except Exception as e:
@@ -2650,7 +4863,7 @@ async def load_more_products(
     request: LoadMoreRequest, context_manager: SearchContextManager = Depends(get_context_manager)
 ):
     try:
-        result = context_manager.get_search_results(
+        result = await context_manager.get_search_results(
             session_id=request.session_id, offset=request.offset, limit=request.limit
         )
 
@@ -2681,6 +4894,7 @@ async def get_stats(es_service: ElasticsearchService = Depends(get_elasticsearch
 
 @app.post("/api/ta-da/find.gcode")
 async def ta_da_find_gcode(req: TadaFindRequest, http_client: httpx.AsyncClient = Depends(get_http_client)):
+    deadline = Deadline(settings.ta_da_timeout_seconds)
     headers = {
         "User-Language": req.user_language or settings.ta_da_default_language,
         "Content-Type": "application/json",
@@ -2696,7 +4910,7 @@ async def ta_da_find_gcode(req: TadaFindRequest, http_client: httpx.AsyncClient
     url = f"{settings.ta_da_api_base_url.rstrip('/')}/find.gcode"
 
     try:
-        r = await http_client.post(url, headers=headers, json=payload, timeout=20.0)
+        r = await http_client.post(url, headers=headers, json=payload, timeout=deadline.timeout(settings.ta_da_timeout_seconds))
         if r.status_code != 200:
             try:
                 error_body = r.text
@@ -2712,6 +4926,10 @@ async def ta_da_find_gcode(req: TadaFindRequest, http_client: httpx.AsyncClient
 
         return data
 
+    except httpx.TimeoutException:
+        Deadline.miss("tada")
+        logger.warning("TA-DA proxy timeout")
+        return {"error": "API unavailable", "price": 0, "rating": 0}
     except Exception as e:
         logger.warning(f"TA-DA proxy error: {e}")
         return {"error": "API unavailable", "price": 0, "rating": 0}
@@ -2730,16 +4948,121 @@ async def clear_cache(cache: TTLCache = Depends(get_embedding_cache)):
 async def get_cache_stats(cache: TTLCache = Depends(get_embedding_cache)):
     try:
         expired = await cache.cleanup_expired()
+        assistant_cache = get_assistant_cache()
         return {
             "size": len(cache),
             "capacity": cache.capacity,
             "ttl_seconds": cache.ttl_seconds,
             "expired_cleaned": expired,
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "assistant_cache": {**assistant_cache.stats(), "enabled": settings.enable_assistant_cache},
+            "reco_cache": {
+                **get_reco_cache().stats(),
+                "enabled": settings.enable_reco_cache,
+                "index_generation": dependencies.index_generation,
+            },
+            "result_cache": {
+                **get_result_cache().stats(),
+                "enabled": settings.enable_result_cache,
+                "fresh_seconds": settings.result_cache_fresh_seconds,
+                "refreshing": len(_result_refresh_tasks),
+            },
+            "search_sessions": get_context_manager().stats(),
+            "dialog_state": get_dialog_state_cache().stats(),
         }
     except Exception as e:
         return {"size": len(cache), "error": str(e)}
 
 
+@app.post("/cache/assistant/clear")
+async def clear_assistant_cache(cache: TTLCache = Depends(get_assistant_cache)):
+    await cache.clear()
+    return {"message": "Assistant cache cleared"}
+
+
+@app.post("/cache/reco/clear")
+async def clear_reco_cache(cache: TTLCache = Depends(get_reco_cache)):
+    await cache.clear()
+    return {"message": "Recommendation cache cleared"}
+
+
+@app.post("/cache/result/clear")
+async def clear_result_cache(cache: TTLCache = Depends(get_result_cache)):
+    await cache.clear()
+    return {"message": "Result cache cleared"}
+
+
+def _gpt_tier_stats(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Частка перемог кожного tier (primary / fallback / local) та їх латентність"""
+    counters, histograms = snapshot["counters"], snapshot["histograms"]
+    stats: Dict[str, Any] = {}
+    for stage in ("analyze", "reco"):
+        wins = {
+            tier: counters.get(f"gpt.{stage}.tier.{tier}.wins", 0.0) for tier in ("primary", "fallback", "local")
+        }
+        total = sum(wins.values())
+        stats[stage] = {
+            "total": total,
+            "hedged": counters.get(f"gpt.{stage}.hedged", 0.0),
+            "tiers": {
+                tier: {
+                    "wins": n,
+                    "win_rate": round(n / total, 4) if total else 0.0,
+                    "latency_ms": histograms.get(f"gpt.{stage}.tier.{tier}.latency_ms"),
+                }
+                for tier, n in wins.items()
+            },
+        }
+    return stats
+
+
+@app.get("/metrics")
+async def get_metrics():
+    scheduler = get_gpt_scheduler()
+    snapshot = metrics.snapshot()
+    return {
+        "uptime_seconds": time.time() - app_start_time,
+        **snapshot,
+        "gpt_scheduler": scheduler.stats() if scheduler else None,
+        "gpt_tiers": _gpt_tier_stats(snapshot),
+    }
+
+
+@app.get("/suggest")
+async def suggest(q: str = "", limit: Optional[int] = None):
+    """Typeahead-підказки за префіксом: лише пам'ять процесу, без ES/GPT"""
+    t0 = time.perf_counter()
+    index = dependencies.suggest_index
+    suggestions = index.suggest(q[:100], min(limit or settings.suggest_limit, 20)) if index else []
+    took_ms = (time.perf_counter() - t0) * 1000
+    metrics.observe("suggest_ms", took_ms)
+    return {"query": q, "suggestions": suggestions, "took_ms": round(took_ms, 3)}
+
+
+@app.get("/suggest/stats")
+async def suggest_stats():
+    index = dependencies.suggest_index
+    return {"enabled": settings.enable_suggest, **(index.stats() if index else {"entries": 0})}
+
+
+@app.post("/suggest/rebuild")
+async def rebuild_suggest_endpoint():
+    return await rebuild_suggest_index()
+
+
+@app.get("/intent-router/stats")
+async def get_intent_router_stats(intent_router: IntentRouter = Depends(get_intent_router)):
+    """Частка запитів без GPT та точність роутера відносно залогованих рішень GPT"""
+    return {"enabled": settings.enable_intent_router, **intent_router.stats()}
+
+
+@app.post("/intent-router/rebuild")
+async def rebuild_intent_router_endpoint():
+    evaluation = await rebuild_intent_router()
+    return {"rebuilt": evaluation is not None, "evaluation": evaluation}
+
+
 @app.get("/api/image-proxy")
 async def image_proxy(url: str, http_client: httpx.AsyncClient = Depends(get_http_client)):
     try:
@@ -8,8 +8,13 @@ The description_vector will now include:
 3. sku + good_code (product codes for exact matching)
 
 This ensures semantic search works for product names, not just descriptions!
+
+Category codes (category_codes keyword field) are computed here once per product,
+so the chat backend does not run keyword matching on every request.
+Use --categories-only to refresh category codes without regenerating embeddings.
 """
 
+import argparse
 import asyncio
 import json
 import time
@@ -22,6 +27,8 @@ from dotenv import load_dotenv
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from categories import CATEGORY_CODES_FIELD, product_category_codes, products_category_codes
+
 # Logging to both console and file
 log_file = "/app/indexing.log"
 logging.basicConfig(
@@ -143,6 +150,26 @@ async def generate_embedding(http_client: httpx.AsyncClient, text: str, retry: i
             return None
 
 
+async def ensure_category_mapping(es: AsyncElasticsearch) -> None:
+    """Add the category_codes keyword field to the index mapping (no-op if it exists)"""
+    await es.indices.put_mapping(
+        index=settings.index_name,
+        properties={CATEGORY_CODES_FIELD: {"type": "keyword"}}
+    )
+    logger.info(f"✓ Mapping has {CATEGORY_CODES_FIELD} (keyword)")
+
+
+async def mark_catalog_generation(es: AsyncElasticsearch) -> None:
+    """New _meta.catalog_generation: the chat backend drops result/reco caches and rebuilds suggestions"""
+    mapping = await es.indices.get_mapping(index=settings.index_name)
+    for idx in mapping.values():
+        meta = dict((idx.get("mappings") or {}).get("_meta") or {})
+        meta["catalog_generation"] = str(time.time_ns())
+        await es.indices.put_mapping(index=settings.index_name, meta=meta)
+        logger.info(f"✓ Catalog generation {meta['catalog_generation']}")
+        return
+
+
 async def load_products() -> List[Dict[str, Any]]:
     """Load products from JSON file"""
     logger.info(f"Loading products from {settings.products_file}...")
@@ -207,6 +234,7 @@ async def reindex_products():
             return
         
         logger.info(f"✓ Index {settings.index_name} exists")
+        await ensure_category_mapping(es)
         
         # Load products
         products = await load_products()
@@ -269,7 +297,8 @@ async def reindex_products():
                     })
                     bulk_operations.append({
                         "doc": {
-                            "description_vector": embedding
+                            "description_vector": embedding,
+                            CATEGORY_CODES_FIELD: product_category_codes(product)
                         }
                     })
                     processed += 1
@@ -308,6 +337,7 @@ async def reindex_products():
         # Refresh index
         logger.info("Refreshing index...")
         await es.indices.refresh(index=settings.index_name)
+        await mark_catalog_generation(es)
         
         total_time = time.time() - start_time
         
@@ -332,6 +362,7 @@ async def reindex_products():
             logger.info("  ✓ title_ua + title_ru (product names)")
             logger.info("  ✓ description_ua + description_ru (descriptions)")
             logger.info("  ✓ sku + good_code (product codes)")
+            logger.info(f"  ✓ {CATEGORY_CODES_FIELD} (precomputed categories)")
             logger.info("")
             logger.info("Semantic search will now work much better!")
         else:
@@ -345,6 +376,65 @@ async def reindex_products():
         await http_client.aclose()
 
 
+async def reindex_categories():
+    """Update only category_codes for all products (no embeddings)"""
+    start_time = time.time()
+    es = AsyncElasticsearch(
+        [settings.elastic_url],
+        basic_auth=(settings.elastic_user, settings.elastic_password)
+    )
+    
+    try:
+        if not await es.indices.exists(index=settings.index_name):
+            logger.error(f"Index {settings.index_name} does not exist!")
+            return
+        await ensure_category_mapping(es)
+        
+        products = await load_products()
+        updated = 0
+        uncategorized = 0
+        errors = 0
+        
+        for i in range(0, len(products), settings.batch_size * 25):
+            bulk_operations = []
+            chunk = products[i:i + settings.batch_size * 25]
+            for product, codes in zip(chunk, products_category_codes(chunk)):
+                if not codes:
+                    uncategorized += 1
+                bulk_operations.append({"update": {"_index": settings.index_name, "_id": product["uuid"]}})
+                bulk_operations.append({"doc": {CATEGORY_CODES_FIELD: codes}})
+            
+            try:
+                response = await es.bulk(operations=bulk_operations, refresh=False)
+                if response.get("errors"):
+                    errors += sum(1 for item in response.get("items", []) if item.get("update", {}).get("error"))
+                updated += len(bulk_operations) // 2
+                logger.info(f"Progress: {updated}/{len(products)}")
+            except Exception as e:
+                logger.error(f"Bulk update error: {e}")
+                errors += len(bulk_operations) // 2
+        
+        await es.indices.refresh(index=settings.index_name)
+        await mark_catalog_generation(es)
+        logger.info(
+            f"✓ Category codes updated: {updated - errors} products, "
+            f"{uncategorized} without category, {errors} errors in {time.time() - start_time:.1f}s"
+        )
+    
+    except Exception as e:
+        logger.error(f"Fatal error during category update: {e}", exc_info=True)
+    
+    finally:
+        await es.close()
+
+
 if __name__ == "__main__":
-    asyncio.run(reindex_products())
+    parser = argparse.ArgumentParser(description="Reindex product vectors and category codes")
+    parser.add_argument(
+        "--categories-only",
+        action="store_true",
+        help=f"only recompute {CATEGORY_CODES_FIELD}, keep existing embeddings"
+    )
+    args = parser.parse_args()
+    asyncio.run(reindex_categories() if args.categories_only else reindex_products())
 
@@ -6,7 +6,7 @@
 import os
 import json
 import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
 from pathlib import Path
 
 
@@ -27,6 +27,7 @@ class SearchLogger:
         self.logs_dir.mkdir(exist_ok=True)
         self.log_file = self.logs_dir / "search_queries.json"
         self.readable_file = self.logs_dir / "search_queries_readable.txt"
+        self.intent_file = self.logs_dir / "intent_decisions.jsonl"
         
     def _load_logs(self) -> List[Dict[str, Any]]:
         """Завантажує всі існуючі логи з файлу."""
@@ -172,6 +173,84 @@ class SearchLogger:
         logs.append(log_entry)
         self._save_logs(logs)
     
+    def log_intent_decision(self, query: str, action: str, source: str = "gpt", has_context: bool = False):
+        """
+        Дописує рішення про намір (GPT або локального роутера) в JSONL.
+        Ці записи - навчальні дані для локального роутера намірів.
+        
+        Args:
+            query: Запит користувача
+            action: greeting | invalid | clarification | product_search
+            source: Хто прийняв рішення (gpt, rules, centroid)
+            has_context: Чи залежало рішення від історії діалогу
+        """
+        entry = {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "query": query,
+            "action": action,
+            "source": source,
+            "has_context": has_context,
+        }
+        with open(self.intent_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    
+    def load_intent_decisions(self, source: str = "gpt", limit: int = 2000) -> List[Dict[str, Any]]:
+        """
+        Читає останні рішення про наміри без контексту діалогу.
+        
+        Args:
+            source: Фільтр за джерелом рішення
+            limit: Максимальна кількість останніх записів
+            
+        Returns:
+            Список записів {query, action, source, ...}
+        """
+        if not self.intent_file.exists():
+            return []
+        
+        decisions = []
+        with open(self.intent_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("source") == source and not entry.get("has_context"):
+                    decisions.append(entry)
+        return decisions[-limit:]
+    
+    def load_popular_queries(
+        self, min_results: int = 1, limit: int = 5000, min_sessions: int = 1
+    ) -> List[Tuple[str, int]]:
+        """
+        Частота товарних запитів, що знайшли товари (без фільтра категорії).
+
+        Args:
+            min_results: Мінімальна кількість товарів після фільтрації
+            limit: Максимальна кількість найпопулярніших запитів
+            min_sessions: Мінімальна кількість різних сесій (розмова чату, інакше session_id)
+
+        Returns:
+            Список (query, кількість сесій), від найчастішого
+        """
+        sessions: Dict[str, Set[str]] = {}
+        texts: Dict[str, str] = {}
+        for log in self._load_logs():
+            query = (log.get("query") or "").strip()
+            if not query or log.get("intent") != "product_search":
+                continue
+            if (log.get("additional_info") or {}).get("category_filter"):
+                continue
+            if (log.get("search_stats") or {}).get("after_filtering", 0) < min_results:
+                continue
+            key = " ".join(query.lower().split())
+            session = (log.get("additional_info") or {}).get("conversation_id") or log.get("session_id") or ""
+            sessions.setdefault(key, set()).add(session)
+            texts[key] = query
+        counts = [(key, len(seen)) for key, seen in sessions.items() if len(seen) >= min_sessions]
+        ranked = sorted(counts, key=lambda item: item[1], reverse=True)[:limit]
+        return [(texts[key], count) for key, count in ranked]
+
     def get_session_logs(self, session_id: str) -> List[Dict[str, Any]]:
         """
         Читає всі логи для конкретної сесії.
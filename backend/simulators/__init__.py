@@ -0,0 +1,33 @@
+"""
+Локальні симулятори зовнішніх сервісів для навантажувального тестування:
+OpenAI (/v1/chat/completions), Ollama (/api/embeddings) та TA-DA API (find.gcode).
+
+Усі три маршрути зібрані в одному ASGI застосунку (create_app), тож бекенд
+можна направити на симулятор трьома змінними оточення:
+    OPENAI_BASE_URL=http://localhost:9100/v1
+    EMBEDDING_API_URL=http://localhost:9100/api/embeddings
+    TA_DA_API_BASE_URL=http://localhost:9100
+Запуск: python -m simulators --port 9100
+"""
+
+from fastapi import FastAPI
+
+from .ollama_sim import router as ollama_router
+from .openai_sim import router as openai_router
+from .tada_sim import router as tada_router
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="TA-DA! external services simulator")
+    app.include_router(openai_router)
+    app.include_router(ollama_router)
+    app.include_router(tada_router)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+__all__ = ["create_app"]
@@ -0,0 +1,12 @@
+import argparse
+
+import uvicorn
+
+from . import create_app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TA-DA! external services simulator")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9100)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
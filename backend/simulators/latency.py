@@ -0,0 +1,43 @@
+"""
+Розподіли затримок симуляторів, задаються рядком у змінній оточення:
+    fixed:800             - завжди 800 мс
+    uniform:30,120        - рівномірно 30..120 мс
+    lognormal:900,0.35    - медіана 900 мс, sigma 0.35 (важкий правий хвіст)
+"""
+
+import asyncio
+import os
+import random
+from typing import Optional
+
+_rng = random.Random(int(os.getenv("SIM_SEED", "42")))
+
+
+class LatencyModel:
+    def __init__(self, spec: str):
+        kind, _, params = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+        if self.kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    @classmethod
+    def from_env(cls, name: str, default: str) -> "LatencyModel":
+        return cls(os.getenv(name, default))
+
+    def sample_ms(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return _rng.uniform(self.params[0], self.params[1])
+        median, sigma = self.params[0], (self.params[1] if len(self.params) > 1 else 0.3)
+        return median * _rng.lognormvariate(0.0, sigma)
+
+    async def sleep(self, scale: Optional[float] = None) -> float:
+        ms = self.sample_ms() * (scale or 1.0)
+        await asyncio.sleep(ms / 1000.0)
+        return ms
+
+
+def chance(probability: float) -> bool:
+    return probability > 0 and _rng.random() < probability
@@ -0,0 +1,54 @@
+"""
+Симулятор Ollama /api/embeddings.
+Вектор детермінований: сума hash-seeded векторів токенів тексту, нормалізована.
+Тексти зі спільними словами отримують близькі вектори, тож kNN по індексу,
+заповненому тими ж векторами (seed_index), поводиться правдоподібно.
+"""
+
+import hashlib
+import math
+import os
+import random
+import re
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from fastapi import APIRouter
+
+from .latency import LatencyModel
+
+VECTOR_DIMENSION = int(os.getenv("VECTOR_DIMENSION", "4096"))
+EMBEDDING_LATENCY = LatencyModel.from_env("SIM_EMBEDDING_LATENCY", "lognormal:60,0.3")
+
+_TOKEN_RE = re.compile(r"[a-zа-яіїєґё0-9]+", re.IGNORECASE)
+
+router = APIRouter()
+
+
+@lru_cache(maxsize=50000)
+def _token_vector(token: str, dim: int) -> List[float]:
+    seed = int(hashlib.md5(token.encode("utf-8")).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+    return [rng.gauss(0.0, 1.0) for _ in range(dim)]
+
+
+def embed_text(text: str, dim: int = VECTOR_DIMENSION) -> List[float]:
+    # Грубий стемінг: перші 5 символів ("вазон"/"вазони" → один токен)
+    tokens = [t[:5] for t in _TOKEN_RE.findall((text or "").lower()) if len(t) > 2] or [text or "<empty>"]
+    acc = [0.0] * dim
+    for token in tokens:
+        for i, x in enumerate(_token_vector(token, dim)):
+            acc[i] += x
+    norm = math.sqrt(sum(x * x for x in acc)) or 1.0
+    return [x / norm for x in acc]
+
+
+@router.post("/api/embeddings")
+async def embeddings(payload: Dict[str, Any]):
+    text = payload.get("prompt")
+    if text is None:
+        text = payload.get("input")
+    if isinstance(text, list):
+        text = text[0] if text else ""
+    await EMBEDDING_LATENCY.sleep()
+    return {"embedding": embed_text(str(text or ""))}
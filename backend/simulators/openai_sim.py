@@ -0,0 +1,161 @@
+"""
+Симулятор OpenAI /v1/chat/completions для двох промптів бекенду:
+- аналіз запиту (unified_chat_assistant) → action + semantic_subqueries;
+- рекомендації (analyze_products) → recommendations по product_index кандидатів.
+Відповідь валідна за схемою, яку очікує GPTService; поле usage заповнене
+(включно з cached_tokens для повторюваного system-префікса).
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Set
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from .latency import LatencyModel, chance
+
+ANALYZE_LATENCY = LatencyModel.from_env("SIM_OPENAI_ANALYZE_LATENCY", "lognormal:900,0.35")
+RECO_LATENCY = LatencyModel.from_env("SIM_OPENAI_RECO_LATENCY", "lognormal:2200,0.4")
+RATE_LIMIT_PROBABILITY = float(os.getenv("SIM_OPENAI_429_RATE", "0"))
+RETRY_AFTER_MS = os.getenv("SIM_OPENAI_RETRY_AFTER_MS", "500")
+
+
+def _parse_model_scales(spec: str) -> Dict[str, float]:
+    """"gpt-4o-mini=1.0,gpt-3.5-turbo=0.4" → множники затримки для моделей"""
+    scales = {}
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            scales[name.strip()] = float(value)
+    return scales
+
+
+MODEL_LATENCY_SCALE = _parse_model_scales(os.getenv("SIM_OPENAI_MODEL_LATENCY_SCALE", ""))
+
+GREETINGS = ("привіт", "вітаю", "добрий", "доброго", "дякую", "спасибі", "hello", "hi", "бувай")
+_QUERY_RE = re.compile(r'\*\*Запит користувача:\*\* "(.*)"')
+_CANDIDATES_RE = re.compile(r"кандидатів\):\*\*\s*(\[.*\])", re.DOTALL)
+_TOKEN_RE = re.compile(r"[a-zа-яіїєґё0-9]+", re.IGNORECASE)
+
+# Імітація prompt caching: префікси, які вже "бачив" сервер
+_seen_prefixes: Set[str] = set()
+
+router = APIRouter()
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 3)
+
+
+def _analyze(query: str) -> Dict[str, Any]:
+    normalized = query.lower().strip()
+    words = _TOKEN_RE.findall(normalized)
+    if not words or sum(len(w) for w in words) < 2:
+        return {
+            "action": "invalid",
+            "confidence": 0.9,
+            "assistant_message": "Вибачте, я можу допомогти лише з пошуком товарів TA-DA!.",
+            "needs_user_input": True,
+        }
+    if words[0] in GREETINGS and len(words) <= 3:
+        return {
+            "action": "greeting",
+            "confidence": 0.95,
+            "assistant_message": "Вітаю! Що шукаєте сьогодні?",
+            "needs_user_input": True,
+        }
+
+    subqueries = [query.strip()]
+    if len(words) > 2:
+        subqueries.append(" ".join(words[:2]))
+    subqueries.append(f"{words[0]} для дому")
+    return {
+        "action": "product_search",
+        "confidence": 0.88,
+        "assistant_message": "Шукаю для вас товари...",
+        "semantic_subqueries": subqueries[:3],
+        "categories": None,
+        "needs_user_input": False,
+    }
+
+
+def _recommend(query: str, candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    q_tokens = {t[:5] for t in _TOKEN_RE.findall(query.lower()) if len(t) > 2}
+    recos = []
+    for item in candidates:
+        title = str(item.get("title") or "")
+        t_tokens = {t[:5] for t in _TOKEN_RE.findall(title.lower()) if len(t) > 2}
+        overlap = len(q_tokens & t_tokens) / len(q_tokens) if q_tokens else 0.0
+        jitter = int(hashlib.md5(title.encode("utf-8")).hexdigest()[:4], 16) / 0xFFFF * 0.2
+        score = round(min(0.98, 0.35 + 0.5 * overlap + jitter), 2)
+        if score >= 0.4:
+            recos.append(
+                {
+                    "product_index": item.get("index"),
+                    "relevance_score": score,
+                    "reason": f"Відповідає запиту «{query}»: {title[:60]}",
+                    "bucket": "must_have" if score >= 0.75 else "good_to_have" if score >= 0.55 else "also_consider",
+                }
+            )
+    recos.sort(key=lambda r: r["relevance_score"], reverse=True)
+    return {
+        "recommendations": recos[:10],
+        "assistant_message": f"Я підібрав {min(len(recos), 10)} варіантів за вашим запитом.",
+    }
+
+
+@router.post("/v1/chat/completions")
+async def chat_completions(payload: Dict[str, Any]):
+    messages = payload.get("messages") or []
+    system = next((str(m.get("content") or "") for m in messages if m.get("role") == "system"), "")
+    user = next((str(m.get("content") or "") for m in reversed(messages) if m.get("role") == "user"), "")
+    model = payload.get("model") or "gpt-4o-mini"
+    is_reco = "product_index" in system
+
+    if chance(RATE_LIMIT_PROBABILITY):
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after-ms": RETRY_AFTER_MS},
+            content={"error": {"message": "Rate limit reached (simulated)", "type": "requests"}},
+        )
+
+    await (RECO_LATENCY if is_reco else ANALYZE_LATENCY).sleep(MODEL_LATENCY_SCALE.get(model))
+
+    match = _QUERY_RE.search(user)
+    query = match.group(1) if match else user[-200:]
+    if is_reco:
+        cand_match = _CANDIDATES_RE.search(user)
+        try:
+            candidates = json.loads(cand_match.group(1)) if cand_match else []
+        except json.JSONDecodeError:
+            candidates = []
+        body = _recommend(query, candidates)
+    else:
+        body = _analyze(query)
+    content = json.dumps(body, ensure_ascii=False)
+
+    prefix_key = hashlib.md5(f"{model}|{system}".encode("utf-8")).hexdigest()
+    system_tokens = _tokens(system)
+    # OpenAI кешує префікси від 1024 токенів блоками по 128
+    cached = (system_tokens // 128) * 128 if prefix_key in _seen_prefixes and system_tokens >= 1024 else 0
+    _seen_prefixes.add(prefix_key)
+    prompt_tokens = system_tokens + _tokens(user)
+    completion_tokens = _tokens(content)
+
+    return {
+        "id": f"chatcmpl-sim-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        },
+    }
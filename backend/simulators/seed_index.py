@@ -0,0 +1,118 @@
+"""
+Заповнює локальний ES синтетичним каталогом з векторами симулятора embeddings,
+щоб повний пайплайн (kNN + BM25 + GPT-симулятор) працював офлайн і відтворювано.
+
+    python -m simulators.seed_index --count 5000 [--recreate]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_bulk
+
+from categories import CATEGORY_CODES_FIELD, product_category_codes
+
+from .ollama_sim import VECTOR_DIMENSION, embed_text
+
+ITEMS = [
+    ("Вазон керамічний", "для кімнатних рослин з дренажним отвором"),
+    ("Каструля емальована", "з кришкою для індукційних плит"),
+    ("Сковорода антипригарна", "з алюмінію, ручка soft-touch"),
+    ("Футболка чоловіча", "бавовна 100%, базовий крій"),
+    ("Піжама жіноча", "м'яка трикотажна тканина"),
+    ("Капці домашні", "теплі, з нековзною підошвою"),
+    ("Рушник махровий", "бавовна, висока вбираність"),
+    ("Конструктор дитячий", "розвиває моторику, для дітей 5+"),
+    ("Лялька", "з аксесуарами та одягом"),
+    ("Шкарпетки", "бавовняні, набір 3 пари"),
+    ("Кошик для білизни", "пластиковий з кришкою"),
+    ("Контейнер харчовий", "з герметичною кришкою"),
+    ("Свічка ароматична", "у склянці, час горіння 20 год"),
+    ("Гірлянда новорічна", "LED, теплий білий"),
+    ("Набір олівців", "кольорові, 12 шт"),
+]
+COLORS = ["білий", "чорний", "синій", "червоний", "зелений", "сірий", "рожевий", "бежевий"]
+SIZES = ["малий", "середній", "великий", "15 см", "20 см", "1 л", "3 л", "S", "M", "L"]
+
+MAPPING = {
+    "properties": {
+        "title_ua": {"type": "text"},
+        "title_ru": {"type": "text"},
+        "description_ua": {"type": "text"},
+        "description_ru": {"type": "text"},
+        "sku": {"type": "keyword"},
+        "good_code": {"type": "keyword"},
+        "uktzed": {"type": "keyword"},
+        "measurement_unit_ua": {"type": "keyword"},
+        "availability": {"type": "boolean"},
+        "discounted": {"type": "boolean"},
+        CATEGORY_CODES_FIELD: {"type": "keyword"},
+        "description_vector": {
+            "type": "dense_vector",
+            "dims": VECTOR_DIMENSION,
+            "index": True,
+            "similarity": "cosine",
+        },
+    }
+}
+
+
+def synthetic_products(count: int, seed: int):
+    rng = random.Random(seed)
+    for i in range(count):
+        title, desc = rng.choice(ITEMS)
+        full_title = f"{title} {rng.choice(COLORS)} {rng.choice(SIZES)}"
+        code = f"{100000 + i}"
+        yield {
+            "_id": f"sim-{i}",
+            "title_ua": full_title,
+            "description_ua": f"{full_title}: {desc}",
+            "sku": f"SKU{code}",
+            "good_code": code,
+            "measurement_unit_ua": "шт",
+            "availability": rng.random() > 0.1,
+            "discounted": rng.random() < 0.2,
+        }
+
+
+async def seed(count: int, recreate: bool, seed_value: int) -> None:
+    index = os.getenv("INDEX_NAME", "products_qwen3_8b")
+    es = AsyncElasticsearch(
+        os.getenv("ELASTIC_URL", "http://localhost:9200"),
+        basic_auth=(os.getenv("ELASTIC_USER", "elastic"), os.getenv("ELASTIC_PASSWORD", "elastic")),
+        request_timeout=60,
+    )
+    try:
+        if recreate and await es.indices.exists(index=index):
+            await es.indices.delete(index=index)
+        if not await es.indices.exists(index=index):
+            await es.indices.create(index=index, mappings=MAPPING)
+
+        def actions():
+            for doc in synthetic_products(count, seed_value):
+                doc_id = doc.pop("_id")
+                doc["description_vector"] = embed_text(doc["description_ua"])
+                doc[CATEGORY_CODES_FIELD] = product_category_codes(doc)
+                yield {"_index": index, "_id": doc_id, "_source": doc}
+
+        ok, errors = await async_bulk(es, actions(), chunk_size=200, raise_on_error=False)
+        await es.indices.refresh(index=index)
+        print(f"Indexed {ok} products into {index} (errors: {len(errors) if errors else 0})")
+    finally:
+        await es.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--recreate", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(seed(args.count, args.recreate, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Симулятор TA-DA API find.gcode: детерміновані ціна/рейтинг/фото за good_code"""
+
+import hashlib
+import os
+from typing import Any, Dict
+
+from fastapi import APIRouter
+
+from .latency import LatencyModel
+
+TADA_LATENCY = LatencyModel.from_env("SIM_TADA_LATENCY", "uniform:30,120")
+
+router = APIRouter()
+
+
+@router.post("/find.gcode")
+async def find_gcode(payload: Dict[str, Any]):
+    good_code = str(payload.get("good_code") or "")
+    await TADA_LATENCY.sleep()
+    if not good_code:
+        return {"error": "good_code is required"}
+
+    h = int(hashlib.md5(good_code.encode("utf-8")).hexdigest()[:8], 16)
+    price = round(19.9 + (h % 200000) / 100.0, 2)
+    discounted = h % 4 == 0
+    return {
+        "good_code": good_code,
+        "shop_id": payload.get("shop_id"),
+        "price": price,
+        "discount_price": round(price * 0.85, 2) if discounted else None,
+        "rating": round(3.5 + (h % 16) / 10.0, 1) if h % 5 else 0,
+        "photo": os.getenv("SIM_TADA_PHOTO_URL", "") or None,
+    }
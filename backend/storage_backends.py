@@ -0,0 +1,374 @@
+"""
+Сховища стану, спільного для кількох воркерів uvicorn / реплік API:
+сесії чат-пошуку (load-more може потрапити в інший процес) та кеші
+(embedding, відповіді, рекомендації, асистент) - щоб не прогрівати їх у кожному процесі.
+
+Інтерфейс - ключ → bytes з TTL; простір імен задає префікс ключа ("embedding_cache:...").
+Серіалізацію робить викликач (Codec), сховище зберігає лише байти.
+
+- MemoryBackend - у пам'яті процесу: еталон інтерфейсу для бенчмарків і перевірок без сервера
+  (STORAGE_BACKEND=memory лишає стан у власних структурах процесу - TTLCache, SearchContextManager);
+- SQLiteBackend - файл на локальному диску (WAL): воркери однієї машини;
+- RedisBackend - Redis-протокол (Redis/Valkey/KeyDB): кілька машин; потрібен пакет redis.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - redis потрібен лише для STORAGE_BACKEND=redis
+    aioredis = None
+
+# Верхня межа діапазону ключів з префіксом p: [p, p + _PREFIX_END)
+_PREFIX_END = "\U0010ffff"
+# Обмеження кількості параметрів одного SQL-запиту (SQLITE_MAX_VARIABLE_NUMBER у старих збірках - 999)
+_SQLITE_CHUNK = 500
+
+
+class Codec(NamedTuple):
+    encode: Callable[[Any], bytes]
+    decode: Callable[[bytes], Any]
+
+
+JSON_CODEC = Codec(
+    lambda value: json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+    json.loads,
+)
+# Embedding: 8 байт на вимір без втрати точності; у JSON 4096 вимірів - ~80 KB і ~1 мс на розбір
+FLOAT_VECTOR_CODEC = Codec(
+    lambda value: array("d", value).tobytes(),
+    lambda raw: array("d", raw).tolist(),
+)
+
+
+class StorageBackend(ABC):
+    """Ключ → bytes з TTL у секундах. Усі методи асинхронні, помилки сховища не перехоплюються"""
+
+    name = "base"
+    # False - стан видно лише цьому процесу
+    shared = True
+
+    @abstractmethod
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        ...
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_many([key]))[0]
+
+    @abstractmethod
+    async def set_many(self, items: Dict[str, bytes], ttl_seconds: float) -> None:
+        ...
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        await self.set_many({key: value}, ttl_seconds)
+
+    @abstractmethod
+    async def touch(self, keys: List[str], ttl_seconds: float) -> None:
+        """Продовжує TTL наявних ключів (відсутні ігноруються)"""
+
+    @abstractmethod
+    async def delete(self, keys: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self, prefix: str) -> int:
+        ...
+
+    @abstractmethod
+    async def count(self, prefix: str) -> int:
+        ...
+
+    async def cleanup_expired(self, prefix: str) -> int:
+        """Видаляє протерміновані ключі простору імен (якщо сховище не робить цього саме)"""
+        return 0
+
+    async def trim(self, prefix: str, capacity: int) -> int:
+        """Обмежує кількість ключів простору імен: першими видаляються ті, що раніше протермінуються"""
+        return 0
+
+    async def close(self) -> None:
+        return None
+
+
+class MemoryBackend(StorageBackend):
+    name = "memory"
+    shared = False
+
+    def __init__(self):
+        # key -> (expires_at, value)
+        self._data: Dict[str, tuple] = {}
+
+    def _live(self, key: str, now: float) -> Optional[tuple]:
+        item = self._data.get(key)
+        if item is not None and item[0] <= now:
+            del self._data[key]
+            return None
+        return item
+
+    def _keys(self, prefix: str) -> List[str]:
+        return [key for key in self._data if key.startswith(prefix)]
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.time()
+        out = []
+        for key in keys:
+            item = self._live(key, now)
+            out.append(item[1] if item is not None else None)
+        return out
+
+    async def set_many(self, items: Dict[str, bytes], ttl_seconds: float) -> None:
+        expires_at = time.time() + ttl_seconds
+        for key, value in items.items():
+            self._data[key] = (expires_at, value)
+
+    async def touch(self, keys: List[str], ttl_seconds: float) -> None:
+        now = time.time()
+        for key in keys:
+            item = self._live(key, now)
+            if item is not None:
+                self._data[key] = (now + ttl_seconds, item[1])
+
+    async def delete(self, keys: List[str]) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def clear(self, prefix: str) -> int:
+        keys = self._keys(prefix)
+        await self.delete(keys)
+        return len(keys)
+
+    async def count(self, prefix: str) -> int:
+        now = time.time()
+        return sum(1 for key in self._keys(prefix) if self._live(key, now) is not None)
+
+    async def cleanup_expired(self, prefix: str) -> int:
+        now = time.time()
+        expired = [key for key in self._keys(prefix) if self._data[key][0] <= now]
+        await self.delete(expired)
+        return len(expired)
+
+    async def trim(self, prefix: str, capacity: int) -> int:
+        keys = self._keys(prefix)
+        excess = len(keys) - capacity
+        if excess <= 0:
+            return 0
+        keys.sort(key=lambda key: self._data[key][0])
+        await self.delete(keys[:excess])
+        return excess
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Один файл на машину для всіх воркерів. WAL: читачі не блокують запис;
+    виклики - у потоці (to_thread), щоб очікування блокування файлу не зупиняло event loop.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, busy_timeout_seconds: float = 5.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # with self._conn: - одна транзакція на пакет записів
+        self._conn = sqlite3.connect(path, timeout=busy_timeout_seconds, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS kv_expires_at ON kv (expires_at)")
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        def locked() -> Any:
+            with self._lock:
+                return fn(*args)
+
+        return await asyncio.to_thread(locked)
+
+    def _get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.time()
+        found: Dict[str, bytes] = {}
+        for start in range(0, len(keys), _SQLITE_CHUNK):
+            chunk = keys[start : start + _SQLITE_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT key, value FROM kv WHERE key IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                (*chunk, now),
+            )
+            found.update(rows)
+        return [found.get(key) for key in keys]
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return await self._run(self._get_many, keys)
+
+    def _set_many(self, items: Dict[str, bytes], ttl_seconds: float) -> None:
+        expires_at = time.time() + ttl_seconds
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, expires_at) for key, value in items.items()],
+            )
+
+    async def set_many(self, items: Dict[str, bytes], ttl_seconds: float) -> None:
+        if items:
+            await self._run(self._set_many, items, ttl_seconds)
+
+    def _touch(self, keys: List[str], ttl_seconds: float) -> None:
+        now = time.time()
+        with self._conn:
+            for start in range(0, len(keys), _SQLITE_CHUNK):
+                chunk = keys[start : start + _SQLITE_CHUNK]
+                self._conn.execute(
+                    f"UPDATE kv SET expires_at = ? WHERE key IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                    (now + ttl_seconds, *chunk, now),
+                )
+
+    async def touch(self, keys: List[str], ttl_seconds: float) -> None:
+        if keys:
+            await self._run(self._touch, keys, ttl_seconds)
+
+    def _delete(self, keys: List[str]) -> None:
+        with self._conn:
+            self._conn.executemany("DELETE FROM kv WHERE key = ?", [(key,) for key in keys])
+
+    async def delete(self, keys: List[str]) -> None:
+        if keys:
+            await self._run(self._delete, keys)
+
+    def _execute_count(self, sql: str, *args: Any) -> int:
+        with self._conn:
+            return self._conn.execute(sql, args).rowcount
+
+    async def clear(self, prefix: str) -> int:
+        return await self._run(
+            self._execute_count, "DELETE FROM kv WHERE key >= ? AND key < ?", prefix, prefix + _PREFIX_END
+        )
+
+    async def count(self, prefix: str) -> int:
+        def _count() -> int:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM kv WHERE key >= ? AND key < ? AND expires_at > ?",
+                (prefix, prefix + _PREFIX_END, time.time()),
+            ).fetchone()
+            return row[0]
+
+        return await self._run(_count)
+
+    async def cleanup_expired(self, prefix: str) -> int:
+        return await self._run(
+            self._execute_count,
+            "DELETE FROM kv WHERE key >= ? AND key < ? AND expires_at <= ?",
+            prefix,
+            prefix + _PREFIX_END,
+            time.time(),
+        )
+
+    async def trim(self, prefix: str, capacity: int) -> int:
+        excess = await self.count(prefix) - capacity
+        if excess <= 0:
+            return 0
+        return await self._run(
+            self._execute_count,
+            "DELETE FROM kv WHERE key IN "
+            "(SELECT key FROM kv WHERE key >= ? AND key < ? ORDER BY expires_at LIMIT ?)",
+            prefix,
+            prefix + _PREFIX_END,
+            excess,
+        )
+
+    async def close(self) -> None:
+        await self._run(self._conn.close)
+
+
+def _escape_glob(text: str) -> str:
+    for ch in "\\*?[]":
+        text = text.replace(ch, "\\" + ch)
+    return text
+
+
+class RedisBackend(StorageBackend):
+    """
+    Redis-протокол: TTL і витіснення робить сервер (рекомендовано maxmemory-policy volatile-lru),
+    тому cleanup_expired/trim тут нічого не роблять. key_prefix відокремлює ключі сервісу
+    на спільному сервері.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, key_prefix: str = "", max_connections: int = 50):
+        if aioredis is None:
+            raise RuntimeError("STORAGE_BACKEND=redis requires the 'redis' package")
+        self.key_prefix = key_prefix
+        self._client = aioredis.Redis.from_url(url, max_connections=max_connections)
+
+    def _k(self, key: str) -> str:
+        return self.key_prefix + key
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return await self._client.mget([self._k(key) for key in keys])
+
+    async def set_many(self, items: Dict[str, bytes], ttl_seconds: float) -> None:
+        if not items:
+            return
+        ttl_ms = max(1, int(ttl_seconds * 1000))
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self._k(key), value, px=ttl_ms)
+            await pipe.execute()
+
+    async def touch(self, keys: List[str], ttl_seconds: float) -> None:
+        if not keys:
+            return
+        ttl_ms = max(1, int(ttl_seconds * 1000))
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.pexpire(self._k(key), ttl_ms)
+            await pipe.execute()
+
+    async def delete(self, keys: List[str]) -> None:
+        if keys:
+            await self._client.unlink(*[self._k(key) for key in keys])
+
+    async def _scan(self, prefix: str) -> List[bytes]:
+        return [key async for key in self._client.scan_iter(match=_escape_glob(self._k(prefix)) + "*", count=1000)]
+
+    async def clear(self, prefix: str) -> int:
+        keys = await self._scan(prefix)
+        for start in range(0, len(keys), 1000):
+            await self._client.unlink(*keys[start : start + 1000])
+        return len(keys)
+
+    async def count(self, prefix: str) -> int:
+        return len(await self._scan(prefix))
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_storage_backend(
+    kind: str, sqlite_path: str = "", redis_url: str = "", redis_key_prefix: str = ""
+) -> Optional[StorageBackend]:
+    """None - стан у структурах процесу (STORAGE_BACKEND=memory, за замовчуванням)"""
+    kind = (kind or "memory").strip().lower()
+    if kind == "memory":
+        return None
+    if kind == "sqlite":
+        return SQLiteBackend(sqlite_path)
+    if kind == "redis":
+        return RedisBackend(redis_url, key_prefix=redis_key_prefix)
+    raise ValueError(f"Unknown storage backend: {kind}")
@@ -0,0 +1,162 @@
+"""
+Індекс підказок (typeahead) для /suggest: назви товарів (ua/ru) та популярні
+запити з SearchLogger, ранжовані за частотою.
+
+Відсортований масив нормалізованих ключів + бінарний пошук діапазону префікса.
+Для "важких" префіксів (діапазон більший за scan_limit, напр. "к") топ
+підказок рахується при побудові, тож відповідь не залежить від розміру каталогу.
+Нові запити додаються інкрементально (add_query), каталог - повною перебудовою у фоні.
+Запит користувача потрапляє в підказки лише після min_query_sessions різних сесій:
+одиничні запити (опечатки, приватний текст) іншим відвідувачам не показуються.
+"""
+
+import bisect
+import heapq
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+SOURCE_QUERY = "query"
+SOURCE_TITLE = "title"
+
+# Верхня межа для bisect: ключі з префіксом p лежать у [p, p + _PREFIX_END)
+_PREFIX_END = "\uffff"
+
+
+def normalize_suggest_key(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+class SuggestIndex:
+    def __init__(
+        self,
+        limit: int = 10,
+        scan_limit: int = 500,
+        max_text_length: int = 100,
+        min_query_sessions: int = 1,
+        max_pending_queries: int = 20000,
+    ):
+        self.limit = limit
+        self.scan_limit = scan_limit
+        self.max_text_length = max_text_length
+        self.min_query_sessions = max(1, min_query_sessions)
+        self.max_pending_queries = max_pending_queries
+        # Запити, що ще не набрали min_query_sessions: key -> сесії (LRU, найстаріші витісняються)
+        self._pending: "OrderedDict[str, Set[str]]" = OrderedDict()
+        self._keys: List[str] = []
+        # key -> [текст для показу, вага, джерело]
+        self._entries: Dict[str, List[Any]] = {}
+        # важкий префікс -> ключі топ-limit за вагою
+        self._top: Dict[str, List[str]] = {}
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, float, str]], **kwargs: Any) -> "SuggestIndex":
+        """entries: (text, weight, source); однакові ключі сумують вагу, запит має пріоритет як джерело"""
+        index = cls(**kwargs)
+        for text, weight, source in entries:
+            index._merge(text, weight, source)
+        index._keys = sorted(index._entries)
+        index._build_top()
+        return index
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _rank(self, key: str) -> Tuple[float, int]:
+        # Вища вага, при рівних - коротша підказка
+        return (self._entries[key][1], -len(key))
+
+    def _merge(self, text: str, weight: float, source: str) -> Optional[str]:
+        key = normalize_suggest_key(text)
+        if not key or len(key) > self.max_text_length:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = [" ".join(text.split()), weight, source]
+        else:
+            entry[1] += weight
+            if source == SOURCE_QUERY and entry[2] != SOURCE_QUERY:
+                entry[0], entry[2] = " ".join(text.split()), SOURCE_QUERY
+        return key
+
+    def _build_top(self) -> None:
+        self._top = {}
+        keys = self._keys
+        stack = [("", 0, len(keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if hi - lo <= self.scan_limit:
+                continue
+            if prefix:
+                self._top[prefix] = heapq.nlargest(self.limit, keys[lo:hi], key=self._rank)
+            # Ділимо діапазон за наступним символом; ключ, що дорівнює префіксу, - першим
+            depth = len(prefix)
+            i = lo + 1 if keys[lo] == prefix else lo
+            while i < hi:
+                child = prefix + keys[i][depth]
+                j = bisect.bisect_left(keys, child + _PREFIX_END, i, hi)
+                stack.append((child, i, j))
+                i = j
+
+    def add(self, text: str, weight: float = 1.0, source: str = SOURCE_QUERY) -> None:
+        """Інкрементальне оновлення: новий ключ - вставка в масив, топи важких префіксів - перерахунок"""
+        is_new = normalize_suggest_key(text) not in self._entries
+        key = self._merge(text, weight, source)
+        if key is None:
+            return
+        if is_new:
+            bisect.insort(self._keys, key)
+        for end in range(1, len(key) + 1):
+            top = self._top.get(key[:end])
+            if top is None:
+                continue
+            if key not in top:
+                top.append(key)
+            top.sort(key=self._rank, reverse=True)
+            del top[self.limit:]
+
+    def add_query(self, text: str, session: str, weight: float = 1.0) -> bool:
+        """
+        Успішний запит користувача. Поки запит не зустрівся в min_query_sessions різних
+        сесіях, лише рахуються сесії; True - запит є в підказках
+        """
+        key = normalize_suggest_key(text)
+        if not key or len(key) > self.max_text_length:
+            return False
+        entry = self._entries.get(key)
+        if entry is None or entry[2] != SOURCE_QUERY:
+            sessions = self._pending.pop(key, None) or set()
+            sessions.add(session)
+            if len(sessions) < self.min_query_sessions:
+                self._pending[key] = sessions
+                while len(self._pending) > self.max_pending_queries:
+                    self._pending.popitem(last=False)
+                return False
+            # Вага як при перебудові: сесії × вага запиту
+            weight *= len(sessions)
+        self.add(text, weight, SOURCE_QUERY)
+        return True
+
+    def suggest(self, prefix: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        limit = min(limit or self.limit, self.limit)
+        p = normalize_suggest_key(prefix)
+        if not p:
+            return []
+        top = self._top.get(p)
+        if top is None:
+            lo = bisect.bisect_left(self._keys, p)
+            hi = bisect.bisect_left(self._keys, p + _PREFIX_END, lo)
+            top = heapq.nlargest(limit, self._keys[lo:hi], key=self._rank)
+        return [
+            {"text": self._entries[key][0], "source": self._entries[key][2]}
+            for key in top[:limit]
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        queries = sum(1 for entry in self._entries.values() if entry[2] == SOURCE_QUERY)
+        return {
+            "entries": len(self._keys),
+            "queries": queries,
+            "titles": len(self._keys) - queries,
+            "precomputed_prefixes": len(self._top),
+            "pending_queries": len(self._pending),
+        }
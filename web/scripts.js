@@ -3,9 +3,12 @@
 const SEARCH_API_URL = '/search';
 const CHAT_SEARCH_API_URL = '/chat/search';
 const CHAT_SEARCH_SSE_URL = '/chat/search/sse';
+const SUGGEST_API_URL = '/suggest';
+const SUGGEST_DEBOUNCE_MS = 120;
 // Feature flags
 const FEATURE_CHAT_AUTOSCROLL = true; // авто-скрол до каруселі (ON за замовчуванням)
 let FEATURE_CHAT_STREAMING = false; // за замовчуванням OFF, може вмикатись через /config
+let FEATURE_CHAT_PROGRESSIVE = false; // товари до GPT-рекомендацій (SSE події products / recommendations_update)
 // Persistence keys
 const WELCOME_SEEN_KEY = 'welcome_seen';
 const CHAT_WELCOME_SEEN_KEY = 'chat_welcome_seen';
@@ -111,6 +114,7 @@ const chatThread = document.getElementById('chatThread');
 let cartItems = [];
 let chatStep = 0; // лічильник кроків (для відміток "Крок N")
 let chatDialogContext = null; // зберігаємо dialog_context від бекенда між раундами
+let chatDialogToken = null; // токен того ж контексту на сервері - передається замість dialog_context
 let userHasMinimizedCart = false; // чи користувач вже згортав кошик
 let searchBoxAnimationShown = false; // чи вже була показана анімація переміщення пошукової строки
 let userHasEverAddedItems = false; // чи користувач коли-небудь додавав товари
@@ -132,9 +136,9 @@ function logProductTitles(label, products) {
   } catch (_) {}
 }
 
-// Історія пошуків для контексту (тільки в пам'яті, очищається при перезавантаженні)
-let searchHistory = [];
-const MAX_HISTORY_ITEMS = 5; // Максимум 5 останніх пошуків
+// Історія пошуків для контексту зберігається на сервері за id розмови - у запиті лише нове повідомлення.
+// Нова розмова - при перезавантаженні сторінки або переході в простий пошук
+let chatConversationId = newChatConversationId();
 const SEARCH_HISTORY_KEY = 'search_history'; // Ключ для очищення старих даних
 
 // Система лімітів для чат-пошуку
@@ -156,9 +160,8 @@ document.addEventListener('DOMContentLoaded', function() {
     console.warn('Failed to clear storage history:', e);
   }
   
-  // НЕ завантажуємо історію - кожне перезавантаження = нова сесія
-  searchHistory = [];
-  console.log('📜 Початок нової сесії - історія порожня');
+  // НЕ завантажуємо історію - кожне перезавантаження = нова розмова
+  console.log('📜 Початок нової розмови:', chatConversationId);
   
   // Перевіряємо ліміт запитів при завантаженні
   const limitCheck = checkChatSearchLimit();
@@ -583,48 +586,14 @@ async function performSimpleSearch(){
 }
 
 // --- Функції для роботи з історією ---
-function getSearchHistory() {
-  return searchHistory;
-}
-
-// --- MEMORY-ONLY HISTORY MANAGEMENT ---
-// Історія зберігається тільки в пам'яті - очищається при перезавантаженні сторінки
-function loadSearchHistoryFromStorage() { 
-  // Більше не завантажуємо з storage - історія тільки в пам'яті
-  searchHistory = [];
-}
-
-function saveSearchHistoryToStorage() {
-  // Більше не зберігаємо в storage - історія тільки в пам'яті
-  // Це забезпечує очищення при кожному перезавантаженні
-}
-
-function addToSearchHistory(query) {
-  if (!query || typeof query !== 'string' || query.trim().length === 0) return;
-  
-  const historyItem = {
-    query: query.trim(),
-    timestamp: new Date().toISOString()
-  };
-  
-  // Видаляємо дублікати (останній запит якщо такий самий)
-  if (searchHistory.length > 0 && searchHistory[searchHistory.length - 1].query === historyItem.query) {
-    return;
-  }
-  
-  searchHistory.push(historyItem);
-  
-  // Обмежуємо розмір історії
-  if (searchHistory.length > MAX_HISTORY_ITEMS) {
-    searchHistory = searchHistory.slice(-MAX_HISTORY_ITEMS);
-  }
-  
-  saveSearchHistoryToStorage();
+// Сервер додає успішні пошуки до історії розмови сам (conversation_id у запиті)
+function newChatConversationId() {
+  return `conv_${Date.now()}_${Math.random().toString(36).slice(2, 10)}`;
 }
 
 function clearSearchHistory() { 
-  searchHistory = []; 
-  console.log('🗑️ Історія пошуків очищена (пам\'ять)');
+  chatConversationId = newChatConversationId();
+  console.log('🗑️ Історія пошуків очищена - нова розмова:', chatConversationId);
 }
 
 // --- СИСТЕМА ЛІМІТІВ ЧАТ-ПОШУКУ ---
@@ -936,6 +905,7 @@ async function performChatSearch(directQuery = null){
   
   // Скидаємо контекст діалогу для нового пошуку
   chatDialogContext = null;
+  chatDialogToken = null;
   
   // Очищаємо поле пошуку після запуску
   chatSearchInput.value = '';
@@ -954,6 +924,9 @@ async function performChatSearch(directQuery = null){
     if (typeof cfg.feature_chat_sse === 'boolean') {
       FEATURE_CHAT_STREAMING = cfg.feature_chat_sse;
     }
+    if (typeof cfg.feature_chat_progressive === 'boolean') {
+      FEATURE_CHAT_PROGRESSIVE = cfg.feature_chat_progressive;
+    }
   }catch(_){ /* ignore */ }
 
   if (FEATURE_CHAT_STREAMING) {
@@ -1068,13 +1041,10 @@ async function runChatRound(input){
     const chatData = await fetchChatAnalysisPayload({
       input,
       dialog_context: chatDialogContext,
+      dialog_token: chatDialogToken,
     });
     chatDialogContext = chatData?.dialog_context || null;
-    
-    // Додаємо запит до історії для контекстного розуміння
-    if (!isCategoryFilter && input?.value) {
-      addToSearchHistory(input.value);
-    }
+    chatDialogToken = chatData?.dialog_token || null;
     
     const advice = chatData?.assistant_message || '';
     const products = Array.isArray(chatData?.results) ? chatData.results : [];
@@ -1173,13 +1143,15 @@ async function runChatRoundStreaming(input){
     const sessionId = `session_${Date.now()}`;
     const params = new URLSearchParams({ query: input.value, session_id: sessionId, k: String(100) });
     
-    // Передаємо search_history окремим параметром (НЕ в dialog_context!)
-    const historyJson = JSON.stringify(getSearchHistory());
-    const historyB64 = btoa(unescape(encodeURIComponent(historyJson)));
-    params.append('search_history_b64', historyB64);
+    // Історія розмови - на сервері, передаємо лише її id (НЕ в dialog_context!)
+    params.append('conversation_id', chatConversationId);
+    params.append('progressive', FEATURE_CHAT_PROGRESSIVE ? '1' : '0');
     
-    // Додаємо dialog_context якщо він є (БЕЗ search_history - вона передається окремо)
-    if (chatDialogContext) {
+    // Контекст діалогу - токеном (короткий URL); base64 dialog_context - лише якщо токена немає
+    if (chatDialogToken) {
+      params.append('dialog_token', chatDialogToken);
+      console.log('📤 Передаємо dialog_token в SSE:', chatDialogToken);
+    } else if (chatDialogContext) {
       try {
         const contextJson = JSON.stringify(chatDialogContext);
         const contextB64 = btoa(unescape(encodeURIComponent(contextJson)));
@@ -1212,6 +1184,16 @@ async function runChatRoundStreaming(input){
     activeChatSearchEventSource = es; // Зберігаємо для можливості скасування
     let finalPayload = null;
 
+    // Ранню карусель (подія products) тримаємо під повідомленнями асистента
+    function appendAboveEarlyCarousel(el) {
+      const earlyCarousel = bodyEl.querySelector('.carousel-container');
+      if (earlyCarousel) {
+        bodyEl.insertBefore(el, earlyCarousel);
+      } else {
+        bodyEl.appendChild(el);
+      }
+    }
+
     // Новий обробник для статусних повідомлень
     es.addEventListener('status', (ev)=>{
       try{
@@ -1256,7 +1238,7 @@ async function runChatRoundStreaming(input){
             statusText = 'Пишу рекомендацію';
           }
           statusDiv.innerHTML = `<!--<div class="dot-loader"></div>--><span class="loader-text shimmer-text">${statusText}</span>`;
-          bodyEl.appendChild(statusDiv);
+          appendAboveEarlyCarousel(statusDiv);
         }
       }catch(e){ console.warn('Status event error:', e); }
     });
@@ -1277,6 +1259,27 @@ async function runChatRoundStreaming(input){
       // Подію отримано, але не виводимо етапи
     });
 
+    // Прогресивний режим: товари з локальним порядком одразу, GPT-рекомендації пізніше
+    es.addEventListener('products', (ev)=>{
+      try{
+        const data = JSON.parse(ev.data);
+        if (Array.isArray(data.results) && data.results.length) {
+          updateCarouselInSection(section, { products: data.results, recommendations: data.recommendations || [] });
+          bodyEl.classList.add('loading'); // текст асистента ще попереду
+        }
+      }catch(e){ console.warn('Products event error:', e); }
+    });
+
+    es.addEventListener('recommendations_update', (ev)=>{
+      try{
+        const data = JSON.parse(ev.data);
+        if (Array.isArray(data.results) && data.results.length && bodyEl.querySelector('.carousel-container')) {
+          updateCarouselInSection(section, { products: data.results, recommendations: data.recommendations || [] });
+          bodyEl.classList.add('loading');
+        }
+      }catch(e){ console.warn('Recommendations update event error:', e); }
+    });
+
     // Стрім «набору» відповіді асистента (бекенд вже відправляє посимвольно)
     let assistantMsg = null;
     let assistantTypingComplete = false;
@@ -1331,7 +1334,7 @@ async function runChatRoundStreaming(input){
       assistantMsg.className = 'assistant-message typing';
       assistantMsg.textContent = '';
       assistantMsg.dataset.rawText = '';
-      bodyEl.appendChild(assistantMsg);
+      appendAboveEarlyCarousel(assistantMsg);
       
       // Клас loading залишається активним під час друку тексту GPT
     });
@@ -1339,7 +1342,7 @@ async function runChatRoundStreaming(input){
     es.addEventListener('assistant_delta', (ev)=>{
       try{
         const d = JSON.parse(ev.data);
-        // Просто додаємо символ (бекенд вже відправляє з затримкою)
+        // Фрагмент по межах слів/речень (у slow mode бекенд відправляє з затримкою)
         if (assistantMsg && d.text) {
           // Накопичуємо текст і одразу конвертуємо \n в <br> для правильного форматування під час друку
           if (!assistantMsg.dataset.rawText) assistantMsg.dataset.rawText = '';
@@ -1405,18 +1408,21 @@ async function runChatRoundStreaming(input){
       }
     });
 
+    es.addEventListener('timings', (ev)=>{
+      try {
+        const data = JSON.parse(ev.data);
+        console.debug('⏱️ Stage timings (ms):', data.stage_timings_ms);
+      } catch(e) {
+        console.warn('Timings event error:', e);
+      }
+    });
+
     es.addEventListener('final', (ev)=>{
       try{
         finalPayload = JSON.parse(ev.data);
         es.close();
         restoreSearchButton(); // Відновлюємо іконку після завершення пошуку
         
-        // Додаємо запит до історії для контекстного розуміння наступних запитів
-        if (input?.value) {
-          addToSearchHistory(input.value);
-          console.log('📜 Додано до історії:', input.value, '| Всього:', searchHistory.length);
-        }
-        
         // Рендеримо категорії та карусель ТІЛЬКИ після завершення друку тексту
         if (assistantTypingComplete) {
           renderCarouselAfterAssistant();
@@ -1437,6 +1443,9 @@ async function runChatRoundStreaming(input){
       
       // Додаємо невелику затримку перед показом товарів для плавності
       setTimeout(() => {
+        // Рання карусель з події products замінюється фінальною (з кнопками категорій)
+        bodyEl.querySelectorAll('.carousel-container').forEach(el => el.remove());
+        
         // Рендеримо категорії та карусель (текст асистента вже є через SSE)
         finalizeSectionWithoutTextTyping(bodyEl, {
           products: finalPayload.results || [],
@@ -1446,6 +1455,7 @@ async function runChatRoundStreaming(input){
         
         // Оновити контекст
         chatDialogContext = finalPayload.dialog_context || null;
+        chatDialogToken = finalPayload.dialog_token || null;
         console.log('📥 Оновлено chatDialogContext:', chatDialogContext);
         
         // Логуємо clarification_asked якщо є
@@ -1814,14 +1824,17 @@ function updateCategoryButtons(body) {
 }
 
 // Надійний запит до GPT-підказок із повтором
-async function fetchChatAnalysisPayload({ input, dialog_context = null, retries = 2 } = {}){
+async function fetchChatAnalysisPayload({ input, dialog_context = null, dialog_token = null, retries = 2 } = {}){
   const isCategory = input?.type === 'category';
   const requestData = {
     query: isCategory ? (dialog_context?.original_query || '') : (input?.value || ''),
-    search_history: getSearchHistory(),
-    session_id: `session_${Date.now()}`,
+    conversation_id: chatConversationId,
+    // Клік по категорії - та сама сесія: бекенд фільтрує збережені результати без повторного пошуку
+    session_id: (isCategory && dialog_context?.session_id) || `session_${Date.now()}`,
     k: 100,
-    dialog_context: dialog_context || undefined,
+    // Контекст уже на сервері - лише токен; dialog_context - якщо токена немає
+    dialog_token: dialog_token || undefined,
+    dialog_context: dialog_token ? undefined : (dialog_context || undefined),
     selected_category: isCategory ? input.value : undefined,
   };
   
@@ -3767,9 +3780,90 @@ function performSearchFromIcon(){
   performSimpleSearch();
 }
 
+// --- Підказки (typeahead) для чат-пошуку ---
+const chatSuggestList = document.getElementById('chatSuggestList');
+let suggestTimer = null;
+let suggestController = null;
+let suggestActiveIndex = -1;
+
+function hideChatSuggestions() {
+  clearTimeout(suggestTimer);
+  if (suggestController) suggestController.abort();
+  suggestActiveIndex = -1;
+  if (chatSuggestList) {
+    chatSuggestList.hidden = true;
+    chatSuggestList.innerHTML = '';
+  }
+}
+
+function renderChatSuggestions(items) {
+  if (!chatSuggestList || !items.length) { hideChatSuggestions(); return; }
+  suggestActiveIndex = -1;
+  chatSuggestList.innerHTML = items.map((item, i) =>
+    `<li class="suggest-item" role="option" data-index="${i}">${escapeHTML(item.text)}</li>`
+  ).join('');
+  chatSuggestList.querySelectorAll('.suggest-item').forEach((li, i) => {
+    // mousedown, щоб спрацювати до blur поля вводу
+    li.addEventListener('mousedown', e => {
+      e.preventDefault();
+      selectChatSuggestion(items[i].text);
+    });
+  });
+  chatSuggestList.hidden = false;
+}
+
+function selectChatSuggestion(text) {
+  chatSearchInput.value = text;
+  hideChatSuggestions();
+  performChatSearch();
+}
+
+function highlightChatSuggestion(delta) {
+  const items = chatSuggestList ? chatSuggestList.querySelectorAll('.suggest-item') : [];
+  if (!items.length) return;
+  suggestActiveIndex = (suggestActiveIndex + delta + items.length) % items.length;
+  items.forEach((li, i) => li.classList.toggle('active', i === suggestActiveIndex));
+}
+
+function requestChatSuggestions(prefix) {
+  clearTimeout(suggestTimer);
+  if (prefix.length < 2) { hideChatSuggestions(); return; }
+  suggestTimer = setTimeout(async () => {
+    if (suggestController) suggestController.abort();
+    suggestController = new AbortController();
+    try {
+      const res = await fetch(`${SUGGEST_API_URL}?q=${encodeURIComponent(prefix)}`, { signal: suggestController.signal });
+      if (!res.ok) return;
+      const data = await res.json();
+      // Поле могло змінитись, поки йшла відповідь
+      if (chatSearchInput.value.trim() === prefix) renderChatSuggestions(data.suggestions || []);
+    } catch (e) {
+      if (e.name !== 'AbortError') console.debug('suggest failed', e);
+    }
+  }, SUGGEST_DEBOUNCE_MS);
+}
+
 // Обробники подій
+chatSearchInput.addEventListener('keydown', e => {
+  if (!chatSuggestList || chatSuggestList.hidden) return;
+  if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+    e.preventDefault();
+    highlightChatSuggestion(e.key === 'ArrowDown' ? 1 : -1);
+  } else if (e.key === 'Escape') {
+    hideChatSuggestions();
+  } else if (e.key === 'Enter' && suggestActiveIndex >= 0) {
+    // Значення підставляється тут, пошук запускає keyup нижче
+    chatSearchInput.value = chatSuggestList.querySelectorAll('.suggest-item')[suggestActiveIndex].textContent;
+  }
+});
+
+chatSearchInput.addEventListener('blur', () => hideChatSuggestions());
+
 chatSearchInput.addEventListener('keyup', e => { 
-  if(e.key === 'Enter') performChatSearch(); 
+  if(e.key === 'Enter') {
+    hideChatSuggestions();
+    performChatSearch();
+  }
 });
 
 // Показати/сховати кнопку пошуку залежно від наявності тексту
@@ -3780,6 +3874,7 @@ chatSearchInput.addEventListener('input', e => {
   } else {
     btn.classList.remove('visible');
   }
+  requestChatSuggestions(e.target.value.trim());
 });
 
 headerSearchInput.addEventListener('keyup', e => { 
@@ -3993,6 +4088,7 @@ function performFooterSearch() {
 
     // Скидаємо лише контекст, але НЕ скидаємо історію секцій — новий пошук додається нижче
     chatDialogContext = null;
+    chatDialogToken = null;
 
     // Виконуємо пошук як новий раунд, який додасть нову секцію
     runChatRound({ type: 'text', value: query });